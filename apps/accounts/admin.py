@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from django.contrib import messages
-from .models import PerfilUsuario, Suscripcion
+from .models import PerfilUsuario, Suscripcion, ActivityEvent
 from .services import UserService
 
 # Desregistrar el UserAdmin por defecto de Django si está registrado
@@ -25,6 +25,21 @@ class SuscripcionAdmin(admin.ModelAdmin):
     search_fields = ('usuario__username',)  # Campos de búsqueda
 
 
+# Registro de actividad: solo lectura (append-only).
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'verbo', 'actor', 'objetivo_tipo', 'objetivo_id', 'detalle')  # Columnas visibles
+    list_filter = ('verbo',)  # Filtros laterales
+    list_select_related = ('actor', 'objetivo_tipo')
+    search_fields = ('detalle',)  # Campos de búsqueda
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Configuración personalizada del admin de User para eliminar completamente
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -0,0 +1,128 @@
+"""
+Contexto de autorización de la petición.
+
+Carga una sola vez por petición el perfil del usuario y calcula los
+indicadores de rol (empresa, consumidor, administrador, suscripción)
+que consultan los decoradores de apps.accounts.decorators,
+PermissionMixin, el context processor y las vistas.
+
+El perfil se comparte con request.user.userprofile (caché de la relación
+uno a uno), así que acceder a cualquiera de los dos no repite la
+consulta. El plan de la suscripción activa sale de los entitlements
+cacheados (ver apps.accounts.entitlements).
+
+Uso:
+    contexto = obtener_contexto_autorizacion(request)
+    if not contexto.es_admin:
+        ...
+"""
+
+from functools import cached_property
+
+from django.http import Http404
+
+from .entitlements import obtener_entitlements
+
+# Atributo de la petición donde se guarda el contexto
+ATRIBUTO_REQUEST = '_contexto_autorizacion'
+
+
+class ContextoAutorizacion:
+    """Usuario, perfil e indicadores de rol derivados, calculados una vez."""
+
+    def __init__(self, user):
+        self.user = user
+        self.autenticado = user.is_authenticated
+
+    @cached_property
+    def perfil(self):
+        """
+        PerfilUsuario del usuario o None (anónimo o sin perfil).
+
+        Los indicadores derivados son propiedades simples sobre este valor:
+        si una vista crea el perfil puede asignarlo aquí directamente.
+        """
+        if not self.autenticado:
+            return None
+        # Usa (y llena) la caché de request.user.userprofile
+        return getattr(self.user, 'userprofile', None)
+
+    @property
+    def tiene_perfil(self):
+        return self.perfil is not None
+
+    @property
+    def tipo_cuenta(self):
+        return self.perfil.tipo_cuenta if self.perfil else None
+
+    @property
+    def es_empresa(self):
+        return self.tipo_cuenta == 'empresa'
+
+    @property
+    def es_consumidor(self):
+        return self.tipo_cuenta == 'usuario'
+
+    @property
+    def es_admin(self):
+        """Superusuarios o perfiles con permisos de Administrador."""
+        if not self.autenticado:
+            return False
+        return self.user.is_superuser or bool(self.perfil and self.perfil.is_admin)
+
+    @cached_property
+    def entitlements(self):
+        """Plan, límites y uso del usuario (una lectura de caché)."""
+        return obtener_entitlements(self.user)
+
+    @property
+    def suscripcion_activa(self):
+        return self.tiene_perfil and self.entitlements.suscripcion_activa
+
+    def tiene_plan(self, planes):
+        return self.tiene_perfil and self.entitlements.tiene_plan(planes)
+
+    @property
+    def campos_faltantes(self):
+        """Campos del perfil requeridos según el tipo de cuenta que están vacíos."""
+        if not self.perfil:
+            return []
+
+        faltantes = []
+        if self.es_empresa:
+            if not self.perfil.empresa:
+                faltantes.append('nombre de empresa')
+        else:
+            if not self.user.first_name:
+                faltantes.append('nombre')
+            if not self.user.last_name:
+                faltantes.append('apellido')
+
+        if not self.perfil.telefono:
+            faltantes.append('teléfono')
+        if not self.perfil.direccion:
+            faltantes.append('dirección')
+        return faltantes
+
+    def perfil_o_404(self):
+        """Perfil del usuario; Http404 si no existe."""
+        if self.perfil is None:
+            raise Http404("Perfil de usuario no encontrado")
+        return self.perfil
+
+
+def obtener_contexto_autorizacion(request):
+    """
+    Obtiene el contexto de autorización de la petición, creándolo la primera vez.
+
+    Args:
+        request (HttpRequest): Petición actual
+
+    Returns:
+        ContextoAutorizacion: Contexto compartido durante toda la petición
+    """
+    contexto = getattr(request, ATRIBUTO_REQUEST, None)
+    if contexto is None or contexto.user is not request.user:
+        contexto = ContextoAutorizacion(request.user)
+        setattr(request, ATRIBUTO_REQUEST, contexto)
+    return contexto
@@ -0,0 +1,230 @@
+"""
+Utilidades de caché con invalidación por tags y protección contra estampidas.
+
+Cada valor cacheado se asocia a uno o varios tags (por empresa, catálogo,
+pedidos o global). Cada tag tiene un número de versión en caché; invalidar
+un tag incrementa su versión, de modo que todas las entradas que dependen
+de él dejan de considerarse frescas sin tener que conocer sus claves.
+
+Las entradas se guardan junto con su versión y su expiración lógica. Cuando
+una entrada caduca o queda invalidada, solo el proceso que obtiene el lock
+la recalcula; el resto sigue sirviendo el último valor conocido
+(stale-while-revalidate) en lugar de recalcular todos a la vez.
+
+Uso:
+    datos = obtener_o_calcular(
+        f'company_dashboard_{user.id}',
+        lambda: calcular_dashboard(user),
+        tags=[tag_empresa(user.id), TAG_PEDIDOS],
+        ttl=1800,
+    )
+    invalidar_tags(tag_empresa(user.id))
+
+Los datos públicos más leídos usan obtener_dos_niveles(), que añade una
+copia en memoria del proceso (L1) delante de la caché compartida (L2).
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Tags compartidos
+TAG_GLOBAL = 'global'        # Usuarios y perfiles
+TAG_CATALOGO = 'catalogo'    # Productos y servicios de todas las empresas
+TAG_PEDIDOS = 'pedidos'      # Pedidos de todas las empresas
+
+# Tiempo máximo que un proceso mantiene el lock de recálculo
+LOCK_TIMEOUT = 30
+
+# Tiempo que se espera a otro proceso cuando no hay valor anterior que servir
+ESPERA_MAXIMA = 2.0
+INTERVALO_ESPERA = 0.1
+
+# Caché L1 en memoria de cada proceso (obtener_dos_niveles)
+ALIAS_LOCAL = 'local'
+TTL_LOCAL = 5
+
+
+def tag_empresa(user_id):
+    """Tag de los datos de una empresa (o usuario) concreta."""
+    return f'empresa:{user_id}'
+
+
+def tag_landing(user_id):
+    """Tag del contenido público de una empresa (landing page y catálogo)."""
+    return f'landing:{user_id}'
+
+
+def tag_entitlements(user_id):
+    """Tag de los entitlements (plan, límites y uso) de un usuario."""
+    return f'entitlements:{user_id}'
+
+
+def tag_metricas(serie):
+    """Tag de todos los buckets de una serie de MetricsService."""
+    return f'metricas:{serie}'
+
+
+def _clave_tag(tag):
+    return f'cache_tag:{tag}'
+
+
+def version_tags(tags):
+    """
+    Obtiene la versión combinada de una lista de tags.
+
+    Los tags sin versión se inicializan con una marca de tiempo en lugar de 1,
+    para que un tag desalojado de la caché no vuelva a una versión antigua.
+    """
+    if not tags:
+        return ''
+
+    claves = [_clave_tag(tag) for tag in tags]
+    versiones = cache.get_many(claves)
+
+    for clave in claves:
+        if clave not in versiones:
+            cache.add(clave, time.time_ns(), None)
+            versiones[clave] = cache.get(clave, 0)
+
+    return '.'.join(str(versiones[clave]) for clave in claves)
+
+
+def invalidar_tags(*tags):
+    """Invalida todas las entradas asociadas a los tags indicados."""
+    for tag in tags:
+        clave = _clave_tag(tag)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # El tag no existía: cualquier versión nueva invalida lo anterior
+            cache.set(clave, time.time_ns(), None)
+
+
+def invalidar_tags_al_confirmar(*tags):
+    """
+    Invalida los tags cuando la transacción actual haga commit.
+
+    Evita que otra petición vuelva a cachear datos previos al commit.
+    Fuera de un bloque atómico invalida inmediatamente.
+    """
+    transaction.on_commit(lambda: invalidar_tags(*tags))
+
+
+def obtener_o_calcular(clave, calcular, tags=(), ttl=300, gracia=600, forzar=False):
+    """
+    Obtiene un valor de caché o lo calcula con protección contra estampidas.
+
+    Args:
+        clave (str): Clave base en caché
+        calcular (callable): Función sin argumentos que calcula el valor
+        tags (iterable): Tags de los que depende el valor
+        ttl (int): Segundos durante los que el valor se considera fresco
+        gracia (int): Segundos adicionales durante los que puede servirse caducado
+        forzar (bool): Recalcular aunque el valor esté fresco
+
+    Returns:
+        Valor cacheado o recién calculado
+    """
+    version = version_tags(list(tags))
+    return _obtener_entrada(clave, calcular, version, ttl, gracia, forzar)['valor']
+
+
+def _obtener_entrada(clave, calcular, version, ttl, gracia, forzar):
+    """Como obtener_o_calcular, pero devuelve la entrada con su versión y expiración."""
+    entrada = cache.get(clave)
+
+    if not forzar and _es_fresca(entrada, version):
+        return entrada
+
+    clave_lock = f'{clave}:lock'
+    if forzar or cache.add(clave_lock, 1, LOCK_TIMEOUT):
+        try:
+            return _calcular_y_guardar(clave, calcular, version, ttl, gracia)
+        finally:
+            if not forzar:
+                cache.delete(clave_lock)
+
+    # Otro proceso está recalculando: servir el valor anterior si existe
+    if entrada is not None:
+        logger.debug(f"Sirviendo valor caducado de {clave} mientras se recalcula")
+        return entrada
+
+    # Arranque en frío: esperar brevemente al proceso que tiene el lock
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            return entrada
+
+    return _calcular_y_guardar(clave, calcular, version, ttl, gracia)
+
+
+def obtener_dos_niveles(clave, calcular, tags=(), ttl=300, gracia=600, ttl_local=TTL_LOCAL, forzar=False):
+    """
+    Como obtener_o_calcular, con una copia L1 en la memoria del proceso.
+
+    Para datos muy leídos y poco modificados (categorías, destacados,
+    totales del marketplace). Durante ttl_local segundos el L1 responde
+    sin ninguna consulta a la caché compartida; después se comprueba solo
+    la versión de los tags en L2 y, si no cambió, se sigue sirviendo la
+    copia local hasta su expiración. Una invalidación tarda como mucho
+    ttl_local segundos en llegar a cada worker.
+
+    Args:
+        clave (str): Clave base en caché (la misma en L1 y L2)
+        calcular (callable): Función sin argumentos que calcula el valor
+        tags (iterable): Tags de los que depende el valor
+        ttl (int): Segundos durante los que el valor se considera fresco
+        gracia (int): Segundos adicionales durante los que L2 puede servirlo caducado
+        ttl_local (int): Segundos que el L1 responde sin consultar L2
+        forzar (bool): Recalcular aunque el valor esté fresco
+
+    Returns:
+        Valor cacheado o recién calculado
+    """
+    local = _cache_local()
+    ahora = time.time()
+    entrada = local.get(clave) if local is not None and not forzar else None
+
+    if entrada is not None and entrada['revalidar'] > ahora:
+        return entrada['valor']
+
+    version = version_tags(list(tags))
+    if not (entrada is not None and entrada['version'] == version and entrada['expira'] > ahora):
+        entrada = _obtener_entrada(clave, calcular, version, ttl, gracia, forzar)
+
+    if local is not None:
+        restante = entrada['expira'] - ahora
+        if entrada['version'] == version and restante > 0:
+            local.set(clave, {**entrada, 'revalidar': ahora + min(ttl_local, restante)}, restante)
+        else:
+            # Valor caducado servido mientras otro proceso recalcula: no se copia al L1
+            local.delete(clave)
+    return entrada['valor']
+
+
+def _cache_local():
+    if ALIAS_LOCAL not in settings.CACHES:
+        return None
+    return caches[ALIAS_LOCAL]
+
+
+def _es_fresca(entrada, version):
+    return (
+        entrada is not None
+        and entrada['version'] == version
+        and entrada['expira'] > time.time()
+    )
+
+
+def _calcular_y_guardar(clave, calcular, version, ttl, gracia):
+    entrada = {'valor': calcular(), 'version': version, 'expira': time.time() + ttl}
+    cache.set(clave, entrada, ttl + gracia)
+    return entrada
@@ -0,0 +1,99 @@
+"""
+Carrito de compras guardado en la sesión.
+
+El carrito se serializa como una cadena compacta 'id:cantidad,id:cantidad'
+(en lugar de un diccionario JSON con claves de texto) y solo se escribe en
+la sesión cuando su contenido cambia: leerlo desde el context processor o
+la vista previa no marca la sesión como modificada, así que el backend de
+sesiones no reescribe la fila en esas peticiones.
+
+Los carritos con el formato anterior ({'12': 3}) se leen igual y se
+convierten al guardarse.
+
+Uso:
+    carrito = Carrito(request.session)
+    carrito.agregar(producto.id)
+    carrito.guardar()
+"""
+
+
+class Carrito:
+    """Carrito {producto_id: cantidad} respaldado por la sesión."""
+
+    CLAVE_SESION = 'cart'
+
+    def __init__(self, session):
+        self.session = session
+        valor = session.get(self.CLAVE_SESION)
+        self.items = self._deserializar(valor)
+        # Valor actual en la sesión; un carrito en formato anterior se
+        # reescribe en el próximo guardar()
+        self._guardado = valor if isinstance(valor, str) else (None if valor else '')
+
+    @staticmethod
+    def _deserializar(valor):
+        """Convierte el valor de la sesión (cadena compacta o dict anterior) en un dict ordenado."""
+        if isinstance(valor, dict):
+            pares = valor.items()
+        elif isinstance(valor, str) and valor:
+            pares = (par.partition(':')[::2] for par in valor.split(','))
+        else:
+            return {}
+
+        items = {}
+        for producto_id, cantidad in pares:
+            try:
+                producto_id, cantidad = int(producto_id), int(cantidad)
+            except (TypeError, ValueError):
+                continue
+            if cantidad > 0:
+                items[producto_id] = cantidad
+        return items
+
+    @staticmethod
+    def _serializar(items):
+        return ','.join(f'{producto_id}:{cantidad}' for producto_id, cantidad in items.items())
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def total_items(self):
+        """Número total de unidades en el carrito."""
+        return sum(self.items.values())
+
+    def cantidad(self, producto_id):
+        return self.items.get(int(producto_id), 0)
+
+    def agregar(self, producto_id, cantidad=1):
+        producto_id = int(producto_id)
+        self.items[producto_id] = self.items.get(producto_id, 0) + cantidad
+
+    def eliminar(self, producto_id):
+        """Quita un producto. Devuelve True si estaba en el carrito."""
+        return self.items.pop(int(producto_id), None) is not None
+
+    def conservar(self, producto_ids):
+        """Quita los productos que no están en producto_ids. Devuelve los eliminados."""
+        eliminados = [producto_id for producto_id in self.items if producto_id not in producto_ids]
+        for producto_id in eliminados:
+            del self.items[producto_id]
+        return eliminados
+
+    def vaciar(self):
+        self.items = {}
+
+    def guardar(self):
+        """Escribe el carrito en la sesión solo si cambió."""
+        nuevo = self._serializar(self.items)
+        if nuevo == self._guardado:
+            return False
+        if nuevo:
+            self.session[self.CLAVE_SESION] = nuevo
+        else:
+            self.session.pop(self.CLAVE_SESION, None)
+        self._guardado = nuevo
+        return True
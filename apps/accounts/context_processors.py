@@ -16,59 +16,56 @@ def user_profile(request):
     
     if request.user.is_authenticated:
         try:
-            # Intentar obtener PerfilUsuario (nuevo modelo)
-            from .models import PerfilUsuario
-            perfil = PerfilUsuario.objects.select_related('usuario').get(usuario=request.user)
+            # Perfil desde el contexto de autorización (ya cargado si la vista lo usó)
+            from .authorization import obtener_contexto_autorizacion
+            contexto = obtener_contexto_autorizacion(request)
+            perfil = contexto.perfil
             context['perfil'] = perfil
             
             # Agregar información del carrito para usuarios consumidores
-            if perfil.tipo_cuenta == 'usuario':
+            if contexto.es_consumidor:
                 from apps.productservice.models import Producto
                 from decimal import Decimal
                 
-                cart_session = request.session.get('cart', {})
-                cart_count = sum(cart_session.values()) if cart_session else 0
+                from .cart import Carrito
+                
+                carrito = Carrito(request.session)
                 cart_total = Decimal('0')
                 cart_preview = []
                 
-                if cart_session:
-                    # Calcular total del carrito y crear preview
-                    productos_a_eliminar = []
+                if carrito:
+                    # Cargar todos los productos del carrito (con imagen principal) en una consulta
+                    productos = (
+                        Producto.objects.filter(activo=True)
+                        .with_main_image()
+                        .in_bulk(list(carrito.items))
+                    )
                     
-                    for i, (prod_id, qty) in enumerate(cart_session.items()):
-                        try:
-                            producto = Producto.objects.get(pk=int(prod_id), activo=True)
-                            cart_total += producto.precio * qty
-                            
-                            # Agregar a preview (solo primeros 3)
-                            if i < 3:
-                                cart_preview.append({
-                                    'producto': producto,
-                                    'cantidad': qty
-                                })
-                                
-                        except (Producto.DoesNotExist, ValueError):
-                            # Marcar productos que ya no existen para eliminarlos
-                            productos_a_eliminar.append(str(prod_id))
+                    # Eliminar productos que ya no existen; la sesión solo se escribe si cambió
+                    carrito.conservar(productos)
+                    carrito.guardar()
                     
-                    # Eliminar productos que ya no existen del carrito
-                    if productos_a_eliminar:
-                        for prod_id in productos_a_eliminar:
-                            cart_session.pop(prod_id, None)
-                        request.session['cart'] = cart_session
-                        cart_count = sum(cart_session.values())
+                    for i, (prod_id, qty) in enumerate(carrito.items.items()):
+                        producto = productos[prod_id]
+                        cart_total += producto.precio * qty
+                        
+                        # Agregar a preview (solo primeros 3)
+                        if i < 3:
+                            cart_preview.append({
+                                'producto': producto,
+                                'cantidad': qty
+                            })
+                
+                cart_count = carrito.total_items
                 
                 context['cart_count'] = cart_count
                 context['cart_total'] = cart_total
                 context['cart_preview'] = cart_preview
                     
-        except PerfilUsuario.DoesNotExist:
-            pass
         except ImportError:
             pass
         
-        # También intentar userprofile (modelo anterior)
-        if hasattr(request.user, 'userprofile'):
-            context['user_profile'] = request.user.userprofile
+        # Alias usado por plantillas anteriores
+        context['user_profile'] = context['perfil']
     
     return context 
\ No newline at end of file
@@ -3,7 +3,9 @@ Decoradores personalizados para control de acceso y permisos.
 
 Este módulo contiene decoradores que implementan lógica de autorización
 y control de acceso específica para la aplicación. Complementan el sistema
-de autenticación de Django con reglas de negocio personalizadas.
+de autenticación de Django con reglas de negocio personalizadas. El perfil
+y los indicadores de rol se leen del contexto de autorización de la
+petición (apps.accounts.authorization), que se carga una sola vez.
 
 Decoradores disponibles:
 - empresa_required: Requiere cuenta empresarial
@@ -11,16 +13,19 @@ Decoradores disponibles:
 - subscription_required: Requiere suscripción activa
 - plan_limit_check: Verifica límites del plan
 - profile_complete_required: Requiere perfil completo
+- rate_limit: Limita peticiones por usuario o IP
 """
 
 from functools import wraps
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
 from django.core.exceptions import PermissionDenied
 import logging
 
+from .authorization import obtener_contexto_autorizacion
+from .ratelimit import ip_cliente, registrar_peticion
 from .services import SuscripcionService
 
 logger = logging.getLogger(__name__)
@@ -52,13 +57,15 @@ def empresa_required(view_func=None, *, redirect_url=None, message=None):
             if not request.user.is_authenticated:
                 return redirect('login')
             
+            contexto = obtener_contexto_autorizacion(request)
+            
             # Verificar perfil
-            if not hasattr(request.user, 'userprofile'):
+            if not contexto.tiene_perfil:
                 messages.error(request, "Perfil de usuario no encontrado")
                 return redirect('perfil')
             
             # Verificar tipo de cuenta
-            if request.user.userprofile.tipo_cuenta != 'empresa':
+            if not contexto.es_empresa:
                 error_message = message or "Acceso denegado: Solo para cuentas empresariales"
                 
                 if request.headers.get('Content-Type') == 'application/json':
@@ -103,7 +110,7 @@ def admin_required(view_func=None, *, redirect_url=None, message=None):
                 return redirect('login')
             
             # Verificar perfil y permisos
-            if not hasattr(request.user, 'userprofile') or not request.user.userprofile.is_admin:
+            if not obtener_contexto_autorizacion(request).es_admin:
                 error_message = message or "Acceso denegado: Permisos de administrador requeridos"
                 
                 if request.headers.get('Content-Type') == 'application/json':
@@ -152,15 +159,16 @@ def subscription_required(plans=None, redirect_url=None, message=None):
             if not request.user.is_authenticated:
                 return redirect('login')
             
+            # Suscripción y plan desde los entitlements cacheados
+            contexto = obtener_contexto_autorizacion(request)
+            
             # Verificar perfil
-            if not hasattr(request.user, 'userprofile'):
+            if not contexto.tiene_perfil:
                 messages.error(request, "Perfil de usuario no encontrado")
                 return redirect('perfil')
             
-            perfil = request.user.userprofile
-            
             # Verificar suscripción activa
-            if not perfil.suscripcion_activa:
+            if not contexto.suscripcion_activa:
                 error_message = message or "Suscripción activa requerida para acceder a esta función"
                 
                 if request.headers.get('Content-Type') == 'application/json':
@@ -171,8 +179,7 @@ def subscription_required(plans=None, redirect_url=None, message=None):
             
             # Verificar plan específico si se especifica
             if plans:
-                suscripcion_actual = request.user.suscripciones.filter(activa=True).first()
-                if not suscripcion_actual or suscripcion_actual.plan not in plans:
+                if not contexto.tiene_plan(plans):
                     error_message = message or f"Plan {' o '.join(plans)} requerido para esta función"
                     
                     if request.headers.get('Content-Type') == 'application/json':
@@ -258,30 +265,15 @@ def profile_complete_required(view_func=None, *, redirect_url=None, message=None
             if not request.user.is_authenticated:
                 return redirect('login')
             
+            contexto = obtener_contexto_autorizacion(request)
+            
             # Verificar perfil
-            if not hasattr(request.user, 'userprofile'):
+            if not contexto.tiene_perfil:
                 messages.info(request, "Por favor completa tu perfil")
                 return redirect('editar_perfil')
             
-            perfil = request.user.userprofile
-            
             # Verificar campos requeridos según tipo de cuenta
-            campos_faltantes = []
-            
-            if perfil.tipo_cuenta == 'empresa':
-                if not perfil.empresa:
-                    campos_faltantes.append('nombre de empresa')
-            else:
-                if not request.user.first_name:
-                    campos_faltantes.append('nombre')
-                if not request.user.last_name:
-                    campos_faltantes.append('apellido')
-            
-            if not perfil.telefono:
-                campos_faltantes.append('teléfono')
-            
-            if not perfil.direccion:
-                campos_faltantes.append('dirección')
+            campos_faltantes = contexto.campos_faltantes
             
             if campos_faltantes:
                 error_message = message or f"Por favor completa los siguientes campos: {', '.join(campos_faltantes)}"
@@ -377,46 +369,57 @@ def owner_required(model_class, pk_url_kwarg='pk', redirect_url=None):
     return decorator
 
 
-def rate_limit(max_requests=10, window_minutes=1):
+def rate_limit(max_requests=10, window_minutes=1, *, key='user', methods=None,
+               scope=None, json_response=False):
     """
-    Decorador simple de rate limiting por usuario.
+    Decorador de rate limiting con ventana deslizante (ver apps.accounts.ratelimit).
     
     Args:
-        max_requests: Máximo número de peticiones
-        window_minutes: Ventana de tiempo en minutos
+        max_requests: Máximo número de peticiones por ventana
+        window_minutes: Ventana de tiempo en minutos (admite fracciones)
+        key: 'user' (usuarios anónimos sin límite), 'ip' o 'user_or_ip'
+        methods: Métodos HTTP limitados; None limita todos
+        scope: Nombre del contador; por defecto el de la vista
+        json_response: Responder 429 en JSON aunque el cliente no lo pida
         
     Usage:
         @rate_limit(max_requests=5, window_minutes=1)
         def api_endpoint(request):
             # Máximo 5 peticiones por minuto
             pass
+            
+        login_view = rate_limit(10, 5, key='ip', methods=('POST',))(LoginView.as_view())
     """
+    ventana = max(1, int(window_minutes * 60))
+    
     def decorator(func):
+        alcance = scope or f'{func.__module__}.{func.__name__}'
+        
         @wraps(func)
         def wrapper(request, *args, **kwargs):
-            # Implementación básica usando cache de Django
-            from django.core.cache import cache
-            from django.utils import timezone
+            if methods and request.method not in methods:
+                return func(request, *args, **kwargs)
             
-            if request.user.is_authenticated:
-                cache_key = f"rate_limit_{request.user.id}_{func.__name__}"
-                
-                # Obtener contador actual
-                current_requests = cache.get(cache_key, 0)
-                
-                if current_requests >= max_requests:
-                    if request.headers.get('Content-Type') == 'application/json':
-                        return JsonResponse({
-                            'error': 'Demasiadas peticiones. Intenta más tarde.'
-                        }, status=429)
-                    
-                    messages.warning(request, 'Demasiadas peticiones. Intenta más tarde.')
-                    return HttpResponseForbidden('Rate limit exceeded')
-                
-                # Incrementar contador
-                cache.set(cache_key, current_requests + 1, window_minutes * 60)
+            if key != 'ip' and request.user.is_authenticated:
+                identificador = f'user:{request.user.id}'
+            elif key in ('ip', 'user_or_ip'):
+                identificador = f'ip:{ip_cliente(request)}'
+            else:
+                return func(request, *args, **kwargs)
             
-            return func(request, *args, **kwargs)
+            resultado = registrar_peticion(alcance, identificador, max_requests, ventana)
+            if resultado.permitido:
+                return func(request, *args, **kwargs)
+            
+            logger.warning(f"Rate limit excedido en {alcance} por {identificador}")
+            mensaje = 'Demasiadas peticiones. Intenta más tarde.'
+            if json_response or 'application/json' in request.headers.get('Accept', '') \
+                    or request.headers.get('Content-Type') == 'application/json':
+                response = JsonResponse({'error': mensaje}, status=429)
+            else:
+                response = HttpResponse(mensaje, status=429, content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = str(resultado.reintentar_en)
+            return response
         return wrapper
     
     return decorator
@@ -448,33 +451,34 @@ class PermissionMixin:
         if not request.user.is_authenticated:
             return redirect('login')
         
+        contexto = obtener_contexto_autorizacion(request)
+        
         # Verificar perfil completo si es requerido
         if self.check_profile_complete:
-            if not hasattr(request.user, 'userprofile'):
+            if not contexto.tiene_perfil:
                 messages.info(request, "Por favor completa tu perfil")
                 return redirect('editar_perfil')
         
         # Verificar permisos específicos
         if 'empresa' in self.required_permissions:
-            if not hasattr(request.user, 'userprofile') or request.user.userprofile.tipo_cuenta != 'empresa':
+            if not contexto.es_empresa:
                 messages.error(request, "Acceso denegado: Solo para cuentas empresariales")
                 return HttpResponseForbidden()
         
         if 'admin' in self.required_permissions:
-            if not hasattr(request.user, 'userprofile') or not request.user.userprofile.is_admin:
+            if not contexto.es_admin:
                 messages.error(request, "Acceso denegado: Permisos de administrador requeridos")
                 return HttpResponseForbidden()
         
         # Verificar suscripción si es requerida
         if self.required_subscription:
-            if not hasattr(request.user, 'userprofile') or not request.user.userprofile.suscripcion_activa:
+            if not contexto.suscripcion_activa:
                 messages.warning(request, "Suscripción activa requerida")
                 return redirect('suscripciones')
         
         # Verificar plan específico
         if self.required_plans:
-            suscripcion = request.user.suscripciones.filter(activa=True).first()
-            if not suscripcion or suscripcion.plan not in self.required_plans:
+            if not contexto.tiene_plan(self.required_plans):
                 messages.warning(request, f"Plan {' o '.join(self.required_plans)} requerido")
                 return redirect('suscripciones')
         
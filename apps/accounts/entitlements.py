@@ -0,0 +1,201 @@
+"""
+Derechos de uso (entitlements) de cada usuario según su plan.
+
+Reúne en un solo objeto cacheado lo que antes se consultaba en cada
+petición protegida: la suscripción activa, el plan, sus límites y el uso
+actual de productos, servicios y landing pages (los contadores
+desnormalizados de PerfilUsuario). Los decoradores
+subscription_required y plan_limit_check y los servicios create_* lo
+leen con una sola lectura de caché.
+
+La entrada depende del tag tag_entitlements del usuario, cuya versión
+cambia (al confirmar la transacción) cuando cambian Suscripcion,
+PerfilUsuario, Producto, Servicio o LandingPage del usuario; ver
+apps.accounts.signals. La versión se lee antes de consultar la base de
+datos, así que un cálculo que empezó antes del cambio se guarda con la
+versión anterior y no vuelve a servirse (un cache.delete no lo evitaría).
+
+Uso:
+    entitlements = obtener_entitlements(request.user)
+    if not entitlements.permite('productos'):
+        ...
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache_utils import invalidar_tags, obtener_o_calcular, tag_entitlements
+from .models import PerfilUsuario, Suscripcion
+
+logger = logging.getLogger(__name__)
+
+# Las invalidaciones cubren todos los cambios; el TTL solo acota la deriva
+ENTITLEMENTS_TTL = 3600
+
+
+def _clave(user_id):
+    return f'entitlements:{user_id}'
+
+
+class Entitlements:
+    """
+    Plan, límites y uso actual de un usuario.
+
+    Se guarda en caché como diccionario (ver como_dict) para que cambios
+    en esta clase no invaliden las entradas ya serializadas.
+    """
+
+    # Recurso -> clave del límite en SuscripcionService.PLANES_CONFIG
+    RECURSOS = {
+        'productos': 'max_productos',
+        'servicios': 'max_servicios',
+        'landing_pages': 'landing_pages',
+    }
+
+    def __init__(self, user_id, tiene_perfil=False, plan_suscripcion=None,
+                 estado_suscripcion=None, fecha_vencimiento=None, uso=None):
+        self.user_id = user_id
+        self.tiene_perfil = tiene_perfil
+        self.plan_suscripcion = plan_suscripcion
+        self.estado_suscripcion = estado_suscripcion
+        self.fecha_vencimiento = fecha_vencimiento
+        self.uso = uso or {}
+
+    @property
+    def plan(self):
+        """Plan que rige los límites (básico si no hay suscripción activa)."""
+        return self.plan_suscripcion or 'basico'
+
+    @property
+    def suscripcion_activa(self):
+        """Mismo criterio que PerfilUsuario.suscripcion_activa, evaluado al leer."""
+        if self.estado_suscripcion != 'activa':
+            return False
+        return not (self.fecha_vencimiento and self.fecha_vencimiento < timezone.now())
+
+    def tiene_plan(self, planes):
+        """Indica si la suscripción activa es de alguno de los planes dados."""
+        return self.plan_suscripcion is not None and self.plan_suscripcion in planes
+
+    def limite(self, recurso):
+        """Límite del recurso en el plan actual (-1 = ilimitado)."""
+        from .services import SuscripcionService
+
+        config = SuscripcionService.PLANES_CONFIG.get(self.plan, SuscripcionService.PLANES_CONFIG['basico'])
+        return config[self.RECURSOS[recurso]]
+
+    def permite(self, recurso):
+        """Indica si el usuario puede crear un recurso más."""
+        return self.verificar(recurso)['allowed']
+
+    def verificar(self, recurso):
+        """
+        Verifica el límite de un recurso.
+
+        Returns:
+            dict: {'allowed': bool, 'current': int, 'limit': int, 'message': str}
+        """
+        if recurso not in self.RECURSOS:
+            return {'allowed': False, 'message': 'Tipo de recurso no válido'}
+
+        actual = self.uso.get(recurso, 0)
+        limite = self.limite(recurso)
+
+        if limite == -1:
+            return {
+                'allowed': True,
+                'current': actual,
+                'limit': 'Ilimitado',
+                'message': 'Sin límites en tu plan actual'
+            }
+
+        permitido = actual < limite
+        if permitido:
+            mensaje = f"Tienes {actual} de {limite} {recurso} permitidos"
+        else:
+            mensaje = f"Has alcanzado el límite de {limite} {recurso}. Considera actualizar tu plan."
+
+        return {
+            'allowed': permitido,
+            'current': actual,
+            'limit': limite,
+            'message': mensaje
+        }
+
+    def como_dict(self):
+        return {
+            'user_id': self.user_id,
+            'tiene_perfil': self.tiene_perfil,
+            'plan_suscripcion': self.plan_suscripcion,
+            'estado_suscripcion': self.estado_suscripcion,
+            'fecha_vencimiento': self.fecha_vencimiento,
+            'uso': self.uso,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(**datos)
+
+
+def obtener_entitlements(user):
+    """
+    Obtiene los entitlements del usuario, desde caché si es posible.
+
+    Args:
+        user (User): Usuario autenticado
+
+    Returns:
+        Entitlements: Plan, límites y uso del usuario
+    """
+    datos = obtener_o_calcular(
+        _clave(user.pk),
+        lambda: calcular_entitlements(user).como_dict(),
+        tags=[tag_entitlements(user.pk)],
+        ttl=ENTITLEMENTS_TTL,
+    )
+    return Entitlements.desde_dict(datos)
+
+
+def calcular_entitlements(user):
+    """Calcula los entitlements consultando la base de datos."""
+    perfil = PerfilUsuario.objects.filter(usuario_id=user.pk).values(
+        'estado_suscripcion', 'fecha_vencimiento',
+        'total_productos_activos', 'total_servicios_activos', 'total_landing_pages',
+    ).first()
+    if perfil is None:
+        return Entitlements(user.pk)
+
+    plan_suscripcion = (
+        Suscripcion.objects.filter(usuario_id=user.pk, activa=True)
+        .order_by('-fecha_inicio')
+        .values_list('plan', flat=True)
+        .first()
+    )
+
+    # Contadores mantenidos por apps.accounts.signals
+    uso = {
+        'productos': perfil['total_productos_activos'],
+        'servicios': perfil['total_servicios_activos'],
+        'landing_pages': perfil['total_landing_pages'],
+    }
+
+    return Entitlements(
+        user.pk,
+        tiene_perfil=True,
+        plan_suscripcion=plan_suscripcion,
+        estado_suscripcion=perfil['estado_suscripcion'],
+        fecha_vencimiento=perfil['fecha_vencimiento'],
+        uso=uso,
+    )
+
+
+def invalidar_entitlements(user_id):
+    """Invalida los entitlements cacheados de un usuario (nueva versión de su tag)."""
+    invalidar_tags(tag_entitlements(user_id))
+
+
+def invalidar_entitlements_al_confirmar(user_id):
+    """Invalida los entitlements cuando la transacción actual haga commit."""
+    transaction.on_commit(lambda: invalidar_entitlements(user_id))
@@ -0,0 +1,186 @@
+"""
+Comando que mide la E/S de sesión por petición en el flujo de compra.
+
+Simula la navegación de un consumidor (dashboard, vista previa del
+carrito, agregar productos, carrito) con cada motor de sesiones indicado
+y cuenta, por petición, las lecturas y escrituras de la tabla
+django_session y de la caché de sesiones, además del tiempo medio.
+
+Los datos de prueba (usuarios y productos) se crean dentro de una
+transacción que se revierte al terminar.
+
+Uso:
+    python manage.py benchmark_sesiones
+    python manage.py benchmark_sesiones --repeticiones 20
+    python manage.py benchmark_sesiones --motores db cached_db
+"""
+
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.productservice.models import Producto
+
+MOTORES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+
+# Prefijo de las claves de los motores cache y cached_db
+PREFIJO_CLAVES_SESION = 'django.contrib.sessions.'
+
+
+class _ContadorCache:
+    """Cuenta las operaciones sobre la caché de sesiones mientras está activo."""
+
+    LECTURAS = ('get', 'get_many', 'has_key')
+    ESCRITURAS = ('set', 'add', 'delete', 'touch')
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.lecturas = 0
+        self.escrituras = 0
+
+    def __enter__(self):
+        for nombre in self.LECTURAS + self.ESCRITURAS:
+            original = getattr(self.cache, nombre)
+            es_lectura = nombre in self.LECTURAS
+
+            def contar(*args, _original=original, _es_lectura=es_lectura, **kwargs):
+                if self.es_de_sesion(args[0] if args else kwargs.get('key')):
+                    if _es_lectura:
+                        self.lecturas += 1
+                    else:
+                        self.escrituras += 1
+                return _original(*args, **kwargs)
+
+            setattr(self.cache, nombre, contar)
+        return self
+
+    @staticmethod
+    def es_de_sesion(clave):
+        """La caché de sesiones puede ser la misma que usa el resto de la app."""
+        claves = clave if isinstance(clave, (list, tuple)) else [clave]
+        return any(str(c).startswith(PREFIJO_CLAVES_SESION) for c in claves)
+
+    def __exit__(self, *exc):
+        # Volver a los métodos de la clase
+        for nombre in self.LECTURAS + self.ESCRITURAS:
+            self.cache.__dict__.pop(nombre, None)
+
+
+class Command(BaseCommand):
+    help = 'Mide lecturas y escrituras de sesión por petición con distintos motores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--motores',
+            nargs='+',
+            choices=sorted(MOTORES),
+            default=['db', 'cached_db'],
+            help='Motores de sesión a comparar. Por defecto: db cached_db',
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=10,
+            help='Veces que se repite el recorrido de compra. Por defecto: 10',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'motor':<10} {'peticiones':>10} {'BD lect.':>9} {'BD escr.':>9} "
+            f"{'caché lect.':>12} {'caché escr.':>12} {'ms':>8}"
+        )
+        for motor in options['motores']:
+            with override_settings(SESSION_ENGINE=MOTORES[motor]):
+                fila = self.medir(max(1, options['repeticiones']))
+            peticiones = fila['peticiones']
+            self.stdout.write(
+                f"{motor:<10} {peticiones:>10} "
+                f"{fila['bd_lecturas'] / peticiones:>9.2f} {fila['bd_escrituras'] / peticiones:>9.2f} "
+                f"{fila['cache_lecturas'] / peticiones:>12.2f} {fila['cache_escrituras'] / peticiones:>12.2f} "
+                f"{fila['segundos'] * 1000 / peticiones:>8.1f}"
+            )
+        self.stdout.write('Valores medios por petición')
+
+    def medir(self, repeticiones):
+        """Ejecuta el recorrido con el motor activo y devuelve los totales."""
+        with transaction.atomic():
+            cliente, productos, session = self.preparar()
+            recorrido = self.recorrido(productos)
+
+            totales = dict.fromkeys(
+                ('peticiones', 'bd_lecturas', 'bd_escrituras', 'cache_lecturas', 'cache_escrituras', 'segundos'), 0
+            )
+            cache_sesiones = caches[settings.SESSION_CACHE_ALIAS]
+            for _ in range(repeticiones):
+                for url, cabeceras in recorrido:
+                    with CaptureQueriesContext(connection) as consultas, _ContadorCache(cache_sesiones) as contador:
+                        inicio = time.perf_counter()
+                        cliente.get(url, **cabeceras)
+                        totales['segundos'] += time.perf_counter() - inicio
+
+                    sesion = [c['sql'].lstrip().upper() for c in consultas if 'django_session' in c['sql']]
+                    totales['bd_lecturas'] += sum(1 for sql in sesion if sql.startswith('SELECT'))
+                    totales['bd_escrituras'] += sum(1 for sql in sesion if not sql.startswith('SELECT'))
+                    totales['cache_lecturas'] += contador.lecturas
+                    totales['cache_escrituras'] += contador.escrituras
+                    totales['peticiones'] += 1
+
+            session.delete()
+            transaction.set_rollback(True)
+        return totales
+
+    def preparar(self):
+        """Crea un consumidor con sesión iniciada y tres productos de una empresa."""
+        empresa = User.objects.create_user('benchmark_empresa', password=None)
+        consumidor = User.objects.create_user('benchmark_consumidor', password=None)
+        productos = [
+            Producto.objects.create(
+                usuario=empresa,
+                nombre=f'Producto {numero}',
+                descripcion='Producto de prueba',
+                precio=10 * numero,
+                stock=1000,
+                categoria='Pruebas',
+            )
+            for numero in range(1, 4)
+        ]
+
+        # Sesión creada a mano: Client.force_login() requiere el middleware de mensajes
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(consumidor.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = consumidor.get_session_auth_hash()
+        session.save()
+
+        cliente = Client()
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        return cliente, productos, session
+
+    def recorrido(self, productos):
+        """Peticiones de una visita típica: (url, cabeceras)."""
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        return [
+            (reverse('home'), {}),
+            (reverse('cart_preview'), ajax),
+            (reverse('add_to_cart', args=[productos[0].pk]), ajax),
+            (reverse('add_to_cart', args=[productos[1].pk]), ajax),
+            (reverse('cart_preview'), ajax),
+            (reverse('home'), {}),
+            (reverse('add_to_cart', args=[productos[0].pk]), ajax),
+            (reverse('cart'), {}),
+            (reverse('cart_preview'), ajax),
+            (reverse('home'), {}),
+        ]
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
+from apps.accounts.cache_utils import TAG_CATALOGO, invalidar_tags, invalidar_tags_al_confirmar
 from apps.productservice.models import Producto, Servicio
 from django.db import transaction
 
@@ -77,11 +77,13 @@ class Command(BaseCommand):
                         self.stdout.write(f'  ✅ {productos_updated} productos actualizados: "{original}" → "{clean}"')
                     if servicios_updated > 0:
                         self.stdout.write(f'  ✅ {servicios_updated} servicios actualizados: "{original}" → "{clean}"')
+            
+            # QuerySet.update() no dispara señales: invalidar el catálogo manualmente
+            invalidar_tags_al_confirmar(TAG_CATALOGO)
         
         # Limpiar caché si se solicita
         if options['clear_cache']:
-            cache.delete('product_categories')
-            cache.delete('category_counts')
+            invalidar_tags(TAG_CATALOGO)
             self.stdout.write(self.style.SUCCESS('🗑️ Caché de categorías limpiado'))
         
         # Mostrar resumen final
@@ -0,0 +1,77 @@
+"""
+Comando que elimina por lotes los eventos de actividad antiguos.
+
+ActivityEvent es append-only y sus IDs crecen con la fecha, así que la
+poda busca el último ID anterior al corte y borra rangos de IDs sin
+recorrer la tabla completa. Pensado para ejecutarse periódicamente
+(cron o scheduler de la plataforma).
+
+Uso:
+    python manage.py podar_actividad
+    python manage.py podar_actividad --dias 30
+    python manage.py podar_actividad --dias 90 --batch-size 5000 --dry-run
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.accounts.models import ActivityEvent
+
+
+class Command(BaseCommand):
+    help = 'Elimina eventos de actividad más antiguos que --dias'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=90,
+            help='Antigüedad máxima de los eventos conservados. Por defecto: 90',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Eventos eliminados por lote. Por defecto: 5000',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra cuántos eventos se eliminarían',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        corte = timezone.now() - timedelta(days=max(0, options['dias']))
+
+        ultimo_id = (
+            ActivityEvent.objects.filter(fecha__lt=corte)
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if ultimo_id is None:
+            self.stdout.write('No hay eventos anteriores al corte')
+            return
+
+        if options['dry_run']:
+            total = ActivityEvent.objects.filter(id__lte=ultimo_id).count()
+            self.stdout.write(self.style.WARNING(f'Se eliminarían {total} eventos anteriores a {corte:%Y-%m-%d}'))
+            return
+
+        eliminados = 0
+        while True:
+            ids = list(
+                ActivityEvent.objects.filter(id__lte=ultimo_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # Rango contiguo de IDs: un DELETE simple por lote
+            borrados, _ = ActivityEvent.objects.filter(id__gte=ids[0], id__lte=ids[-1]).delete()
+            eliminados += borrados
+
+        self.stdout.write(self.style.SUCCESS(f'{eliminados} eventos eliminados anteriores a {corte:%Y-%m-%d}'))
@@ -0,0 +1,96 @@
+"""
+Comando que genera los snapshots HTML de las páginas públicas de empresa.
+
+Para cada empresa y página (página de empresa, catálogo completo y landing
+page) comprueba si existe el snapshot de la versión de contenido actual y,
+si no, lo renderiza como visitante anónimo y lo escribe en disco con sus
+variantes comprimidas (ver apps.accounts.prerender). Las páginas sin
+cambios no se vuelven a renderizar, así que puede ejecutarse tras cada
+despliegue o periódicamente.
+
+En una ejecución completa también elimina los snapshots de usuarios que
+ya no son empresa.
+
+Uso:
+    python manage.py prerender_company_pages
+    python manage.py prerender_company_pages --empresa 12 15
+    python manage.py prerender_company_pages --paginas landing --forzar
+"""
+
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import PerfilUsuario
+from apps.accounts.prerender import (
+    PAGINAS, activado, directorio_raiz, generar_snapshot, ruta_snapshot, version_empresa,
+)
+
+
+class Command(BaseCommand):
+    help = 'Genera los snapshots HTML de las páginas públicas de empresa que cambiaron'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            nargs='+',
+            help='IDs de usuario de las empresas a procesar. Por defecto: todas',
+        )
+        parser.add_argument(
+            '--paginas',
+            nargs='+',
+            choices=sorted(PAGINAS),
+            default=sorted(PAGINAS),
+            help='Páginas a generar. Por defecto: todas',
+        )
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Regenera también los snapshots que están al día',
+        )
+
+    def handle(self, *args, **options):
+        if not activado():
+            self.stdout.write(self.style.WARNING('PRERENDER_ENABLED está desactivado; no se genera nada'))
+            return
+
+        empresas = PerfilUsuario.objects.filter(tipo_cuenta='empresa')
+        if options['empresa']:
+            empresas = empresas.filter(usuario_id__in=options['empresa'])
+        empresa_ids = list(empresas.order_by('usuario_id').values_list('usuario_id', flat=True))
+
+        generados = al_dia = sin_pagina = 0
+        for user_id in empresa_ids:
+            version = version_empresa(user_id)
+            for pagina in options['paginas']:
+                if not options['forzar'] and os.path.exists(ruta_snapshot(pagina, user_id, version)):
+                    al_dia += 1
+                    continue
+                if generar_snapshot(pagina, user_id, version):
+                    generados += 1
+                    if options['verbosity'] >= 2:
+                        self.stdout.write(f'  {pagina} de empresa {user_id}')
+                else:
+                    sin_pagina += 1
+
+        huerfanos = 0 if options['empresa'] else self.podar_huerfanos(options['paginas'], set(empresa_ids))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(empresa_ids)} empresas: {generados} snapshots generados, {al_dia} al día, '
+            f'{sin_pagina} sin página pública, {huerfanos} directorios huérfanos eliminados'
+        ))
+
+    def podar_huerfanos(self, paginas, empresa_ids):
+        """Elimina los directorios de snapshots de usuarios que ya no son empresa."""
+        eliminados = 0
+        for pagina in paginas:
+            directorio = os.path.join(directorio_raiz(), pagina)
+            if not os.path.isdir(directorio):
+                continue
+            for nombre in os.listdir(directorio):
+                if nombre.isdigit() and int(nombre) not in empresa_ids:
+                    shutil.rmtree(os.path.join(directorio, nombre), ignore_errors=True)
+                    eliminados += 1
+        return eliminados
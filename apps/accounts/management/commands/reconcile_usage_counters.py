@@ -0,0 +1,126 @@
+"""
+Comando que recalcula los contadores de uso de PerfilUsuario.
+
+Los contadores (productos y servicios activos, landing pages y pedidos)
+se mantienen con señales, que no se disparan con QuerySet.update() ni
+bulk_create(). Este comando los recalcula con un GROUP BY por tabla,
+informa de la deriva encontrada y corrige solo los perfiles que
+difieren. Cada lote bloquea sus perfiles (select_for_update) mientras
+cuenta, así que los incrementos concurrentes esperan y no se pierden.
+
+Uso:
+    python manage.py reconcile_usage_counters
+    python manage.py reconcile_usage_counters --dry-run
+    python manage.py reconcile_usage_counters --batch-size 500 -v 2
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from apps.accounts.entitlements import invalidar_entitlements_al_confirmar
+from apps.accounts.models import PerfilUsuario
+from apps.productservice.models import Pedido, Producto, Servicio
+from apps.webpages.models import LandingPage
+
+# Contador -> (modelo, filtros)
+ORIGENES = {
+    'total_productos_activos': (Producto, {'activo': True}),
+    'total_servicios_activos': (Servicio, {'activo': True}),
+    'total_landing_pages': (LandingPage, {}),
+    'total_pedidos': (Pedido, {}),
+}
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de uso de los perfiles e informa la deriva'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Perfiles procesados por lote. Por defecto: 1000',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa la deriva sin corregirla',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+
+        revisados = 0
+        corregidos = 0
+        deriva = dict.fromkeys(ORIGENES, 0)
+        ultimo_id = 0
+
+        while True:
+            with transaction.atomic():
+                perfiles = PerfilUsuario.objects.filter(id__gt=ultimo_id).order_by('id')
+                if not dry_run:
+                    perfiles = perfiles.select_for_update()
+                lote = list(perfiles.values('id', 'usuario_id', *ORIGENES)[:batch_size])
+                if not lote:
+                    break
+                ultimo_id = lote[-1]['id']
+                revisados += len(lote)
+
+                reales = self.contar([perfil['usuario_id'] for perfil in lote])
+                cambios = []
+                for perfil in lote:
+                    diferencias = {}
+                    for campo in ORIGENES:
+                        real = reales[campo].get(perfil['usuario_id'], 0)
+                        if perfil[campo] != real:
+                            diferencias[campo] = real
+                            deriva[campo] += abs(real - perfil[campo])
+                    if not diferencias:
+                        continue
+
+                    cambios.append(PerfilUsuario(id=perfil['id'], usuario_id=perfil['usuario_id'], **{
+                        campo: reales[campo].get(perfil['usuario_id'], 0) for campo in ORIGENES
+                    }))
+                    if options['verbosity'] >= 2:
+                        detalle = ', '.join(
+                            f'{campo}: {perfil[campo]} -> {real}' for campo, real in diferencias.items()
+                        )
+                        self.stdout.write(f"  usuario {perfil['usuario_id']}: {detalle}")
+
+                corregidos += len(cambios)
+                if cambios and not dry_run:
+                    PerfilUsuario.objects.bulk_update(cambios, list(ORIGENES))
+                    for perfil in cambios:
+                        invalidar_entitlements_al_confirmar(perfil.usuario_id)
+
+        resumen = ', '.join(f'{campo} {total}' for campo, total in deriva.items() if total)
+        if not corregidos:
+            self.stdout.write(self.style.SUCCESS(f'{revisados} perfiles revisados, sin deriva'))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'{corregidos} de {revisados} perfiles con deriva ({resumen}); no se corrigió nada'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{corregidos} de {revisados} perfiles corregidos ({resumen})'
+            ))
+
+    def contar(self, usuario_ids):
+        """
+        Cuenta los recursos reales de los usuarios con un GROUP BY por tabla.
+
+        Returns:
+            dict: {contador: {usuario_id: total}}
+        """
+        return {
+            campo: dict(
+                modelo.objects.filter(usuario_id__in=usuario_ids, **filtros)
+                .order_by()
+                .values('usuario_id')
+                .annotate(total=Count('id'))
+                .values_list('usuario_id', 'total')
+            )
+            for campo, (modelo, filtros) in ORIGENES.items()
+        }
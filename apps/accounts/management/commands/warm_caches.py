@@ -0,0 +1,181 @@
+"""
+Comando que precalienta los cachés de dashboards tras un despliegue.
+
+Después de cada deploy todos los cachés están fríos y los primeros
+usuarios pagan el cálculo completo. Este comando precalcula en hilos
+paralelos las métricas de admin y sus tendencias, las estadísticas y
+categorías del marketplace, los items destacados y los dashboards de
+las empresas más activas, dentro de un presupuesto de tiempo: los hilos
+no empiezan tareas nuevas al agotarse y el comando termina aunque alguna
+siga en curso (los hilos son daemon y se abandonan), así que el arranque
+nunca espera más que --presupuesto. Lo que no termina a tiempo se deja
+para la primera petición.
+
+Con el backend de caché en memoria local cada proceso tiene su propia
+caché, así que calentarla desde un comando no sirve a los workers de
+Gunicorn; en ese caso el comando no hace nada salvo con --forzar.
+
+Uso:
+    python manage.py warm_caches
+    python manage.py warm_caches --empresas 50 --hilos 8
+    python manage.py warm_caches --presupuesto 20 --forzar
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.accounts.services import ActivityService, DashboardService, MetricsService
+from apps.productservice.services import CatalogService
+
+logger = logging.getLogger(__name__)
+
+# Backends cuya caché no se comparte entre procesos
+BACKENDS_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Días de ventas considerados para elegir las empresas más activas
+DIAS_ACTIVIDAD = 30
+
+
+class Command(BaseCommand):
+    help = 'Precalcula los cachés de dashboards y marketplace en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresas',
+            type=int,
+            default=20,
+            help='Número de dashboards de empresa a precalcular. Por defecto: 20',
+        )
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            default=4,
+            help='Hilos de trabajo en paralelo. Por defecto: 4',
+        )
+        parser.add_argument(
+            '--presupuesto',
+            type=float,
+            default=60,
+            help='Segundos máximos de precálculo. Por defecto: 60',
+        )
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Calentar aunque la caché sea local al proceso',
+        )
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES['default']['BACKEND']
+        if backend in BACKENDS_LOCALES and not options['forzar']:
+            self.stdout.write(self.style.WARNING(
+                f'La caché ({backend}) no se comparte entre procesos; no hay nada que precalentar'
+            ))
+            return
+
+        tareas = self.construir_tareas(max(0, options['empresas']))
+        presupuesto = max(1.0, options['presupuesto'])
+        inicio = time.monotonic()
+        limite = inicio + presupuesto
+
+        cola = queue.SimpleQueue()
+        for tarea in tareas:
+            cola.put(tarea)
+        resultados = {}
+
+        def trabajador():
+            # Ninguna tarea empieza después del límite
+            while time.monotonic() < limite:
+                try:
+                    nombre, tarea = cola.get_nowait()
+                except queue.Empty:
+                    return
+                resultados[nombre] = self.ejecutar(nombre, tarea)
+
+        # Hilos daemon (no ThreadPoolExecutor, que los espera al salir del
+        # intérprete): una tarea lenta no retiene el proceso pasado el límite
+        hilos = [
+            threading.Thread(target=trabajador, name=f'warm_caches-{numero}', daemon=True)
+            for numero in range(max(1, options['hilos']))
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join(max(0, limite - time.monotonic()))
+
+        terminados = dict(resultados)
+        correctos = sum(1 for correcto in terminados.values() if correcto)
+        fallidos = len(terminados) - correctos
+        pendientes = len(tareas) - len(terminados)
+        duracion = time.monotonic() - inicio
+
+        mensaje = f'{correctos} cachés precalculados en {duracion:.1f}s'
+        if fallidos:
+            mensaje += f', {fallidos} con error'
+        if pendientes:
+            mensaje += f', {pendientes} sin terminar dentro del presupuesto de {presupuesto:.0f}s'
+        estilo = self.style.SUCCESS if not (fallidos or pendientes) else self.style.WARNING
+        self.stdout.write(estilo(mensaje))
+
+    def construir_tareas(self, num_empresas):
+        """
+        Lista las tareas de precálculo en orden de prioridad.
+
+        Returns:
+            list: [(nombre, callable)] con las tareas globales primero
+        """
+        tareas = [
+            ('métricas de admin', lambda: DashboardService.get_admin_metrics(force_refresh=True)),
+            ('tendencias de admin', MetricsService.get_user_activity_trends),
+            ('actividad reciente', ActivityService.get_recent),
+            ('estadísticas del marketplace', lambda: DashboardService.get_marketplace_stats(force_refresh=True)),
+            ('categorías', lambda: DashboardService.get_category_counts(force_refresh=True)),
+            ('destacados', lambda: CatalogService.get_featured_items(force_refresh=True)),
+        ]
+
+        for empresa in self.empresas_mas_activas(num_empresas):
+            tareas.append((
+                f'dashboard de empresa {empresa.id}',
+                lambda empresa=empresa: DashboardService.get_company_dashboard_data(empresa, force_refresh=True),
+            ))
+        return tareas
+
+    def empresas_mas_activas(self, limite):
+        """Empresas activas ordenadas por pedidos recientes y último acceso."""
+        if not limite:
+            return []
+
+        desde = timezone.localdate() - timedelta(days=DIAS_ACTIVIDAD)
+        return list(
+            User.objects.filter(userprofile__tipo_cuenta='empresa', is_active=True)
+            .annotate(pedidos_recientes=Coalesce(
+                Sum('ventas_diarias__pedidos_total', filter=Q(ventas_diarias__fecha__gte=desde)), 0
+            ))
+            .order_by('-pedidos_recientes', F('last_login').desc(nulls_last=True), 'id')[:limite]
+        )
+
+    def ejecutar(self, nombre, tarea):
+        """Ejecuta una tarea en un hilo de trabajo. Devuelve True si terminó sin errores."""
+        try:
+            tarea()
+            logger.info(f"Caché precalculado: {nombre}")
+            return True
+        except Exception as e:
+            logger.error(f"Error precalculando {nombre}: {e}")
+            return False
+        finally:
+            # Cada hilo abre su propia conexión a la base de datos
+            connection.close()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_delete_landingpage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfilusuario',
+            index=models.Index(fields=['fecha_registro'], name='accounts_pe_fecha_r_d9a39a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfilusuario',
+            index=models.Index(fields=['tipo_cuenta', 'fecha_registro'], name='accounts_pe_tipo_cu_26087a_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_perfilusuario_accounts_pe_fecha_r_d9a39a_idx_and_more'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verbo', models.PositiveSmallIntegerField(choices=[(1, 'Usuario registrado'), (2, 'Producto creado'), (3, 'Producto actualizado'), (4, 'Servicio creado'), (5, 'Servicio actualizado'), (6, 'Pedido realizado'), (7, 'Estado de pedido actualizado'), (8, 'Usuario activado'), (9, 'Usuario desactivado')], verbose_name='Verbo')),
+                ('objetivo_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID del Objetivo')),
+                ('detalle', models.CharField(blank=True, help_text='Nombre del objetivo o nuevo estado', max_length=100, verbose_name='Detalle')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, help_text='Usuario que realizó la acción', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Actor')),
+                ('objetivo_tipo', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='contenttypes.contenttype', verbose_name='Tipo de Objetivo')),
+            ],
+            options={
+                'verbose_name': 'Evento de Actividad',
+                'verbose_name_plural': 'Eventos de Actividad',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['fecha'], name='accounts_ac_fecha_673f2d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+"""
+Índices para la búsqueda y paginación de usuarios en manage_users.
+
+auth_user pertenece a django.contrib.auth, así que sus índices se crean
+con SQL en lugar de en Meta.indexes:
+
+- (date_joined, id) para la paginación por cursor (todas las bases).
+- En PostgreSQL, índices trigram (pg_trgm) sobre UPPER(username),
+  UPPER(email) y UPPER(empresa) para icontains, e índices
+  text_pattern_ops para la búsqueda por prefijo de términos cortos.
+  Si la extensión pg_trgm no puede crearse, solo se omiten los trigram.
+"""
+
+import logging
+
+from django.db import migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+INDICE_PAGINACION = 'accounts_user_date_joined_id_idx'
+
+# (nombre, tabla, columna)
+COLUMNAS_BUSQUEDA = (
+    ('accounts_user_username', 'auth_user', 'username'),
+    ('accounts_user_email', 'auth_user', 'email'),
+    ('accounts_perfil_empresa', 'accounts_perfilusuario', 'empresa'),
+)
+
+
+def crear_indices(apps, schema_editor):
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDICE_PAGINACION} ON auth_user (date_joined, id)'
+    )
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    # Prefijo: UPPER(col) LIKE 'AB%' (istartswith)
+    for nombre, tabla, columna in COLUMNAS_BUSQUEDA:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre}_prefijo_idx '
+            f'ON {tabla} (UPPER({columna}::text) text_pattern_ops)'
+        )
+
+    try:
+        # Savepoint: si falla (p. ej. sin permisos) la migración puede continuar
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception as e:
+        logger.warning(f"No se pudo habilitar pg_trgm, se omiten los índices trigram: {e}")
+        return
+
+    # Contiene: UPPER(col) LIKE '%ABC%' (icontains)
+    for nombre, tabla, columna in COLUMNAS_BUSQUEDA:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre}_trgm_idx '
+            f'ON {tabla} USING gin (UPPER({columna}::text) gin_trgm_ops)'
+        )
+
+
+def eliminar_indices(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE_PAGINACION}')
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for nombre, _tabla, _columna in COLUMNAS_BUSQUEDA:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}_prefijo_idx')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_activityevent'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
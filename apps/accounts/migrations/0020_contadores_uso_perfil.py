@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:02
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_contadores(apps, schema_editor):
+    """Carga inicial de los contadores con un UPDATE por contador."""
+    PerfilUsuario = apps.get_model('accounts', 'PerfilUsuario')
+    Producto = apps.get_model('productservice', 'Producto')
+    Servicio = apps.get_model('productservice', 'Servicio')
+    Pedido = apps.get_model('productservice', 'Pedido')
+    LandingPage = apps.get_model('webpages', 'LandingPage')
+
+    def conteo(modelo, **filtros):
+        subconsulta = (
+            modelo.objects.filter(usuario_id=OuterRef('usuario_id'), **filtros)
+            .order_by()
+            .values('usuario_id')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Coalesce(Subquery(subconsulta, output_field=IntegerField()), Value(0))
+
+    PerfilUsuario.objects.update(
+        total_productos_activos=conteo(Producto, activo=True),
+        total_servicios_activos=conteo(Servicio, activo=True),
+        total_landing_pages=conteo(LandingPage),
+        total_pedidos=conteo(Pedido),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_indices_busqueda_usuarios'),
+        ('productservice', '0011_producto_producto_stock_bajo_idx'),
+        ('webpages', '0003_alter_landingpage_plantilla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='total_landing_pages',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Landing Pages'),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='total_pedidos',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Pedidos realizados por el usuario', verbose_name='Pedidos Realizados'),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='total_productos_activos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Productos Activos'),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='total_servicios_activos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Servicios Activos'),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
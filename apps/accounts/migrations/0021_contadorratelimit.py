@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_contadores_uso_perfil'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorRateLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='Alcance e identificador (usuario o IP)', max_length=200, verbose_name='Clave')),
+                ('ventana', models.BigIntegerField(verbose_name='Ventana')),
+                ('contador', models.PositiveIntegerField(default=0, verbose_name='Peticiones')),
+                ('expira', models.DateTimeField(verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Contador de Rate Limit',
+                'verbose_name_plural': 'Contadores de Rate Limit',
+                'indexes': [models.Index(fields=['expira'], name='accounts_co_expira_29d327_idx')],
+                'constraints': [models.UniqueConstraint(fields=('clave', 'ventana'), name='contador_rate_limit_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:38
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def crear_tabla_cache(apps, schema_editor):
+    """
+    Crea la tabla de DatabaseCache (caché por defecto sin Redis).
+
+    createcachetable no hace nada si la tabla ya existe o si ninguna caché
+    de settings.CACHES usa la base de datos.
+    """
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_contadorratelimit'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla_cache, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,8 @@ Modelos para la gestión de usuarios y perfiles en el sistema ERP.
 Este módulo contiene los modelos relacionados con:
 - Perfiles extendidos de usuarios (PerfilUsuario)
 - Sistema de suscripciones (Suscripcion)
+- Registro de actividad append-only (ActivityEvent)
+- Contadores del rate limiting con backend de base de datos (ContadorRateLimit)
 
 Arquitectura MVT: Estos modelos representan la capa de datos (Model) 
 para la funcionalidad de cuentas de usuario.
@@ -13,7 +15,10 @@ modularización y escalabilidad.
 """
 
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
@@ -124,6 +129,38 @@ class PerfilUsuario(models.Model):
         verbose_name="Nivel de Permisos"
     )
 
+    # Contadores de uso desnormalizados (límites del plan y estadísticas).
+    # Se mantienen con F() desde apps.accounts.signals; reconcile_usage_counters
+    # los recalcula si hay deriva (p. ej. tras QuerySet.update o bulk_create)
+    total_productos_activos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Productos Activos"
+    )
+    total_servicios_activos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Servicios Activos"
+    )
+    total_landing_pages = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Landing Pages"
+    )
+    total_pedidos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Pedidos realizados por el usuario",
+        verbose_name="Pedidos Realizados"
+    )
+    
+    CONTADORES_USO = (
+        'total_productos_activos',
+        'total_servicios_activos',
+        'total_landing_pages',
+        'total_pedidos',
+    )
+
     class Meta:
         verbose_name = "Perfil de Usuario"
         verbose_name_plural = "Perfiles de Usuario"
@@ -132,6 +169,8 @@ class PerfilUsuario(models.Model):
             models.Index(fields=['tipo_cuenta']),
             models.Index(fields=['estado_suscripcion']),
             models.Index(fields=['permisos']),
+            models.Index(fields=['fecha_registro']),  # Series de altas (MetricsService)
+            models.Index(fields=['tipo_cuenta', 'fecha_registro']),
         ]
 
     def __str__(self):
@@ -214,8 +253,36 @@ class PerfilUsuario(models.Model):
         # Limpiar nombre de empresa para usuarios no empresariales
         if self.tipo_cuenta != 'empresa':
             self.empresa = ''
+        
+        # Los contadores se actualizan con F(); una instancia cargada antes
+        # de un incremento no debe sobrescribirlos al guardarse
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CONTADORES_USO
+            ]
             
         super().save(*args, **kwargs)
+    
+    @classmethod
+    def ajustar_contadores(cls, usuario_id, **deltas):
+        """
+        Suma (o resta) a los contadores de uso de un usuario de forma atómica.
+        
+        Args:
+            usuario_id (int): ID del usuario
+            **deltas: Contador de CONTADORES_USO y cantidad a sumar
+            
+        Usage:
+            PerfilUsuario.ajustar_contadores(user.id, total_productos_activos=1)
+        """
+        cambios = {
+            campo: Greatest(F(campo) + delta, 0)
+            for campo, delta in deltas.items()
+            if delta
+        }
+        if cambios:
+            cls.objects.filter(usuario_id=usuario_id).update(**cambios)
 
 
 class Suscripcion(models.Model):
@@ -319,3 +386,142 @@ class Suscripcion(models.Model):
         
         delta = self.fecha_vencimiento - timezone.now()
         return max(0, delta.days)
+
+
+class ActivityEvent(models.Model):
+    """
+    Registro append-only de la actividad relevante de la plataforma.
+    
+    Cada fila es compacta: actor, código de verbo, objetivo (tipo + id),
+    un detalle corto y la fecha. Las claves foráneas no tienen restricción
+    en base de datos para que el log no se modifique ni bloquee al
+    eliminar usuarios u objetos.
+    
+    Las filas se escriben tras el commit mediante ActivityService.registrar(),
+    que además publica el evento en el feed reciente en caché. El comando
+    podar_actividad elimina los eventos antiguos por lotes.
+    """
+    
+    # Códigos de verbo (no reutilizar códigos retirados)
+    USUARIO_REGISTRADO = 1
+    PRODUCTO_CREADO = 2
+    PRODUCTO_ACTUALIZADO = 3
+    SERVICIO_CREADO = 4
+    SERVICIO_ACTUALIZADO = 5
+    PEDIDO_CREADO = 6
+    PEDIDO_ESTADO = 7
+    USUARIO_ACTIVADO = 8
+    USUARIO_DESACTIVADO = 9
+    
+    VERBOS = [
+        (USUARIO_REGISTRADO, 'Usuario registrado'),
+        (PRODUCTO_CREADO, 'Producto creado'),
+        (PRODUCTO_ACTUALIZADO, 'Producto actualizado'),
+        (SERVICIO_CREADO, 'Servicio creado'),
+        (SERVICIO_ACTUALIZADO, 'Servicio actualizado'),
+        (PEDIDO_CREADO, 'Pedido realizado'),
+        (PEDIDO_ESTADO, 'Estado de pedido actualizado'),
+        (USUARIO_ACTIVADO, 'Usuario activado'),
+        (USUARIO_DESACTIVADO, 'Usuario desactivado'),
+    ]
+    
+    actor = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        help_text="Usuario que realizó la acción",
+        verbose_name="Actor"
+    )
+    
+    verbo = models.PositiveSmallIntegerField(
+        choices=VERBOS,
+        verbose_name="Verbo"
+    )
+    
+    objetivo_tipo = models.ForeignKey(
+        ContentType,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name="Tipo de Objetivo"
+    )
+    
+    objetivo_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID del Objetivo"
+    )
+    
+    # Texto corto para describir el evento sin consultar el objetivo
+    detalle = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Nombre del objetivo o nuevo estado",
+        verbose_name="Detalle"
+    )
+    
+    fecha = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Fecha"
+    )
+
+    class Meta:
+        verbose_name = "Evento de Actividad"
+        verbose_name_plural = "Eventos de Actividad"
+        ordering = ['-id']  # Los IDs crecen con la fecha
+        indexes = [
+            models.Index(fields=['fecha']),  # Poda por antigüedad
+        ]
+
+    def __str__(self):
+        """Representación string del modelo."""
+        return f"{self.get_verbo_display()}: {self.detalle} ({self.fecha:%Y-%m-%d %H:%M})"
+
+
+class ContadorRateLimit(models.Model):
+    """
+    Contador de peticiones de una ventana fija del rate limiting.
+    
+    Solo se usa con RATE_LIMIT_BACKEND = 'db' (ver apps.accounts.ratelimit):
+    el incremento es un UPDATE con F(), atómico entre procesos y servidores.
+    Las filas caducadas se eliminan de forma periódica al crear nuevas.
+    """
+    
+    clave = models.CharField(
+        max_length=200,
+        help_text="Alcance e identificador (usuario o IP)",
+        verbose_name="Clave"
+    )
+    
+    # Número de ventana desde epoch (segundos // duración de la ventana)
+    ventana = models.BigIntegerField(
+        verbose_name="Ventana"
+    )
+    
+    contador = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Peticiones"
+    )
+    
+    expira = models.DateTimeField(
+        verbose_name="Expira"
+    )
+
+    class Meta:
+        verbose_name = "Contador de Rate Limit"
+        verbose_name_plural = "Contadores de Rate Limit"
+        constraints = [
+            models.UniqueConstraint(fields=['clave', 'ventana'], name='contador_rate_limit_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['expira']),  # Poda de ventanas caducadas
+        ]
+
+    def __str__(self):
+        """Representación string del modelo."""
+        return f"{self.clave} [{self.ventana}]: {self.contador}"
@@ -0,0 +1,310 @@
+"""
+Snapshots HTML de las páginas públicas de empresa.
+
+Las páginas públicas de una empresa (página de empresa, catálogo completo y
+landing page) son iguales para todos los visitantes anónimos mientras no
+cambie su contenido. Este módulo las renderiza como visitante anónimo y las
+guarda en disco, una por versión de contenido (tag_landing) y de
+despliegue (version_despliegue), junto con
+copias comprimidas con gzip y, si está instalado el paquete brotli, con
+brotli:
+
+    PRERENDER_ROOT/<pagina>/<user_id>/<version>.html(.gz|.br)
+
+Cada archivo se escribe en un temporal y se mueve con os.replace(), así que
+nunca se sirve un snapshot a medio escribir. Cuando cambia el contenido de
+una empresa cambia su versión y el snapshot anterior deja de usarse sin
+necesidad de borrarlo; el siguiente visitante anónimo (o el comando
+prerender_company_pages) genera el nuevo y se eliminan las versiones viejas.
+
+Las vistas decoradas con servir_snapshot responden a los visitantes
+anónimos desde el archivo y al resto con la vista dinámica, que también es
+el respaldo cuando no hay snapshot.
+
+Uso:
+    @servir_snapshot('catalogo')
+    def company_full_catalog(request, user_id):
+        ...
+
+    generar_snapshot('catalogo', empresa.id)
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpRequest
+from django.template.loader import get_template
+from django.urls import resolve, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache_utils import tag_landing, version_tags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Página -> nombre de la URL (recibe user_id)
+PAGINAS = {
+    'empresa': 'company_page',
+    'catalogo': 'company_catalog_full',
+    'landing': 'webpages:public_landing_page',
+}
+
+# Variantes comprimidas, en orden de preferencia: (extensión, Content-Encoding)
+CODIFICACIONES = (('.br', 'br'), ('.gz', 'gzip'))
+
+# Tiempo máximo que un proceso mantiene el lock de generación
+LOCK_TIMEOUT = 30
+
+# Prefijo de los archivos a medio escribir de _escribir_atomico
+PREFIJO_TEMPORAL = '.tmp-'
+
+# Atributo de las peticiones sintéticas con las que se renderizan los snapshots
+ATRIBUTO_PRERENDER = '_prerender'
+
+# Plantillas comunes a todas las páginas públicas (version_despliegue)
+PLANTILLAS_BASE = ('base.html',)
+
+
+def activado():
+    return getattr(settings, 'PRERENDER_ENABLED', True)
+
+
+def directorio_raiz():
+    return getattr(settings, 'PRERENDER_ROOT', os.path.join(settings.MEDIA_ROOT, 'prerender'))
+
+
+def _directorio(pagina, user_id):
+    return os.path.join(directorio_raiz(), pagina, str(user_id))
+
+
+def version_empresa(user_id):
+    """Versión actual del contenido público de la empresa y del despliegue."""
+    return f'{version_tags([tag_landing(user_id)])}-{version_despliegue()}'
+
+
+@lru_cache(maxsize=None)
+def version_despliegue():
+    """
+    Versión del código desplegado que comparten todas las páginas públicas.
+
+    base.html (navegación, enlaces a estáticos) no forma parte de la versión
+    de contenido de la empresa. Combina settings.VERSION_DESPLIEGUE con el
+    fuente de PLANTILLAS_BASE, así que también cambia sin esa variable
+    cuando se edita la plantilla base. Se calcula una vez por proceso.
+    """
+    resumen = hashlib.md5(getattr(settings, 'VERSION_DESPLIEGUE', '').encode())
+    for nombre in PLANTILLAS_BASE:
+        resumen.update(get_template(nombre).template.source.encode())
+    return resumen.hexdigest()[:12]
+
+
+def ruta_snapshot(pagina, user_id, version):
+    return os.path.join(_directorio(pagina, user_id), f'{version}.html')
+
+
+def _escribir_atomico(ruta, contenido):
+    directorio = os.path.dirname(ruta)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix=PREFIJO_TEMPORAL)
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def _peticion_anonima(pagina, user_id):
+    """Petición GET anónima equivalente a la de un visitante sin sesión."""
+    ruta = reverse(PAGINAS[pagina], args=[user_id])
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = ruta
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(ruta)
+    setattr(request, ATRIBUTO_PRERENDER, True)
+    return request
+
+
+def generar_snapshot(pagina, user_id, version=None):
+    """
+    Renderiza la página como visitante anónimo y guarda el snapshot.
+
+    La versión se lee antes de renderizar: si el contenido cambia durante
+    el renderizado, el archivo queda con la versión anterior y no se sirve.
+
+    Args:
+        pagina (str): Clave de PAGINAS
+        user_id (int): ID de la empresa
+        version (str): Versión del contenido; por defecto la actual
+
+    Returns:
+        str | None: Ruta del snapshot, o None si la página no existe
+        (la vista respondió 404 o una redirección)
+    """
+    version = version or version_empresa(user_id)
+    request = _peticion_anonima(pagina, user_id)
+    try:
+        respuesta = request.resolver_match.func(request, **request.resolver_match.kwargs)
+    except Http404:
+        respuesta = None
+
+    if respuesta is None or respuesta.status_code != 200:
+        podar_snapshots(pagina, user_id)
+        return None
+
+    if hasattr(respuesta, 'render'):
+        respuesta.render()
+    contenido = respuesta.content
+
+    ruta = ruta_snapshot(pagina, user_id, version)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    # Primero las variantes comprimidas: el .html marca el snapshot como completo
+    _escribir_atomico(f'{ruta}.gz', gzip.compress(contenido, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _escribir_atomico(f'{ruta}.br', brotli.compress(contenido, mode=brotli.MODE_TEXT))
+    _escribir_atomico(ruta, contenido)
+
+    podar_snapshots(pagina, user_id, conservar=version)
+    return ruta
+
+
+def podar_snapshots(pagina, user_id, conservar=None):
+    """Elimina los snapshots de otras versiones. Devuelve cuántos archivos se borraron."""
+    directorio = _directorio(pagina, user_id)
+    try:
+        nombres = os.listdir(directorio)
+    except FileNotFoundError:
+        return 0
+
+    eliminados = 0
+    limite_temporales = time.time() - LOCK_TIMEOUT
+    for nombre in nombres:
+        if conservar and nombre.startswith(f'{conservar}.html'):
+            continue
+        ruta = os.path.join(directorio, nombre)
+        try:
+            # Temporales recientes: otro proceso los está escribiendo
+            if nombre.startswith(PREFIJO_TEMPORAL) and os.path.getmtime(ruta) > limite_temporales:
+                continue
+            os.remove(ruta)
+            eliminados += 1
+        except FileNotFoundError:
+            pass
+    return eliminados
+
+
+def _admite_snapshot(request):
+    """Solo GET/HEAD anónimos sin mensajes pendientes reciben la página estática."""
+    # Los mensajes pueden estar en la cookie o, si no caben, en la sesión
+    sesion = getattr(request, 'session', None)
+    return (
+        activado()
+        and not getattr(request, ATRIBUTO_PRERENDER, False)
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and 'messages' not in request.COOKIES
+        and not (sesion is not None and sesion.get('_messages'))
+    )
+
+
+def _abrir_variante(ruta, aceptadas):
+    """
+    Abre la mejor variante del snapshot que acepta el cliente.
+
+    Returns:
+        tuple | None: (archivo, extensión, Content-Encoding) o None si el
+        snapshot ya no existe
+    """
+    for extension, codificacion in CODIFICACIONES:
+        if codificacion in aceptadas:
+            try:
+                return open(ruta + extension, 'rb'), extension, codificacion
+            except FileNotFoundError:
+                continue
+    try:
+        return open(ruta, 'rb'), '', None
+    except FileNotFoundError:
+        return None
+
+
+def _responder_snapshot(request, ruta, version, pagina):
+    """FileResponse del snapshot (con la mejor codificación aceptada) o 304."""
+    try:
+        modificado = int(os.path.getmtime(ruta))
+    except FileNotFoundError:
+        return None
+    variante = _abrir_variante(ruta, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if variante is None:
+        return None
+    archivo, extension, codificacion = variante
+
+    # Cada codificación es una representación distinta con su propio ETag
+    # (p. ej. landing-<version>-gz), como exige Vary: Accept-Encoding
+    etag = quote_etag(f'{pagina}-{version}' + (f'-{extension[1:]}' if extension else ''))
+    respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if respuesta is not None:
+        archivo.close()
+    else:
+        respuesta = FileResponse(archivo, content_type='text/html; charset=utf-8')
+        if codificacion:
+            respuesta['Content-Encoding'] = codificacion
+
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(modificado)
+    patch_vary_headers(respuesta, ('Accept-Encoding', 'Cookie'))
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
+def servir_snapshot(pagina):
+    """
+    Decorador de las vistas públicas de empresa (reciben user_id).
+
+    Sirve a los visitantes anónimos el snapshot de la versión actual. Si no
+    existe, un único proceso lo genera (el resto usa la vista dinámica
+    mientras tanto) y lo sirve.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, user_id, *args, **kwargs):
+            if not _admite_snapshot(request):
+                return view_func(request, user_id, *args, **kwargs)
+
+            version = version_empresa(user_id)
+            ruta = ruta_snapshot(pagina, user_id, version)
+            if not os.path.exists(ruta):
+                clave_lock = f'prerender:{pagina}:{user_id}:lock'
+                if not cache.add(clave_lock, 1, LOCK_TIMEOUT):
+                    return view_func(request, user_id, *args, **kwargs)
+                try:
+                    ruta = generar_snapshot(pagina, user_id, version)
+                except OSError as e:
+                    logger.error(f"Error escribiendo el snapshot de {pagina} para empresa {user_id}: {e}")
+                    ruta = None
+                finally:
+                    cache.delete(clave_lock)
+                if ruta is None:
+                    return view_func(request, user_id, *args, **kwargs)
+
+            respuesta = _responder_snapshot(request, ruta, version, pagina)
+            if respuesta is None:
+                # Podado por otro proceso entre la comprobación y la lectura
+                return view_func(request, user_id, *args, **kwargs)
+            return respuesta
+        return _wrapped_view
+    return decorator
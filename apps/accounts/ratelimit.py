@@ -0,0 +1,170 @@
+"""
+Rate limiting con ventana deslizante y contadores atómicos.
+
+Cada alcance (vista) e identificador (usuario o IP) tiene un contador por
+ventana fija de `ventana` segundos. El límite se evalúa sobre una ventana
+deslizante estimada: las peticiones de la ventana actual más la fracción
+de la anterior que aún se solapa con los últimos `ventana` segundos. Así
+no hay ráfagas del doble del límite en el cambio de ventana y cada
+petición no reinicia el plazo.
+
+Backends (settings.RATE_LIMIT_BACKEND):
+- 'cache': alias settings.RATE_LIMIT_CACHE de CACHES, con add()+incr().
+  Con Redis o Memcached el incremento es atómico entre procesos; es el
+  backend por defecto cuando hay Redis. Con las cachés en archivos o en
+  base de datos add() e incr() son lectura + escritura y peticiones
+  paralelas pueden perder incrementos.
+- 'db': tabla ContadorRateLimit con UPDATE ... SET contador = contador + 1,
+  atómico entre procesos y servidores a cambio de una escritura por
+  petición. Es el backend por defecto sin Redis, para que límites de
+  seguridad como el del login no se puedan superar en paralelo.
+
+Uso:
+    resultado = registrar_peticion('login', f'ip:{ip}', limite=10, ventana=300)
+    if not resultado.permitido:
+        ...  # responder 429 con Retry-After: resultado.reintentar_en
+"""
+
+import logging
+import math
+import random
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ContadorRateLimit
+
+logger = logging.getLogger(__name__)
+
+# Probabilidad de podar contadores caducados al abrir una ventana (backend 'db')
+PROBABILIDAD_PODA = 0.01
+
+Resultado = namedtuple('Resultado', ['permitido', 'restantes', 'reintentar_en'])
+
+
+def _backend():
+    return getattr(settings, 'RATE_LIMIT_BACKEND', 'cache')
+
+
+def _cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+
+def _clave_cache(clave, ventana):
+    return f'ratelimit:{clave}:{ventana}'
+
+
+def _incrementar_cache(clave, ventana, ttl):
+    cache = _cache()
+    clave_cache = _clave_cache(clave, ventana)
+    if cache.add(clave_cache, 1, ttl):
+        return 1
+    try:
+        return cache.incr(clave_cache)
+    except ValueError:
+        # La entrada caducó entre add() e incr()
+        cache.set(clave_cache, 1, ttl)
+        return 1
+
+
+def _incrementar_db(clave, ventana, ttl):
+    contadores = ContadorRateLimit.objects.filter(clave=clave, ventana=ventana)
+    if not contadores.update(contador=F('contador') + 1):
+        try:
+            # Savepoint: la vista decorada puede estar dentro de ATOMIC_REQUESTS
+            with transaction.atomic():
+                ContadorRateLimit.objects.create(
+                    clave=clave,
+                    ventana=ventana,
+                    contador=1,
+                    expira=timezone.now() + timedelta(seconds=ttl),
+                )
+        except IntegrityError:
+            # Otro proceso creó la ventana a la vez
+            contadores.update(contador=F('contador') + 1)
+        else:
+            if random.random() < PROBABILIDAD_PODA:
+                podar_contadores()
+            return 1
+    return contadores.values_list('contador', flat=True).first() or 1
+
+
+def _leer(clave, ventana):
+    if _backend() == 'db':
+        return ContadorRateLimit.objects.filter(
+            clave=clave, ventana=ventana
+        ).values_list('contador', flat=True).first() or 0
+    return _cache().get(_clave_cache(clave, ventana), 0)
+
+
+def registrar_peticion(alcance, identificador, limite, ventana):
+    """
+    Cuenta una petición y decide si está dentro del límite.
+
+    Args:
+        alcance (str): Nombre del recurso limitado (p. ej. la vista)
+        identificador (str): Quién hace la petición ('user:5', 'ip:1.2.3.4')
+        limite (int): Peticiones permitidas por ventana
+        ventana (int): Duración de la ventana en segundos
+
+    Returns:
+        Resultado: (permitido, restantes, reintentar_en en segundos)
+    """
+    ahora = time.time()
+    numero = int(ahora // ventana)
+    transcurrido = (ahora % ventana) / ventana
+    clave = f'{alcance}:{identificador}'
+    # La ventana actual debe seguir legible durante toda la siguiente
+    ttl = ventana * 2
+
+    try:
+        if _backend() == 'db':
+            actuales = _incrementar_db(clave, numero, ttl)
+        else:
+            actuales = _incrementar_cache(clave, numero, ttl)
+        anteriores = _leer(clave, numero - 1)
+    except Exception as e:
+        # Un fallo del backend no debe tumbar la vista limitada
+        logger.error(f"Error en rate limiting de {clave}: {e}")
+        return Resultado(True, limite, 0)
+
+    estimadas = anteriores * (1 - transcurrido) + actuales
+    if estimadas <= limite:
+        return Resultado(True, int(limite - estimadas), 0)
+
+    # Tiempo hasta que la parte solapada de la ventana anterior deje sitio
+    if anteriores and actuales <= limite:
+        espera = ventana * ((estimadas - limite) / anteriores)
+    else:
+        espera = ventana * (1 - transcurrido)
+    return Resultado(False, 0, max(1, math.ceil(espera)))
+
+
+def podar_contadores():
+    """Elimina los contadores caducados del backend 'db'."""
+    eliminados, _ = ContadorRateLimit.objects.filter(expira__lt=timezone.now()).delete()
+    return eliminados
+
+
+def ip_cliente(request):
+    """
+    IP del cliente según settings.RATE_LIMIT_PROXIES.
+
+    Con N proxies de confianza delante (p. ej. el router de Railway), la IP
+    real es la N-ésima empezando por el final de X-Forwarded-For; las
+    entradas anteriores las controla el cliente y no se usan.
+    """
+    proxies = getattr(settings, 'RATE_LIMIT_PROXIES', 0)
+    if proxies:
+        reenviadas = [
+            ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()
+        ]
+        if len(reenviadas) >= proxies:
+            return reenviadas[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
@@ -21,15 +21,24 @@ from django.db import transaction
 from django.utils import timezone
 from django.template.loader import render_to_string
 from django.urls import reverse
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
 import logging
 import os
+import time
 from django.core.cache import cache
-from django.db.models import Count, Q, Avg, Sum
+from django.db.models import Count, Q, Avg, Sum, Min, Max, DateField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Trunc
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 
-from .models import PerfilUsuario, Suscripcion
-from apps.productservice.models import Producto, Servicio, Pedido, ImagenProducto, ImagenServicio, DetallePedido, MensajePedido
+from .cache_utils import (
+    TAG_CATALOGO, TAG_GLOBAL, TAG_PEDIDOS, invalidar_tags, obtener_dos_niveles, obtener_o_calcular,
+    tag_empresa, tag_metricas, version_tags,
+)
+from .entitlements import obtener_entitlements
+from .models import PerfilUsuario, Suscripcion, ActivityEvent
+from apps.productservice.models import Producto, Servicio, Pedido, ImagenProducto, ImagenServicio, DetallePedido, MensajePedido, PendingFileDeletion, VentaDiariaEmpresa
 
 # Configurar logger para este módulo
 logger = logging.getLogger(__name__)
@@ -389,10 +398,10 @@ El equipo de TEOmanager
                 'fecha_registro': perfil.fecha_registro,
                 'suscripcion_activa': perfil.suscripcion_activa,
                 'es_admin': perfil.is_admin,
-                'total_productos': user.productos.filter(activo=True).count(),
-                'total_servicios': user.servicios.filter(activo=True).count(),
-                'total_pedidos': user.pedidos.count(),
-                'landing_pages': user.landing_pages.count(),
+                'total_productos': perfil.total_productos_activos,
+                'total_servicios': perfil.total_servicios_activos,
+                'total_pedidos': perfil.total_pedidos,
+                'landing_pages': perfil.total_landing_pages,
             }
             
             # Estadísticas adicionales para empresas
@@ -409,6 +418,104 @@ El equipo de TEOmanager
             logger.error(f"Error obteniendo estadísticas de {user.username}: {str(e)}")
             return {}
     
+    # Términos más cortos no generan trigramas: se buscan por prefijo
+    BUSQUEDA_MIN_TRIGRAMA = 3
+    USUARIOS_POR_PAGINA = 10
+    
+    @staticmethod
+    def buscar_usuarios(search='', cursor=None, anterior=False, limite=USUARIOS_POR_PAGINA):
+        """
+        Lista usuarios para la administración con búsqueda y paginación por cursor.
+        
+        Cada campo se busca en su propia rama de un UNION para que la base
+        de datos use el índice de cada columna (ver migración
+        0019_indices_busqueda_usuarios), y las páginas se recorren por
+        (date_joined, id) en lugar de OFFSET y COUNT sobre toda la tabla.
+        Cada usuario trae anotados sus conteos de productos, servicios y
+        pedidos.
+        
+        Args:
+            search (str): Texto a buscar en usuario, email o empresa
+            cursor (str): Cursor devuelto por una página anterior
+            anterior (bool): Recorrer hacia atrás desde el cursor
+            limite (int): Usuarios por página
+            
+        Returns:
+            dict: 'usuarios' (lista), 'siguiente' y 'anterior' (cursores o None)
+            
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        usuarios = User.objects.select_related('userprofile')
+        
+        search = search.strip()
+        if search:
+            lookup = 'icontains' if len(search) >= UserService.BUSQUEDA_MIN_TRIGRAMA else 'istartswith'
+            coincidencias = (
+                User.objects.filter(**{f'username__{lookup}': search}).values('id')
+                .union(
+                    User.objects.filter(**{f'email__{lookup}': search}).values('id'),
+                    PerfilUsuario.objects.filter(**{f'empresa__{lookup}': search}).values('usuario_id'),
+                )
+            )
+            usuarios = usuarios.filter(id__in=coincidencias)
+        
+        if cursor:
+            fecha, ultimo_id = UserService._leer_cursor(cursor)
+            if anterior:
+                usuarios = usuarios.filter(Q(date_joined__gt=fecha) | Q(date_joined=fecha, id__gt=ultimo_id))
+            else:
+                usuarios = usuarios.filter(Q(date_joined__lt=fecha) | Q(date_joined=fecha, id__lt=ultimo_id))
+        
+        orden = ('date_joined', 'id') if anterior else ('-date_joined', '-id')
+        pagina = list(
+            usuarios.annotate(
+                productos_count=UserService._contar(Producto, 'usuario'),
+                servicios_count=UserService._contar(Servicio, 'usuario'),
+                pedidos_count=UserService._contar(Pedido, 'usuario'),
+                pedidos_recibidos_count=UserService._contar(Pedido, 'empresa'),
+            ).order_by(*orden)[:limite + 1]
+        )
+        
+        hay_mas = len(pagina) > limite
+        pagina = pagina[:limite]
+        if anterior:
+            pagina.reverse()
+        
+        # Hacia atrás siempre existe la página de la que se vino
+        tiene_siguiente = hay_mas if not anterior else bool(cursor)
+        tiene_anterior = bool(cursor) if not anterior else hay_mas
+        
+        return {
+            'usuarios': pagina,
+            'siguiente': UserService._crear_cursor(pagina[-1]) if pagina and tiene_siguiente else None,
+            'anterior': UserService._crear_cursor(pagina[0]) if pagina and tiene_anterior else None,
+        }
+    
+    @staticmethod
+    def _contar(modelo, campo):
+        """Subconsulta correlacionada que cuenta las filas de modelo del usuario."""
+        conteo = modelo.objects.filter(**{campo: OuterRef('pk')}).order_by().values(campo).annotate(
+            total=Count('id')
+        ).values('total')
+        return Coalesce(Subquery(conteo), 0)
+    
+    @staticmethod
+    def _crear_cursor(usuario):
+        """Cursor 'microsegundos:id' a partir de date_joined, sin pérdida de precisión."""
+        delta = usuario.date_joined - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+        microsegundos = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+        return f"{microsegundos}:{usuario.id}"
+    
+    @staticmethod
+    def _leer_cursor(cursor):
+        try:
+            microsegundos, ultimo_id = (int(valor) for valor in cursor.split(':'))
+        except ValueError:
+            raise ValueError("Cursor de paginación no válido")
+        fecha = datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=microsegundos)
+        return fecha, ultimo_id
+    
     @staticmethod
     @transaction.atomic
     def delete_user_completely(user):
@@ -423,7 +530,7 @@ El equipo de TEOmanager
         - Servicios (y todas sus imágenes)
         - Pedidos (y sus detalles y mensajes)
         - Mensajes de pedidos enviados
-        - Archivos físicos asociados
+        - Archivos físicos asociados (encolados para después del commit)
         
         Args:
             user (User): Usuario a eliminar
@@ -447,12 +554,12 @@ El equipo de TEOmanager
             'suscripciones': 0,
             'imagenes_productos': 0,
             'imagenes_servicios': 0,
-            'archivos_eliminados': 0
+            'archivos_programados': 0
         }
         
         try:
             # IMPORTANTE: Primero eliminar objetos de BD, luego archivos físicos
-            # Esto evita problemas si hay errores al eliminar archivos
+            # Los archivos solo se encolan si la transacción hace commit
             
             # 1. Contar objetos antes de eliminar (para el resumen)
             productos = Producto.objects.filter(usuario=user)
@@ -469,37 +576,27 @@ El equipo de TEOmanager
             deleted_summary['suscripciones'] = suscripciones.count()
             
             # 2. Obtener rutas de archivos ANTES de eliminar objetos de BD
-            archivos_a_eliminar = []
-            
-            # Imágenes de productos
-            for producto in productos:
-                imagenes = ImagenProducto.objects.filter(producto=producto)
-                for img in imagenes:
-                    if img.imagen:
-                        archivos_a_eliminar.append(img.imagen.path)
-                    deleted_summary['imagenes_productos'] += 1
-            
-            # Imágenes de servicios
-            for servicio in servicios:
-                imagenes = ImagenServicio.objects.filter(servicio=servicio)
-                for img in imagenes:
-                    if img.imagen:
-                        archivos_a_eliminar.append(img.imagen.path)
-                    deleted_summary['imagenes_servicios'] += 1
-                if servicio.imagen:
-                    archivos_a_eliminar.append(servicio.imagen.path)
-            
-            # Archivos adjuntos de mensajes de pedidos
-            for pedido in pedidos:
-                mensajes = MensajePedido.objects.filter(pedido=pedido)
-                for mensaje in mensajes:
-                    if mensaje.archivo_adjunto:
-                        archivos_a_eliminar.append(mensaje.archivo_adjunto.path)
-            
+            # Solo se leen las columnas de archivo, sin instanciar modelos
+            imagenes_productos = list(
+                ImagenProducto.objects.filter(producto__usuario=user)
+                .values_list('imagen', flat=True)
+            )
+            imagenes_servicios = list(
+                ImagenServicio.objects.filter(servicio__usuario=user)
+                .values_list('imagen', flat=True)
+            )
+            deleted_summary['imagenes_productos'] = len(imagenes_productos)
+            deleted_summary['imagenes_servicios'] = len(imagenes_servicios)
+            
+            archivos_a_eliminar = imagenes_productos + imagenes_servicios
+            # Imagen legacy de servicios
+            archivos_a_eliminar += servicios.values_list('imagen', flat=True)
+            # Archivos adjuntos de mensajes (de sus pedidos y enviados por el usuario)
+            archivos_a_eliminar += MensajePedido.objects.filter(
+                Q(pedido__usuario=user) | Q(pedido__empresa=user) | Q(remitente=user)
+            ).values_list('archivo_adjunto', flat=True)
             # Imágenes hero de landing pages
-            for landing in landing_pages:
-                if landing.hero_image_file:
-                    archivos_a_eliminar.append(landing.hero_image_file.path)
+            archivos_a_eliminar += landing_pages.values_list('hero_image_file', flat=True)
             
             # 3. ELIMINAR EL USUARIO PRIMERO (esto eliminará todo por CASCADE)
             # Esto es lo más importante - eliminar el usuario de la BD
@@ -510,15 +607,11 @@ El equipo de TEOmanager
             if User.objects.filter(pk=user_pk).exists():
                 raise Exception(f"El usuario {username} no fue eliminado correctamente de la base de datos")
             
-            # 4. Eliminar archivos físicos DESPUÉS de eliminar de BD
-            # Si falla la eliminación de archivos, no es crítico (ya se eliminó de BD)
-            for archivo_path in archivos_a_eliminar:
-                if archivo_path and os.path.isfile(archivo_path):
-                    try:
-                        os.remove(archivo_path)
-                        deleted_summary['archivos_eliminados'] += 1
-                    except Exception as e:
-                        logger.warning(f"No se pudo eliminar archivo {archivo_path}: {e}")
+            # 4. Encolar archivos físicos para eliminarlos tras el commit
+            # Se borran tras el commit (PendingFileDeletion.drenar_en_segundo_plano)
+            archivos_a_eliminar = [archivo for archivo in archivos_a_eliminar if archivo]
+            PendingFileDeletion.programar(archivos_a_eliminar)
+            deleted_summary['archivos_programados'] = len(archivos_a_eliminar)
             
             logger.info(f"Usuario {username} eliminado completamente. Resumen: {deleted_summary}")
             
@@ -621,52 +714,9 @@ class SuscripcionService:
         Returns:
             dict: {'allowed': bool, 'current': int, 'limit': int, 'message': str}
         """
+        # Plan y uso actual salen de los entitlements cacheados del usuario
         try:
-            perfil = user.userprofile
-            suscripcion = user.suscripciones.filter(activa=True).first()
-            
-            if not suscripcion:
-                plan = 'basico'  # Plan por defecto
-            else:
-                plan = suscripcion.plan
-            
-            config = SuscripcionService.PLANES_CONFIG.get(plan, SuscripcionService.PLANES_CONFIG['basico'])
-            
-            # Mapear tipos de recursos
-            resource_mapping = {
-                'productos': ('max_productos', user.productos.filter(activo=True).count()),
-                'servicios': ('max_servicios', user.servicios.filter(activo=True).count()),
-                'landing_pages': ('landing_pages', user.landing_pages.count()),
-            }
-            
-            if resource_type not in resource_mapping:
-                return {'allowed': False, 'message': 'Tipo de recurso no válido'}
-            
-            limit_key, current_count = resource_mapping[resource_type]
-            limit = config[limit_key]
-            
-            # -1 significa ilimitado
-            if limit == -1:
-                return {
-                    'allowed': True,
-                    'current': current_count,
-                    'limit': 'Ilimitado',
-                    'message': 'Sin límites en tu plan actual'
-                }
-            
-            allowed = current_count < limit
-            message = f"Tienes {current_count} de {limit} {resource_type} permitidos"
-            
-            if not allowed:
-                message = f"Has alcanzado el límite de {limit} {resource_type}. Considera actualizar tu plan."
-            
-            return {
-                'allowed': allowed,
-                'current': current_count,
-                'limit': limit,
-                'message': message
-            }
-            
+            return obtener_entitlements(user).verificar(resource_type)
         except Exception as e:
             logger.error(f"Error verificando límites de plan para {user.username}: {str(e)}")
             return {'allowed': False, 'message': 'Error verificando límites'}
@@ -769,7 +819,22 @@ class NotificationService:
 
 
 class DashboardService:
-    """Servicio para manejar datos del dashboard con caché optimizado."""
+    """
+    Servicio para manejar datos del dashboard con caché optimizado.
+    
+    Los datos se cachean con TTL largos y se invalidan por tags desde las
+    señales de apps.accounts.signals (ver apps.accounts.cache_utils).
+    """
+    
+    # Los tags se invalidan en cada cambio, así que el TTL solo acota
+    # cambios que no disparan señales (p. ej. QuerySet.update())
+    ADMIN_TTL = 3600
+    COMPANY_TTL = 1800
+    CATEGORIAS_TTL = 3600
+    
+    ADMIN_TAGS = (TAG_GLOBAL, TAG_CATALOGO, TAG_PEDIDOS)
+    CATEGORIAS_TAGS = (TAG_CATALOGO,)
+    MARKETPLACE_TAGS = (TAG_GLOBAL, TAG_CATALOGO)
     
     @staticmethod
     def get_admin_metrics(force_refresh=False):
@@ -782,76 +847,14 @@ class DashboardService:
         Returns:
             dict: Diccionario con todas las métricas del admin
         """
-        cache_key = 'admin_dashboard_metrics'
-        
-        if not force_refresh:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                logger.info("Métricas de admin obtenidas desde caché")
-                return cached_data
-        
         try:
-            # Métricas de usuarios con una sola consulta optimizada
-            user_stats = User.objects.select_related('userprofile').aggregate(
-                total_users=Count('id'),
-                active_users=Count('id', filter=Q(is_active=True)),
-                total_companies=Count('id', filter=Q(userprofile__tipo_cuenta='empresa')),
-                total_admins=Count('id', filter=Q(userprofile__permisos='Administrador'))
-            )
-            
-            # Métricas de productos y servicios
-            product_stats = Producto.objects.aggregate(
-                total_products=Count('id'),
-                active_products=Count('id', filter=Q(activo=True)),
-                avg_price=Avg('precio')
-            )
-            
-            service_stats = Servicio.objects.aggregate(
-                total_services=Count('id'),
-                active_services=Count('id', filter=Q(activo=True)),
-                avg_price=Avg('precio')
-            )
-            
-            # Métricas de pedidos
-            order_stats = Pedido.objects.aggregate(
-                total_orders=Count('id'),
-                total_revenue=Sum('total')
+            return obtener_o_calcular(
+                'admin_dashboard_metrics',
+                DashboardService._calcular_admin_metrics,
+                tags=DashboardService.ADMIN_TAGS,
+                ttl=DashboardService.ADMIN_TTL,
+                forzar=force_refresh,
             )
-            
-            # Consolidar todas las métricas
-            metrics = {
-                # Usuarios
-                'total_users': user_stats['total_users'] or 0,
-                'active_users': user_stats['active_users'] or 0,
-                'inactive_users': (user_stats['total_users'] or 0) - (user_stats['active_users'] or 0),
-                'total_companies': user_stats['total_companies'] or 0,
-                'total_admins': user_stats['total_admins'] or 0,
-                
-                # Productos
-                'total_products': product_stats['total_products'] or 0,
-                'active_products': product_stats['active_products'] or 0,
-                'avg_product_price': product_stats['avg_price'] or 0,
-                
-                # Servicios
-                'total_services': service_stats['total_services'] or 0,
-                'active_services': service_stats['active_services'] or 0,
-                'avg_service_price': service_stats['avg_price'] or 0,
-                
-                # Pedidos
-                'total_orders': order_stats['total_orders'] or 0,
-                'total_revenue': order_stats['total_revenue'] or 0,
-                
-                # Metadatos
-                'last_updated': datetime.now().isoformat(),
-                'cache_version': '1.0'
-            }
-            
-            # Guardar en caché por 5 minutos
-            cache.set(cache_key, metrics, 300)
-            logger.info("Métricas de admin calculadas y guardadas en caché")
-            
-            return metrics
-            
         except Exception as e:
             logger.error(f"Error al obtener métricas de admin: {e}")
             # Retornar métricas por defecto en caso de error
@@ -864,6 +867,85 @@ class DashboardService:
                 'cache_version': '1.0'
             }
     
+    @staticmethod
+    def _calcular_admin_metrics():
+        """
+        Calcula las métricas de administración sin pasar por caché.
+        
+        Registra el tiempo de cada grupo de métricas en 'timings_ms' e
+        incluye un 'etag' derivado solo de los valores, de modo que un
+        recálculo sin cambios conserva el mismo ETag.
+        """
+        timings = {}
+        
+        def medir(nombre, consulta):
+            inicio = time.perf_counter()
+            resultado = consulta()
+            timings[nombre] = round((time.perf_counter() - inicio) * 1000, 2)
+            return resultado
+        
+        # Métricas de usuarios con una sola consulta optimizada
+        user_stats = medir('usuarios', lambda: User.objects.aggregate(
+            total_users=Count('id'),
+            active_users=Count('id', filter=Q(is_active=True)),
+            total_companies=Count('id', filter=Q(userprofile__tipo_cuenta='empresa')),
+            total_admins=Count('id', filter=Q(userprofile__permisos='Administrador'))
+        ))
+        
+        # Métricas de productos y servicios
+        product_stats = medir('productos', lambda: Producto.objects.aggregate(
+            total_products=Count('id'),
+            active_products=Count('id', filter=Q(activo=True)),
+            avg_price=Avg('precio')
+        ))
+        
+        service_stats = medir('servicios', lambda: Servicio.objects.aggregate(
+            total_services=Count('id'),
+            active_services=Count('id', filter=Q(activo=True)),
+            avg_price=Avg('precio')
+        ))
+        
+        # Métricas de pedidos
+        order_stats = medir('pedidos', lambda: Pedido.objects.aggregate(
+            total_orders=Count('id'),
+            total_revenue=Sum('total')
+        ))
+        
+        logger.info(f"Métricas de admin calculadas (ms): {timings}")
+        
+        metrics = {
+            # Usuarios
+            'total_users': user_stats['total_users'] or 0,
+            'active_users': user_stats['active_users'] or 0,
+            'inactive_users': (user_stats['total_users'] or 0) - (user_stats['active_users'] or 0),
+            'total_companies': user_stats['total_companies'] or 0,
+            'total_admins': user_stats['total_admins'] or 0,
+            
+            # Productos
+            'total_products': product_stats['total_products'] or 0,
+            'active_products': product_stats['active_products'] or 0,
+            'avg_product_price': product_stats['avg_price'] or 0,
+            
+            # Servicios
+            'total_services': service_stats['total_services'] or 0,
+            'active_services': service_stats['active_services'] or 0,
+            'avg_service_price': service_stats['avg_price'] or 0,
+            
+            # Pedidos
+            'total_orders': order_stats['total_orders'] or 0,
+            'total_revenue': order_stats['total_revenue'] or 0,
+        }
+        
+        firma = repr(sorted(metrics.items())).encode()
+        metrics.update({
+            # Metadatos
+            'etag': hashlib.md5(firma).hexdigest(),
+            'timings_ms': timings,
+            'last_updated': datetime.now().isoformat(),
+            'cache_version': '1.0'
+        })
+        return metrics
+    
     @staticmethod
     def get_company_dashboard_data(user, force_refresh=False):
         """
@@ -876,86 +958,14 @@ class DashboardService:
         Returns:
             dict: Datos del dashboard de la empresa
         """
-        cache_key = f'company_dashboard_{user.id}'
-        
-        if not force_refresh:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                logger.info(f"Dashboard de empresa {user.id} obtenido desde caché")
-                return cached_data
-        
         try:
-            # Consultas optimizadas para productos
-            productos_query = Producto.objects.filter(usuario=user).only(
-                'id', 'nombre', 'precio', 'categoria', 'activo', 'fecha_creacion'
-            )
-            
-            productos_stats = productos_query.aggregate(
-                total=Count('id'),
-                activos=Count('id', filter=Q(activo=True)),
-                inactivos=Count('id', filter=Q(activo=False)),
-                valor_total=Sum('precio', filter=Q(activo=True))
-            )
-            
-            # Consultas optimizadas para servicios
-            servicios_query = Servicio.objects.filter(usuario=user).only(
-                'id', 'nombre', 'precio', 'categoria', 'activo', 'fecha_creacion'
-            )
-            
-            servicios_stats = servicios_query.aggregate(
-                total=Count('id'),
-                activos=Count('id', filter=Q(activo=True)),
-                inactivos=Count('id', filter=Q(activo=False)),
-                valor_total=Sum('precio', filter=Q(activo=True))
-            )
-            
-            # Pedidos recientes optimizados
-            pedidos_recientes = Pedido.objects.filter(usuario=user).only(
-                'id', 'fecha_pedido', 'estado', 'total'
-            ).order_by('-fecha_pedido')[:5]
-            
-            pedidos_stats = Pedido.objects.filter(usuario=user).aggregate(
-                total_pedidos=Count('id'),
-                ingresos_totales=Sum('total')
+            return obtener_o_calcular(
+                f'company_dashboard_{user.id}',
+                lambda: DashboardService._calcular_company_dashboard(user),
+                tags=(tag_empresa(user.id),),
+                ttl=DashboardService.COMPANY_TTL,
+                forzar=force_refresh,
             )
-            
-            # Productos y servicios recientes (solo los necesarios para mostrar)
-            productos_recientes = productos_query.order_by('-fecha_creacion')[:10]
-            servicios_recientes = servicios_query.order_by('-fecha_creacion')[:10]
-            
-            dashboard_data = {
-                # Estadísticas de productos
-                'productos_count': productos_stats['total'] or 0,
-                'productos_activos': productos_stats['activos'] or 0,
-                'productos_inactivos': productos_stats['inactivos'] or 0,
-                'productos_valor_total': productos_stats['valor_total'] or 0,
-                
-                # Estadísticas de servicios
-                'servicios_count': servicios_stats['total'] or 0,
-                'servicios_activos': servicios_stats['activos'] or 0,
-                'servicios_inactivos': servicios_stats['inactivos'] or 0,
-                'servicios_valor_total': servicios_stats['valor_total'] or 0,
-                
-                # Estadísticas de pedidos
-                'pedidos_count': pedidos_stats['total_pedidos'] or 0,
-                'ingresos_totales': pedidos_stats['ingresos_totales'] or 0,
-                
-                # Datos para mostrar en el dashboard
-                'productos_recientes': list(productos_recientes),
-                'servicios_recientes': list(servicios_recientes),
-                'pedidos_recientes': list(pedidos_recientes),
-                
-                # Metadatos
-                'last_updated': datetime.now().isoformat(),
-                'user_id': user.id
-            }
-            
-            # Guardar en caché por 2 minutos (datos más dinámicos)
-            cache.set(cache_key, dashboard_data, 120)
-            logger.info(f"Dashboard de empresa {user.id} calculado y guardado en caché")
-            
-            return dashboard_data
-            
         except Exception as e:
             logger.error(f"Error al obtener dashboard de empresa {user.id}: {e}")
             return {
@@ -967,22 +977,175 @@ class DashboardService:
                 'last_updated': datetime.now().isoformat(), 'user_id': user.id
             }
     
+    @staticmethod
+    def _calcular_company_dashboard(user):
+        """Calcula los datos del dashboard de una empresa sin pasar por caché."""
+        # Consultas optimizadas para productos
+        productos_query = Producto.objects.filter(usuario=user).only(
+            'id', 'nombre', 'precio', 'categoria', 'activo', 'fecha_creacion'
+        )
+        
+        productos_stats = productos_query.aggregate(
+            total=Count('id'),
+            activos=Count('id', filter=Q(activo=True)),
+            inactivos=Count('id', filter=Q(activo=False)),
+            valor_total=Sum('precio', filter=Q(activo=True))
+        )
+        
+        # Consultas optimizadas para servicios
+        servicios_query = Servicio.objects.filter(usuario=user).only(
+            'id', 'nombre', 'precio', 'categoria', 'activo', 'fecha_creacion'
+        )
+        
+        servicios_stats = servicios_query.aggregate(
+            total=Count('id'),
+            activos=Count('id', filter=Q(activo=True)),
+            inactivos=Count('id', filter=Q(activo=False)),
+            valor_total=Sum('precio', filter=Q(activo=True))
+        )
+        
+        # Pedidos recientes optimizados
+        pedidos_recientes = Pedido.objects.filter(usuario=user).only(
+            'id', 'fecha_pedido', 'estado', 'total'
+        ).order_by('-fecha_pedido')[:5]
+        
+        pedidos_stats = Pedido.objects.filter(usuario=user).aggregate(
+            total_pedidos=Count('id'),
+            ingresos_totales=Sum('total')
+        )
+        
+        # Productos y servicios recientes (solo los necesarios para mostrar)
+        productos_recientes = productos_query.order_by('-fecha_creacion')[:10]
+        servicios_recientes = servicios_query.order_by('-fecha_creacion')[:10]
+        
+        logger.info(f"Dashboard de empresa {user.id} calculado")
+        
+        return {
+            # Estadísticas de productos
+            'productos_count': productos_stats['total'] or 0,
+            'productos_activos': productos_stats['activos'] or 0,
+            'productos_inactivos': productos_stats['inactivos'] or 0,
+            'productos_valor_total': productos_stats['valor_total'] or 0,
+            
+            # Estadísticas de servicios
+            'servicios_count': servicios_stats['total'] or 0,
+            'servicios_activos': servicios_stats['activos'] or 0,
+            'servicios_inactivos': servicios_stats['inactivos'] or 0,
+            'servicios_valor_total': servicios_stats['valor_total'] or 0,
+            
+            # Estadísticas de pedidos
+            'pedidos_count': pedidos_stats['total_pedidos'] or 0,
+            'ingresos_totales': pedidos_stats['ingresos_totales'] or 0,
+            
+            # Datos para mostrar en el dashboard
+            'productos_recientes': list(productos_recientes),
+            'servicios_recientes': list(servicios_recientes),
+            'pedidos_recientes': list(pedidos_recientes),
+            
+            # Metadatos
+            'last_updated': datetime.now().isoformat(),
+            'user_id': user.id
+        }
+    
+    @staticmethod
+    def get_category_counts(force_refresh=False):
+        """
+        Obtiene las categorías de productos activos de empresas y sus conteos.
+        
+        Las categorías se normalizan (espacios y mayúsculas) para agrupar
+        duplicados como 'ropa', ' Ropa' y 'ROPA'.
+        
+        Args:
+            force_refresh (bool): Forzar actualización del caché
+            
+        Returns:
+            dict: {categoría: número de productos}, en orden alfabético
+        """
+        return obtener_dos_niveles(
+            'category_counts',
+            DashboardService._calcular_category_counts,
+            tags=DashboardService.CATEGORIAS_TAGS,
+            ttl=DashboardService.CATEGORIAS_TTL,
+            forzar=force_refresh,
+        )
+    
+    @staticmethod
+    def _calcular_category_counts():
+        """Agrupa los conteos por categoría con una sola consulta."""
+        filas = Producto.objects.filter(
+            usuario__userprofile__tipo_cuenta='empresa',
+            activo=True
+        ).exclude(categoria='').values('categoria').annotate(total=Count('id')).order_by()
+        
+        category_counts = {}
+        for fila in filas:
+            nombre = fila['categoria'].strip().title()
+            if nombre:
+                category_counts[nombre] = category_counts.get(nombre, 0) + fila['total']
+        
+        return dict(sorted(category_counts.items()))
+    
+    @staticmethod
+    def get_marketplace_stats(force_refresh=False):
+        """
+        Obtiene los totales y el rango de precios del marketplace de consumidores.
+        
+        Args:
+            force_refresh (bool): Forzar actualización del caché
+            
+        Returns:
+            dict: total_companies, total_products, total_services y price_range
+        """
+        return obtener_dos_niveles(
+            'marketplace_stats',
+            DashboardService._calcular_marketplace_stats,
+            tags=DashboardService.MARKETPLACE_TAGS,
+            ttl=DashboardService.CATEGORIAS_TTL,
+            forzar=force_refresh,
+        )
+    
+    @staticmethod
+    def _calcular_marketplace_stats():
+        """Calcula los totales del marketplace con una consulta por modelo."""
+        productos = Producto.objects.filter(
+            usuario__userprofile__tipo_cuenta='empresa',
+            activo=True
+        ).aggregate(
+            total=Count('id'),
+            min_price=Min('precio'),
+            max_price=Max('precio')
+        )
+        total_services = Servicio.objects.filter(
+            usuario__userprofile__tipo_cuenta='empresa',
+            activo=True
+        ).count()
+        total_companies = User.objects.filter(userprofile__tipo_cuenta='empresa').count()
+        
+        return {
+            'total_companies': total_companies,
+            'total_products': productos['total'],
+            'total_services': total_services,
+            'price_range': {
+                'min_price': productos['min_price'],
+                'max_price': productos['max_price'],
+            },
+        }
+    
     @staticmethod
     def clear_dashboard_cache(user_id=None):
         """
-        Limpia el caché del dashboard.
+        Invalida el caché del dashboard.
         
         Args:
-            user_id: ID del usuario (opcional, si se especifica solo limpia ese usuario)
+            user_id: ID del usuario (opcional, si se especifica solo invalida esa empresa)
         """
         if user_id:
-            cache.delete(f'company_dashboard_{user_id}')
-            logger.info(f"Caché del dashboard de empresa {user_id} limpiado")
+            invalidar_tags(tag_empresa(user_id))
+            logger.info(f"Caché del dashboard de empresa {user_id} invalidado")
         else:
-            cache.delete('admin_dashboard_metrics')
-            # También limpiar caché de categorías
-            cache.delete('product_categories')
-            logger.info("Caché de métricas de admin limpiado")
+            # Incluye el caché de categorías (tag de catálogo)
+            invalidar_tags(*DashboardService.ADMIN_TAGS)
+            logger.info("Caché de métricas de admin invalidado")
     
     @staticmethod
     def get_system_health():
@@ -1020,19 +1183,325 @@ class DashboardService:
 
 
 class MetricsService:
-    """Servicio para métricas y analytics avanzados."""
+    """
+    Servicio para métricas y analytics avanzados.
+    
+    Las series se agrupan por día o semana con consultas GROUP BY sobre
+    columnas de fecha indexadas (o sobre VentaDiariaEmpresa para pedidos e
+    ingresos). Cada bucket cerrado ocupa una entrada de caché cuya clave
+    incluye la versión de la serie (tag_metricas) y dura BUCKET_CERRADO_TTL;
+    solo el bucket en curso se recalcula, con un TTL corto. Los cambios que
+    alteran buckets pasados (eliminaciones, pedidos antiguos que cambian de
+    estado) llegan desde apps.accounts.signals a invalidar_buckets(), que
+    cambia la versión de la serie: un cálculo que empezó antes del cambio
+    guarda su resultado con la versión anterior y nadie vuelve a leerlo.
+    """
+    
+    # serie: (queryset base, campo de fecha, agregado; None = contar filas)
+    SERIES = {
+        'usuarios': (lambda: PerfilUsuario.objects.all(), 'fecha_registro', None),
+        'empresas': (lambda: PerfilUsuario.objects.filter(tipo_cuenta='empresa'), 'fecha_registro', None),
+        'productos': (lambda: Producto.objects.all(), 'fecha_creacion', None),
+        'servicios': (lambda: Servicio.objects.all(), 'fecha_creacion', None),
+        'pedidos': (lambda: VentaDiariaEmpresa.objects.all(), 'fecha', Sum('pedidos_total')),
+        'ingresos': (lambda: VentaDiariaEmpresa.objects.all(), 'fecha', Sum('ingresos')),
+    }
+    
+    PERIODOS = {'dia': 'day', 'semana': 'week'}
+    
+    # TTL del bucket en curso
+    BUCKET_ACTUAL_TTL = 60
+    
+    # Los buckets cerrados no cambian salvo invalidación; el TTL solo purga
+    # los días que dejan de consultarse y las versiones antiguas
+    BUCKET_CERRADO_TTL = 7 * 24 * 3600
+    
+    @staticmethod
+    def get_series(serie, periodo='dia', buckets=30):
+        """
+        Obtiene una serie temporal agrupada por día o semana.
+        
+        Args:
+            serie (str): Una de MetricsService.SERIES
+            periodo (str): 'dia' o 'semana'
+            buckets (int): Número de buckets, incluido el actual
+            
+        Returns:
+            list: [{'fecha': date, 'valor': número}] del más antiguo al actual
+        """
+        if serie not in MetricsService.SERIES or periodo not in MetricsService.PERIODOS:
+            raise ValueError(f"Serie o periodo no válido: {serie}/{periodo}")
+        
+        actual = MetricsService._inicio_bucket(timezone.localdate(), periodo)
+        inicios = [MetricsService._desplazar(actual, periodo, -i) for i in range(buckets - 1, -1, -1)]
+        cerrados = inicios[:-1]
+        
+        # La versión se lee antes de consultar (ver docstring de la clase)
+        version = version_tags([tag_metricas(serie)])
+        claves = {inicio: MetricsService._clave_bucket(serie, version, periodo, inicio) for inicio in cerrados}
+        en_cache = cache.get_many(list(claves.values()))
+        valores = {inicio: en_cache[clave] for inicio, clave in claves.items() if clave in en_cache}
+        
+        # Buckets cerrados que faltan: una sola consulta para todo el rango
+        faltantes = [inicio for inicio in cerrados if inicio not in valores]
+        if faltantes:
+            calculados = MetricsService._agrupar(serie, periodo, faltantes[0], actual)
+            nuevos = {inicio: calculados.get(inicio, 0) for inicio in faltantes}
+            cache.set_many(
+                {claves[inicio]: valor for inicio, valor in nuevos.items()},
+                MetricsService.BUCKET_CERRADO_TTL,
+            )
+            valores.update(nuevos)
+        
+        # Bucket en curso: clave separada para no confundirlo con uno cerrado
+        clave_actual = f"{MetricsService._clave_bucket(serie, version, periodo, actual)}:parcial"
+        valor_actual = cache.get(clave_actual)
+        if valor_actual is None:
+            siguiente = MetricsService._desplazar(actual, periodo, 1)
+            valor_actual = MetricsService._agrupar(serie, periodo, actual, siguiente).get(actual, 0)
+            cache.set(clave_actual, valor_actual, MetricsService.BUCKET_ACTUAL_TTL)
+        valores[actual] = valor_actual
+        
+        return [{'fecha': inicio, 'valor': valores[inicio]} for inicio in inicios]
+    
+    @staticmethod
+    def invalidar_buckets(series, momento):
+        """
+        Invalida los buckets (día y semana) que contienen una fecha.
+        
+        Si la fecha cae en un bucket cerrado se cambia la versión de toda la
+        serie (se recalcula con una consulta en la siguiente lectura); si
+        cae en el bucket en curso basta con borrar su valor parcial.
+        
+        Args:
+            series (iterable): Nombres de serie afectados
+            momento (date|datetime): Fecha del registro modificado
+        """
+        if momento is None:
+            return
+        fecha = timezone.localdate(momento) if isinstance(momento, datetime) else momento
+        hoy = timezone.localdate()
+        
+        cerradas = []
+        parciales = []
+        for serie in series:
+            version = version_tags([tag_metricas(serie)])
+            for periodo in MetricsService.PERIODOS:
+                inicio = MetricsService._inicio_bucket(fecha, periodo)
+                if inicio < MetricsService._inicio_bucket(hoy, periodo):
+                    cerradas.append(serie)
+                    break
+                parciales.append(f"{MetricsService._clave_bucket(serie, version, periodo, inicio)}:parcial")
+        
+        if cerradas:
+            MetricsService.invalidar_series(*cerradas)
+        if parciales:
+            cache.delete_many(parciales)
+    
+    @staticmethod
+    def invalidar_series(*series):
+        """Invalida todos los buckets de las series (p. ej. tras un backfill)."""
+        invalidar_tags(*(tag_metricas(serie) for serie in series))
     
     @staticmethod
     def get_user_activity_trends(days=30):
-        """Obtiene tendencias de actividad de usuarios."""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        """
+        Obtiene tendencias de actividad comparando los últimos `days` días
+        con los `days` días anteriores.
+        
+        Returns:
+            dict: {clave: {'variacion': '+12%', 'tendencia': 'positive'|'negative'|'neutral'}}
+        """
+        claves = {
+            'new_users_trend': 'usuarios',
+            'company_trend': 'empresas',
+            'product_creation_trend': 'productos',
+            'service_creation_trend': 'servicios',
+            'order_trend': 'pedidos',
+            'revenue_trend': 'ingresos',
+        }
+        
+        tendencias = {}
+        for clave, serie in claves.items():
+            valores = [bucket['valor'] for bucket in MetricsService.get_series(serie, 'dia', days * 2)]
+            tendencias[clave] = MetricsService._variacion(sum(valores[days:]), sum(valores[:days]))
+        
+        return tendencias
+    
+    @staticmethod
+    def _agrupar(serie, periodo, desde, hasta):
+        """Agrupa una serie en [desde, hasta) con una consulta GROUP BY."""
+        queryset, campo, agregado = MetricsService.SERIES[serie]
+        queryset = queryset()
+        
+        if queryset.model._meta.get_field(campo).get_internal_type() == 'DateTimeField':
+            desde = timezone.make_aware(datetime.combine(desde, datetime.min.time()))
+            hasta = timezone.make_aware(datetime.combine(hasta, datetime.min.time()))
+        
+        filas = (
+            queryset.filter(**{f'{campo}__gte': desde, f'{campo}__lt': hasta})
+            .order_by()
+            .annotate(bucket=Trunc(campo, MetricsService.PERIODOS[periodo], output_field=DateField()))
+            .values('bucket')
+            .annotate(valor=agregado or Count('pk'))
+        )
+        return {fila['bucket']: fila['valor'] or 0 for fila in filas}
+    
+    @staticmethod
+    def _inicio_bucket(fecha, periodo):
+        if periodo == 'semana':
+            return fecha - timedelta(days=fecha.weekday())
+        return fecha
+    
+    @staticmethod
+    def _desplazar(inicio, periodo, cantidad):
+        return inicio + timedelta(days=cantidad * (7 if periodo == 'semana' else 1))
+    
+    @staticmethod
+    def _clave_bucket(serie, version, periodo, inicio):
+        return f"metricas:{serie}:{version}:{periodo}:{inicio.isoformat()}"
+    
+    @staticmethod
+    def _variacion(actual, anterior):
+        """Formatea la variación porcentual entre dos periodos."""
+        if not anterior:
+            if actual:
+                return {'variacion': 'Nuevo', 'tendencia': 'positive'}
+            return {'variacion': 'Sin cambios', 'tendencia': 'neutral'}
+        
+        porcentaje = round((actual - anterior) * 100 / anterior)
+        if porcentaje > 0:
+            return {'variacion': f'+{porcentaje}%', 'tendencia': 'positive'}
+        if porcentaje < 0:
+            return {'variacion': f'{porcentaje}%', 'tendencia': 'negative'}
+        return {'variacion': '0%', 'tendencia': 'neutral'}
+
+
+
+class ActivityService:
+    """
+    Servicio para el registro de actividad y el feed de actividad reciente.
+    
+    Los eventos se guardan en ActivityEvent tras el commit y se publican en
+    un buffer circular en caché: el id del evento, asignado por la base de
+    datos, es su número de secuencia y el evento ocupa el slot
+    id % FEED_TAMANO. Así dos eventos concurrentes nunca reciben el mismo
+    slot, sin depender de que cache.incr sea atómico en el backend. El
+    dashboard lee todos los slots en una sola lectura sin consultar la
+    tabla; si falta la marca de inicialización (caché vacía) el feed se
+    reconstruye con una consulta a los últimos eventos.
+    """
+    
+    FEED_TAMANO = 50
+    CLAVE_INICIALIZADO = 'actividad:inicializado'
+    
+    # verbo: (plantilla de descripción, tipo para el icono del dashboard)
+    PRESENTACION = {
+        ActivityEvent.USUARIO_REGISTRADO: ('Nuevo usuario registrado: {detalle}', 'user_registered'),
+        ActivityEvent.PRODUCTO_CREADO: ('Producto creado: {detalle}', 'product_created'),
+        ActivityEvent.PRODUCTO_ACTUALIZADO: ('Producto actualizado: {detalle}', 'product_created'),
+        ActivityEvent.SERVICIO_CREADO: ('Servicio creado: {detalle}', 'service_created'),
+        ActivityEvent.SERVICIO_ACTUALIZADO: ('Servicio actualizado: {detalle}', 'service_created'),
+        ActivityEvent.PEDIDO_CREADO: ('Pedido #{objetivo_id} realizado', 'order_placed'),
+        ActivityEvent.PEDIDO_ESTADO: ('Pedido #{objetivo_id} cambió a {detalle}', 'order_placed'),
+        ActivityEvent.USUARIO_ACTIVADO: ('Usuario activado: {detalle}', 'user_status'),
+        ActivityEvent.USUARIO_DESACTIVADO: ('Usuario desactivado: {detalle}', 'user_status'),
+    }
+    
+    @staticmethod
+    def registrar(verbo, actor=None, objetivo=None, detalle=''):
+        """
+        Registra un evento cuando la transacción actual haga commit.
+        
+        Args:
+            verbo (int): Código ActivityEvent.*
+            actor (User|None): Usuario que realiza la acción
+            objetivo (Model|None): Objeto afectado
+            detalle (str): Texto corto (nombre del objetivo, nuevo estado...)
+        """
+        evento = ActivityEvent(
+            actor_id=getattr(actor, 'pk', actor),
+            verbo=verbo,
+            objetivo_tipo=ContentType.objects.get_for_model(objetivo) if objetivo is not None else None,
+            objetivo_id=getattr(objetivo, 'pk', None),
+            detalle=str(detalle)[:100],
+        )
+        actor_nombre = getattr(actor, 'username', '') if actor is not None else ''
+        transaction.on_commit(lambda: ActivityService._guardar(evento, actor_nombre))
+    
+    @staticmethod
+    def get_recent(limite=10):
+        """
+        Obtiene los últimos eventos desde el feed en caché.
+        
+        Args:
+            limite (int): Número máximo de eventos (hasta FEED_TAMANO)
+            
+        Returns:
+            list: Diccionarios con description, type, user y created_at
+        """
+        limite = min(limite, ActivityService.FEED_TAMANO)
+        claves = [ActivityService._clave_slot(s) for s in range(ActivityService.FEED_TAMANO)]
+        leidos = cache.get_many(claves + [ActivityService.CLAVE_INICIALIZADO])
+        if ActivityService.CLAVE_INICIALIZADO not in leidos:
+            ActivityService._reconstruir_feed()
+            leidos = cache.get_many(claves)
         
-        # Implementar lógica de tendencias
-        # Por ahora retorna datos mock
+        items = sorted(
+            (leidos[clave] for clave in claves if clave in leidos),
+            key=lambda item: item['seq'],
+            reverse=True,
+        )
+        if not items:
+            return []
+        # Un slot que no se sobrescribió (id saltado por un rollback) guarda
+        # un evento de una vuelta anterior: queda fuera de la ventana
+        minimo = items[0]['seq'] - ActivityService.FEED_TAMANO
+        return [item for item in items if item['seq'] > minimo][:limite]
+    
+    @staticmethod
+    def _guardar(evento, actor_nombre):
+        try:
+            evento.save()
+        except Exception as e:
+            logger.error(f"Error registrando actividad {evento.verbo}: {e}")
+            return
+        
+        # Si el feed no está inicializado, la reconstrucción de get_recent
+        # ya incluirá este evento
+        cache.set(
+            ActivityService._clave_slot(evento.pk),
+            ActivityService._item_feed(evento, actor_nombre, evento.pk),
+            None,
+        )
+    
+    @staticmethod
+    def _reconstruir_feed():
+        """Rellena el feed con los últimos eventos de la tabla."""
+        eventos = ActivityEvent.objects.select_related('actor').only(
+            'verbo', 'objetivo_id', 'detalle', 'fecha', 'actor__username'
+        ).order_by('-id')[:ActivityService.FEED_TAMANO]
+        
+        slots = {}
+        for evento in eventos:
+            actor_nombre = evento.actor.username if evento.actor_id and evento.actor else ''
+            slots[ActivityService._clave_slot(evento.pk)] = ActivityService._item_feed(evento, actor_nombre, evento.pk)
+        
+        cache.set_many(slots, None)
+        cache.set(ActivityService.CLAVE_INICIALIZADO, True, None)
+    
+    @staticmethod
+    def _item_feed(evento, actor_nombre, secuencia):
+        plantilla, tipo = ActivityService.PRESENTACION.get(evento.verbo, ('{detalle}', 'info'))
         return {
-            'new_users_trend': '+12%',
-            'product_creation_trend': '+8%', 
-            'service_creation_trend': '+15%',
-            'order_trend': '+5%'
-        } 
\ No newline at end of file
+            'seq': secuencia,
+            'verb': evento.verbo,
+            'type': tipo,
+            'description': plantilla.format(detalle=evento.detalle, objetivo_id=evento.objetivo_id),
+            'user': actor_nombre or 'Sistema',
+            'created_at': evento.fecha,
+        }
+    
+    @staticmethod
+    def _clave_slot(secuencia):
+        return f"actividad:slot:{secuencia % ActivityService.FEED_TAMANO}"
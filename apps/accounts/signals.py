@@ -1,9 +1,19 @@
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_migrate, post_save
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.contrib import messages
 from django.contrib.auth.models import User
-from apps.accounts.models import PerfilUsuario
+from apps.accounts.models import PerfilUsuario, Suscripcion, ActivityEvent
+from apps.accounts.cache_utils import (
+    TAG_CATALOGO, TAG_GLOBAL, TAG_PEDIDOS, invalidar_tags_al_confirmar, tag_empresa, tag_landing,
+)
+from apps.accounts.entitlements import invalidar_entitlements_al_confirmar
+from apps.accounts.services import ActivityService, MetricsService
+from apps.productservice.models import (
+    Producto, Servicio, Pedido, VentaDiariaEmpresa, ImagenProducto, ImagenServicio,
+)
+from apps.webpages.models import LandingPage
 from django.utils import timezone
 from datetime import timedelta
 import os
@@ -114,4 +124,242 @@ def crear_perfil_automatico(sender, instance, created, **kwargs):
         except Exception as e:
             # Si falla, solo loguear (no es crítico, el formulario lo creará)
             if os.getenv('DEBUG', 'False').lower() == 'true':
-                print(f'⚠️  No se pudo crear perfil automático para {instance.username}: {e}') 
\ No newline at end of file
+                print(f'⚠️  No se pudo crear perfil automático para {instance.username}: {e}')
+
+
+# --- Invalidación de caché por tags ---
+# Las señales no se disparan con QuerySet.update() ni bulk_create(); quien
+# use esas operaciones debe invalidar los tags manualmente.
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def invalidar_cache_catalogo(sender, instance, update_fields=None, **kwargs):
+    """Invalida el catálogo global y el dashboard de la empresa propietaria."""
+    # Los descuentos de stock de cada pedido no cambian categorías, destacados
+    # ni estadísticas del marketplace; solo el valor del inventario de la empresa
+    if update_fields and set(update_fields) == {'stock'}:
+        invalidar_tags_al_confirmar(tag_empresa(instance.usuario_id))
+        return
+    invalidar_tags_al_confirmar(TAG_CATALOGO, tag_empresa(instance.usuario_id))
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def invalidar_cache_pedidos(sender, instance, **kwargs):
+    """Invalida las métricas de pedidos del cliente y de la empresa."""
+    tags = {TAG_PEDIDOS, tag_empresa(instance.usuario_id)}
+    if instance.empresa_id:
+        tags.add(tag_empresa(instance.empresa_id))
+    invalidar_tags_al_confirmar(*tags)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_usuarios(sender, instance, update_fields=None, **kwargs):
+    """Invalida las métricas globales de usuarios."""
+    # Cada login guarda last_login; no afecta a ninguna métrica
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidar_tags_al_confirmar(TAG_GLOBAL, tag_empresa(instance.pk), tag_landing(instance.pk))
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_cache_perfiles(sender, instance, **kwargs):
+    """
+    Invalida métricas globales y catálogo: el tipo de cuenta decide
+    qué productos aparecen en las categorías públicas.
+    """
+    invalidar_tags_al_confirmar(TAG_GLOBAL, TAG_CATALOGO, tag_empresa(instance.usuario_id))
+
+
+# --- Invalidación de las páginas públicas de empresa ---
+# Landing page cacheada (LandingPageService.get_rendered_landing) y snapshots
+# de apps.accounts.prerender
+
+@receiver(post_save, sender=LandingPage)
+@receiver(post_delete, sender=LandingPage)
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def invalidar_cache_landing(sender, instance, update_fields=None, **kwargs):
+    """
+    Nueva versión del contenido público de la empresa propietaria.
+    
+    Incluye los guardados solo de stock (cada pedido): las tarjetas del
+    catálogo público muestran el stock y el aviso de stock bajo.
+    """
+    invalidar_tags_al_confirmar(tag_landing(instance.usuario_id))
+
+
+@receiver(post_save, sender=ImagenProducto)
+@receiver(post_delete, sender=ImagenProducto)
+@receiver(post_save, sender=ImagenServicio)
+@receiver(post_delete, sender=ImagenServicio)
+def invalidar_cache_landing_imagenes(sender, instance, origin=None, **kwargs):
+    """Las imágenes principales de productos y servicios aparecen en las páginas públicas."""
+    # Borradas en cascada con su producto/servicio (o su empresa): la señal
+    # del padre ya invalida la versión
+    if origin is not None and getattr(origin, 'model', type(origin)) is not sender:
+        return
+    
+    campo = sender._meta.get_field('producto' if sender is ImagenProducto else 'servicio')
+    # El padre suele estar cargado (formularios y vistas lo asignan); solo se consulta si no
+    padre = campo.get_cached_value(instance, default=None)
+    if padre is not None:
+        usuario_id = padre.usuario_id
+    else:
+        usuario_id = campo.related_model.objects.filter(
+            pk=getattr(instance, campo.attname)
+        ).values_list('usuario_id', flat=True).first()
+    if usuario_id:
+        invalidar_tags_al_confirmar(tag_landing(usuario_id))
+
+
+# --- Invalidación de entitlements (plan, límites y uso) ---
+
+@receiver(post_save, sender=Suscripcion)
+@receiver(post_delete, sender=Suscripcion)
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=LandingPage)
+@receiver(post_delete, sender=LandingPage)
+def invalidar_entitlements_usuario(sender, instance, update_fields=None, **kwargs):
+    """Cualquier cambio en suscripción, perfil o recursos del usuario altera sus entitlements."""
+    # Los descuentos de stock al crear pedidos no cambian el uso del plan
+    if update_fields and set(update_fields) == {'stock'}:
+        return
+    invalidar_entitlements_al_confirmar(instance.usuario_id)
+
+
+# --- Contadores de uso de PerfilUsuario ---
+# Se ajustan con F() dentro de la transacción del cambio. QuerySet.update()
+# y bulk_create() no envían señales: reconcile_usage_counters corrige la deriva.
+
+def _delta_activo(instance, created):
+    """+1 / -1 / 0 según cómo cambió activo en este guardado."""
+    if created:
+        return 1 if instance.activo else 0
+    if instance._activo_original is None or instance._activo_original == instance.activo:
+        return 0
+    return 1 if instance.activo else -1
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Servicio)
+def actualizar_contador_catalogo(sender, instance, created, **kwargs):
+    delta = _delta_activo(instance, created)
+    if delta:
+        campo = 'total_productos_activos' if sender is Producto else 'total_servicios_activos'
+        PerfilUsuario.ajustar_contadores(instance.usuario_id, **{campo: delta})
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Servicio)
+def descontar_contador_catalogo(sender, instance, **kwargs):
+    activo = instance.activo if instance._activo_original is None else instance._activo_original
+    if activo:
+        campo = 'total_productos_activos' if sender is Producto else 'total_servicios_activos'
+        PerfilUsuario.ajustar_contadores(instance.usuario_id, **{campo: -1})
+
+
+@receiver(post_save, sender=LandingPage)
+def sumar_contador_landing_pages(sender, instance, created, **kwargs):
+    if created:
+        PerfilUsuario.ajustar_contadores(instance.usuario_id, total_landing_pages=1)
+
+
+@receiver(post_delete, sender=LandingPage)
+def descontar_contador_landing_pages(sender, instance, **kwargs):
+    PerfilUsuario.ajustar_contadores(instance.usuario_id, total_landing_pages=-1)
+
+
+@receiver(post_save, sender=Pedido)
+def sumar_contador_pedidos(sender, instance, created, **kwargs):
+    if created:
+        PerfilUsuario.ajustar_contadores(instance.usuario_id, total_pedidos=1)
+
+
+@receiver(post_delete, sender=Pedido)
+def descontar_contador_pedidos(sender, instance, **kwargs):
+    PerfilUsuario.ajustar_contadores(instance.usuario_id, total_pedidos=-1)
+
+
+# --- Invalidación de buckets cerrados de MetricsService ---
+# Solo las eliminaciones y los cambios sobre registros antiguos alteran
+# buckets pasados; las altas siempre caen en el bucket en curso.
+
+def _invalidar_metricas_al_confirmar(series, momento):
+    transaction.on_commit(lambda: MetricsService.invalidar_buckets(series, momento))
+
+
+@receiver(post_delete, sender=Producto)
+def invalidar_metricas_producto(sender, instance, **kwargs):
+    _invalidar_metricas_al_confirmar(['productos'], instance.fecha_creacion)
+
+
+@receiver(post_delete, sender=Servicio)
+def invalidar_metricas_servicio(sender, instance, **kwargs):
+    _invalidar_metricas_al_confirmar(['servicios'], instance.fecha_creacion)
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_metricas_perfil(sender, instance, created=False, **kwargs):
+    """Las altas no afectan buckets pasados; un cambio de tipo de cuenta sí."""
+    if created:
+        return
+    _invalidar_metricas_al_confirmar(['usuarios', 'empresas'], instance.fecha_registro)
+
+
+@receiver(post_save, sender=VentaDiariaEmpresa)
+@receiver(post_delete, sender=VentaDiariaEmpresa)
+def invalidar_metricas_ventas(sender, instance, **kwargs):
+    """Un pedido antiguo que cambia de estado modifica el resumen de su día."""
+    _invalidar_metricas_al_confirmar(['pedidos', 'ingresos'], instance.fecha)
+
+
+# --- Registro de actividad (ActivityEvent) ---
+
+@receiver(post_save, sender=User)
+def registrar_actividad_usuario(sender, instance, created, **kwargs):
+    if created:
+        ActivityService.registrar(
+            ActivityEvent.USUARIO_REGISTRADO, actor=instance, objetivo=instance, detalle=instance.username
+        )
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Servicio)
+def registrar_actividad_catalogo(sender, instance, created, update_fields=None, **kwargs):
+    """Registra altas y ediciones; los guardados parciales internos (update_fields) se omiten."""
+    if created:
+        verbo = ActivityEvent.PRODUCTO_CREADO if sender is Producto else ActivityEvent.SERVICIO_CREADO
+    elif update_fields is None:
+        verbo = ActivityEvent.PRODUCTO_ACTUALIZADO if sender is Producto else ActivityEvent.SERVICIO_ACTUALIZADO
+    else:
+        return
+    ActivityService.registrar(verbo, actor=instance.usuario, objetivo=instance, detalle=instance.nombre)
+
+
+@receiver(post_save, sender=Pedido)
+def registrar_actividad_pedido(sender, instance, created, **kwargs):
+    """Pedido.save() actualiza _estado_original después de enviar post_save."""
+    if created:
+        ActivityService.registrar(ActivityEvent.PEDIDO_CREADO, actor=instance.usuario, objetivo=instance)
+    elif instance.estado != instance._estado_original:
+        ActivityService.registrar(
+            ActivityEvent.PEDIDO_ESTADO,
+            actor=instance.empresa,
+            objetivo=instance,
+            detalle=instance.get_estado_display(),
+        )
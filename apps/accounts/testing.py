@@ -0,0 +1,76 @@
+"""
+Datos y utilidades comunes de los tests de las apps.
+
+Uso:
+    from apps.accounts.testing import CachesLimpiasMixin, crear_empresa
+
+    class MisTests(CachesLimpiasMixin, TestCase):
+        def setUp(self):
+            super().setUp()
+            self.empresa = crear_empresa('empresa_prueba')
+"""
+
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+
+from apps.accounts.models import PerfilUsuario
+from apps.productservice.models import Producto, Servicio
+
+# Contraseña de todos los usuarios de prueba
+CLAVE = 'clave-de-prueba-123'
+
+
+def crear_usuario(username, **campos):
+    """Usuario cliente (el perfil lo crea la señal de User)."""
+    return User.objects.create_user(username, password=CLAVE, **campos)
+
+
+def crear_empresa(username, **campos):
+    """Usuario empresa con su perfil."""
+    usuario = crear_usuario(username, **campos)
+    PerfilUsuario.objects.update_or_create(
+        usuario=usuario, defaults={'tipo_cuenta': 'empresa', 'empresa': f'Empresa {username}'}
+    )
+    return usuario
+
+
+def crear_producto(usuario, nombre='Producto', activo=True, **campos):
+    datos = {'descripcion': 'Descripción', 'precio': 10, 'stock': 50, 'categoria': 'General', **campos}
+    return Producto.objects.create(usuario=usuario, nombre=nombre, activo=activo, **datos)
+
+
+def crear_servicio(usuario, nombre='Servicio', activo=True, **campos):
+    datos = {'descripcion': 'Descripción', 'precio': 20, 'categoria': 'General', **campos}
+    return Servicio.objects.create(usuario=usuario, nombre=nombre, activo=activo, **datos)
+
+
+def iniciar_sesion(client, username):
+    """Inicia sesión por el formulario de login, como un usuario real."""
+    respuesta = client.post(reverse('login'), {'username': username, 'password': CLAVE})
+    assert respuesta.status_code == 302, 'No se pudo iniciar sesión'
+    return respuesta
+
+
+class CachesLimpiasMixin:
+    """Vacía todas las cachés: la L1 en memoria no se revierte con la transacción del test."""
+
+    def setUp(self):
+        super().setUp()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+
+class MediaTemporalMixin:
+    """MEDIA_ROOT en un directorio temporal que se borra al terminar cada test."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
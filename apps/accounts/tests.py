@@ -1,3 +1,803 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts import entitlements, prerender
+from apps.accounts.authorization import obtener_contexto_autorizacion
+from apps.accounts.cache_utils import (
+    TAG_CATALOGO, invalidar_tags, obtener_dos_niveles, obtener_o_calcular, tag_empresa, version_tags,
+)
+from apps.accounts.cart import Carrito
+from apps.accounts.decorators import empresa_required, profile_complete_required
+from apps.accounts.entitlements import invalidar_entitlements, obtener_entitlements
+from apps.accounts.management.commands.warm_caches import Command as WarmCachesCommand
+from apps.accounts.models import ActivityEvent, PerfilUsuario
+from apps.accounts.ratelimit import registrar_peticion
+from apps.accounts.services import ActivityService, DashboardService, MetricsService, UserService
+from apps.accounts.testing import (
+    CLAVE, CachesLimpiasMixin, crear_empresa, crear_producto, crear_servicio, crear_usuario, iniciar_sesion,
+)
+from apps.productservice.models import ImagenProducto, Pedido, Producto, VentaDiariaEmpresa
+from apps.productservice.services import PedidoService
+from apps.webpages.models import LandingPage
+
+
+def contadores(usuario):
+    return PerfilUsuario.objects.filter(usuario=usuario).values(
+        'total_productos_activos', 'total_servicios_activos', 'total_landing_pages', 'total_pedidos',
+    ).get()
+
+
+class EntitlementsTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_entitlements')
+
+    def test_uso_se_actualiza_al_confirmar_un_producto(self):
+        self.assertEqual(obtener_entitlements(self.empresa).uso['productos'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_producto(self.empresa)
+
+        self.assertEqual(obtener_entitlements(self.empresa).uso['productos'], 1)
+
+    def test_calculo_anterior_a_una_invalidacion_no_se_reutiliza(self):
+        calcular = entitlements.calcular_entitlements
+
+        def calcular_con_cambio_concurrente(user):
+            resultado = calcular(user)
+            # Otro proceso confirma un cambio mientras se calculaba
+            invalidar_entitlements(user.pk)
+            return resultado
+
+        with mock.patch.object(
+            entitlements, 'calcular_entitlements', side_effect=calcular_con_cambio_concurrente
+        ) as calculo:
+            obtener_entitlements(self.empresa)
+            obtener_entitlements(self.empresa)
+
+        self.assertEqual(calculo.call_count, 2)
+
+    def test_limite_del_plan_basico(self):
+        PerfilUsuario.objects.filter(usuario=self.empresa).update(total_productos_activos=10)
+        invalidar_entitlements(self.empresa.pk)
+
+        resultado = obtener_entitlements(self.empresa)
+        self.assertEqual(resultado.plan, 'basico')
+        self.assertFalse(resultado.permite('productos'))
+        self.assertTrue(resultado.permite('servicios'))
+
+
+class ContadoresUsoTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_contadores')
+
+    def test_productos_activos(self):
+        producto = crear_producto(self.empresa)
+        crear_producto(self.empresa, 'Inactivo', activo=False)
+        self.assertEqual(contadores(self.empresa)['total_productos_activos'], 1)
+
+        producto.activo = False
+        producto.save()
+        self.assertEqual(contadores(self.empresa)['total_productos_activos'], 0)
+
+        producto.activo = True
+        producto.save()
+        producto.save()
+        self.assertEqual(contadores(self.empresa)['total_productos_activos'], 1)
+
+    def test_servicios_landing_pages_y_pedidos(self):
+        servicio = crear_servicio(self.empresa)
+        landing = LandingPage.objects.create(usuario=self.empresa, titulo='Landing')
+        cliente = crear_usuario('cliente_contadores')
+        Pedido.objects.create(usuario=cliente, empresa=self.empresa, total=20)
+
+        self.assertEqual(contadores(self.empresa)['total_servicios_activos'], 1)
+        self.assertEqual(contadores(self.empresa)['total_landing_pages'], 1)
+        self.assertEqual(contadores(cliente)['total_pedidos'], 1)
+
+        servicio.delete()
+        landing.delete()
+        self.assertEqual(contadores(self.empresa)['total_servicios_activos'], 0)
+        self.assertEqual(contadores(self.empresa)['total_landing_pages'], 0)
+
+    def test_los_contadores_no_bajan_de_cero(self):
+        PerfilUsuario.ajustar_contadores(self.empresa.pk, total_productos_activos=-1)
+        self.assertEqual(contadores(self.empresa)['total_productos_activos'], 0)
+
+    def test_reconcile_corrige_la_deriva(self):
+        crear_producto(self.empresa)
+        PerfilUsuario.objects.filter(usuario=self.empresa).update(total_productos_activos=7)
+
+        call_command('reconcile_usage_counters', stdout=StringIO())
+
+        self.assertEqual(contadores(self.empresa)['total_productos_activos'], 1)
+
+
+class RateLimitTests(CachesLimpiasMixin, TestCase):
+
+    VENTANA = 60
+    LIMITE = 4
+
+    def _registrar(self, instante, alcance):
+        # Solo el reloj de ratelimit: la caché calcula sus expiraciones con la hora real
+        with mock.patch('apps.accounts.ratelimit.time') as reloj:
+            reloj.time.return_value = instante
+            return registrar_peticion(alcance, 'ip:10.0.0.1', self.LIMITE, self.VENTANA)
+
+    def test_ventana_deslizante(self):
+        for backend in ('db', 'cache'):
+            alcance = f'prueba_{backend}'
+            with self.subTest(backend=backend), override_settings(RATE_LIMIT_BACKEND=backend):
+                inicio = 600 * self.VENTANA
+                resultados = [self._registrar(inicio, alcance) for _ in range(self.LIMITE + 1)]
+                self.assertTrue(all(resultado.permitido for resultado in resultados[:-1]))
+                self.assertFalse(resultados[-1].permitido)
+                self.assertGreaterEqual(resultados[-1].reintentar_en, 1)
+
+                # A mitad de la siguiente ventana pesa la mitad de la anterior (5 peticiones)
+                mitad = inicio + self.VENTANA * 1.5
+                self.assertTrue(self._registrar(mitad, alcance).permitido)   # 2.5 + 1
+                self.assertFalse(self._registrar(mitad, alcance).permitido)  # 2.5 + 2
+
+                # Dos ventanas después ya no queda nada de la primera
+                self.assertTrue(self._registrar(inicio + self.VENTANA * 3, alcance).permitido)
+
+    @override_settings(RATE_LIMIT_BACKEND='db')
+    def test_login_responde_429_al_superar_el_limite(self):
+        url = reverse('login')
+        datos = {'username': 'nadie', 'password': 'incorrecta'}
+        for _ in range(10):
+            self.assertEqual(self.client.post(url, datos).status_code, 200)
+
+        respuesta = self.client.post(url, datos)
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertIn('Retry-After', respuesta)
+        # Los GET no cuentan
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SnapshotsTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.enterContext(override_settings(PRERENDER_ENABLED=True, PRERENDER_ROOT=directorio))
+
+        self.empresa = crear_empresa('empresa_snapshots')
+        self.landing = LandingPage.objects.create(usuario=self.empresa, titulo='Landing de prueba')
+        self.url = reverse('webpages:public_landing_page', args=[self.empresa.pk])
+
+    def test_sirve_la_variante_comprimida_con_su_etag(self):
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertTrue(respuesta['ETag'].endswith('-gz"'))
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+        html = gzip.decompress(b''.join(respuesta.streaming_content)).decode()
+        self.assertIn('Landing de prueba', html)
+
+    def test_304_solo_para_la_misma_codificacion(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Content-Encoding', respuesta)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_cambio_de_contenido_genera_un_snapshot_nuevo(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.landing.titulo = 'Título nuevo'
+            self.landing.save()
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Título nuevo', b''.join(respuesta.streaming_content).decode())
+
+    def test_usuarios_autenticados_reciben_la_vista_dinamica(self):
+        respuesta = self.client.post(reverse('login'), {'username': 'empresa_snapshots', 'password': CLAVE})
+        self.assertEqual(respuesta.status_code, 302)
+
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Content-Encoding', respuesta)
+        self.assertNotIn('ETag', respuesta)
+
+    def test_mensajes_pendientes_excluyen_el_snapshot(self):
+        request = RequestFactory().get(self.url)
+        request.user = AnonymousUser()
+        request.session = {}
+        self.assertTrue(prerender._admite_snapshot(request))
+
+        request.session = {'_messages': '[]'}
+        self.assertFalse(prerender._admite_snapshot(request))
+
+        request.session = {}
+        request.COOKIES['messages'] = 'pendientes'
+        self.assertFalse(prerender._admite_snapshot(request))
+
+    def test_comando_genera_los_snapshots_y_poda_las_versiones_viejas(self):
+        call_command('prerender_company_pages', empresa=[self.empresa.pk], stdout=StringIO())
+        version = prerender.version_empresa(self.empresa.pk)
+        for pagina in prerender.PAGINAS:
+            self.assertTrue(os.path.exists(prerender.ruta_snapshot(pagina, self.empresa.pk, version)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.landing.titulo = 'Otra versión'
+            self.landing.save()
+        call_command('prerender_company_pages', empresa=[self.empresa.pk], paginas=['landing'], stdout=StringIO())
+
+        nueva = prerender.version_empresa(self.empresa.pk)
+        self.assertTrue(os.path.exists(prerender.ruta_snapshot('landing', self.empresa.pk, nueva)))
+        self.assertFalse(os.path.exists(prerender.ruta_snapshot('landing', self.empresa.pk, version)))
+
+
+class InvalidacionPaginasPublicasTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_invalidacion')
+        self.producto = crear_producto(self.empresa, stock=6)
+        self.cliente = crear_usuario('cliente_invalidacion')
+
+    def test_un_pedido_cambia_la_version_de_las_paginas_publicas(self):
+        # Las tarjetas del catálogo muestran el stock y el aviso de stock bajo
+        version = prerender.version_empresa(self.empresa.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PedidoService.create_pedido(
+                self.cliente, self.empresa, [{'tipo': 'producto', 'id': self.producto.pk, 'cantidad': 2}]
+            )
+
+        self.assertNotEqual(prerender.version_empresa(self.empresa.pk), version)
+
+    def _consultas_de_propietario(self, consultas):
+        return [c['sql'] for c in consultas if 'SELECT "productservice_producto"."usuario_id"' in c['sql']]
+
+    def test_las_imagenes_usan_el_producto_cargado(self):
+        version = prerender.version_empresa(self.empresa.pk)
+
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            ImagenProducto.objects.create(producto=self.producto, imagen='productos/a.jpg', placeholder='x')
+
+        self.assertEqual(self._consultas_de_propietario(consultas), [])
+        self.assertNotEqual(prerender.version_empresa(self.empresa.pk), version)
+
+    def test_el_borrado_en_cascada_no_consulta_cada_imagen(self):
+        for numero in range(3):
+            ImagenProducto.objects.create(producto=self.producto, imagen=f'productos/{numero}.jpg', placeholder='x')
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.producto.delete()
+
+        self.assertEqual(self._consultas_de_propietario(consultas), [])
+
+
+class ActivityServiceTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_actividad')
+        self.cliente = crear_usuario('cliente_actividad')
+        ActivityService.get_recent()  # Inicializa el feed
+
+    def _feed(self):
+        return [(item['description'], item['user']) for item in ActivityService.get_recent(ActivityService.FEED_TAMANO)]
+
+    def test_el_feed_en_cache_coincide_con_el_reconstruido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_producto(self.empresa, 'Lámpara')
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = Pedido.objects.create(usuario=self.cliente, empresa=self.empresa, total=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.estado = 'completado'
+            pedido.save()
+
+        en_cache = self._feed()
+        self.assertEqual(en_cache[:3], [
+            (f'Pedido #{pedido.pk} cambió a Completado', 'empresa_actividad'),
+            (f'Pedido #{pedido.pk} realizado', 'cliente_actividad'),
+            ('Producto creado: Lámpara', 'empresa_actividad'),
+        ])
+
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.assertEqual(self._feed(), en_cache)
+
+    def test_el_feed_conserva_solo_los_ultimos_eventos(self):
+        total = ActivityService.FEED_TAMANO + 7
+        for numero in range(total):
+            with self.captureOnCommitCallbacks(execute=True):
+                ActivityService.registrar(ActivityEvent.USUARIO_ACTIVADO, actor=self.empresa, detalle=f'u{numero}')
+
+        feed = ActivityService.get_recent(ActivityService.FEED_TAMANO)
+        self.assertEqual(len(feed), ActivityService.FEED_TAMANO)
+        self.assertEqual(feed[0]['description'], f'Usuario activado: u{total - 1}')
+        self.assertEqual([item['seq'] for item in feed], sorted((item['seq'] for item in feed), reverse=True))
+
+
+class DashboardCacheTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_dashboard')
+        self.calcular = mock.Mock(side_effect=lambda: self.calcular.call_count)
+
+    def test_los_tags_invalidan_las_entradas_que_dependen_de_ellos(self):
+        def obtener():
+            return obtener_o_calcular('valor', self.calcular, tags=['a', 'b'], ttl=60)
+
+        self.assertEqual((obtener(), obtener()), (1, 1))
+        invalidar_tags('otro')
+        self.assertEqual(obtener(), 1)
+        invalidar_tags('b')
+        self.assertEqual(obtener(), 2)
+
+    def test_valor_caducado_se_sirve_mientras_otro_proceso_recalcula(self):
+        obtener_o_calcular('valor', self.calcular, tags=['a'], ttl=60)
+        invalidar_tags('a')
+        # Otro proceso tiene el lock de recálculo
+        caches['default'].add('valor:lock', 1)
+
+        self.assertEqual(obtener_o_calcular('valor', self.calcular, tags=['a'], ttl=60), 1)
+        self.assertEqual(self.calcular.call_count, 1)
+
+    def test_el_dashboard_de_empresa_se_actualiza_con_las_senales(self):
+        self.assertEqual(DashboardService.get_company_dashboard_data(self.empresa)['productos_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = crear_producto(self.empresa, precio=10, stock=5)
+        self.assertEqual(DashboardService.get_company_dashboard_data(self.empresa)['productos_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.precio = 25
+            producto.save()
+        self.assertEqual(DashboardService.get_company_dashboard_data(self.empresa)['productos_valor_total'], 25)
+
+    def test_guardar_solo_el_stock_no_invalida_el_catalogo_global(self):
+        producto = crear_producto(self.empresa)
+        catalogo, empresa = version_tags([TAG_CATALOGO]), version_tags([tag_empresa(self.empresa.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.stock = 1
+            producto.save(update_fields=['stock'])
+
+        self.assertEqual(version_tags([TAG_CATALOGO]), catalogo)
+        self.assertNotEqual(version_tags([tag_empresa(self.empresa.pk)]), empresa)
+
+    def test_clear_dashboard_cache_incluye_las_categorias(self):
+        antes = version_tags(DashboardService.CATEGORIAS_TAGS)
+        DashboardService.clear_dashboard_cache()
+        self.assertNotEqual(version_tags(DashboardService.CATEGORIAS_TAGS), antes)
+
+
+class MetricsServiceTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_metricas')
+
+    def _producto_de_hace(self, dias):
+        producto = crear_producto(self.empresa)
+        Producto.objects.filter(pk=producto.pk).update(fecha_creacion=timezone.now() - timedelta(days=dias))
+        producto.refresh_from_db()
+        return producto
+
+    def _valores(self, periodo='dia', buckets=3):
+        return [bucket['valor'] for bucket in MetricsService.get_series('productos', periodo, buckets)]
+
+    def test_agrupa_por_dia_y_semana(self):
+        hoy = timezone.localdate()
+        for dias in (0, 1, 1, 7):
+            self._producto_de_hace(dias)
+
+        series = MetricsService.get_series('productos', 'dia', 3)
+        self.assertEqual([bucket['fecha'] for bucket in series], [hoy - timedelta(days=dias) for dias in (2, 1, 0)])
+        self.assertEqual([bucket['valor'] for bucket in series], [0, 2, 1])
+
+        semanas = MetricsService.get_series('productos', 'semana', 2)
+        self.assertEqual(semanas[-1]['fecha'].weekday(), 0)
+        self.assertEqual(sum(bucket['valor'] for bucket in semanas), 4)
+
+    def test_los_buckets_cerrados_quedan_en_cache(self):
+        producto = self._producto_de_hace(1)
+        self.assertEqual(self._valores(), [0, 1, 0])
+
+        # Cambio sin señales: el bucket cerrado sigue en caché
+        Producto.objects.filter(pk=producto.pk).update(fecha_creacion=timezone.now() - timedelta(days=2))
+        self.assertEqual(self._valores(), [0, 1, 0])
+
+        MetricsService.invalidar_series('productos')
+        self.assertEqual(self._valores(), [1, 0, 0])
+
+    def test_eliminar_un_registro_antiguo_invalida_la_serie(self):
+        producto = self._producto_de_hace(1)
+        self.assertEqual(self._valores(), [0, 1, 0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.delete()
+
+        self.assertEqual(self._valores(), [0, 0, 0])
+
+    def test_invalidar_el_bucket_en_curso_conserva_los_cerrados(self):
+        antiguo = self._producto_de_hace(1)
+        self.assertEqual(self._valores(), [0, 1, 0])
+        Producto.objects.filter(pk=antiguo.pk).update(fecha_creacion=timezone.now() - timedelta(days=2))
+
+        nuevo = crear_producto(self.empresa)
+        MetricsService.invalidar_buckets(['productos'], nuevo.fecha_creacion)
+
+        self.assertEqual(self._valores(), [0, 1, 1])
+
+    def test_tendencias(self):
+        self._producto_de_hace(1)
+
+        tendencias = MetricsService.get_user_activity_trends(days=7)
+        self.assertEqual(tendencias['product_creation_trend'], {'variacion': 'Nuevo', 'tendencia': 'positive'})
+        self.assertEqual(tendencias['order_trend'], {'variacion': 'Sin cambios', 'tendencia': 'neutral'})
+        self.assertEqual(MetricsService._variacion(15, 10), {'variacion': '+50%', 'tendencia': 'positive'})
+
+
+class AdminMetricsTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        crear_usuario('admin_metricas', is_superuser=True)
+        iniciar_sesion(self.client, 'admin_metricas')
+        self.url = reverse('admin_metrics_api')
+
+    def test_responde_el_snapshot_con_etag_y_304(self):
+        respuesta = self.client.get(self.url)
+
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['metrics']['total_users'], User.objects.count())
+        self.assertEqual(set(datos['timings_ms']), {'usuarios', 'productos', 'servicios', 'pedidos'})
+        self.assertIn('last_updated', datos)
+
+        repetida = self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+
+    def test_un_cambio_confirmado_cambia_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_producto(crear_empresa('empresa_metricas_admin'))
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.json()['metrics']['total_products'], 1)
+
+    def test_el_dashboard_usa_las_metricas_en_cache(self):
+        with mock.patch.object(
+            DashboardService, '_calcular_admin_metrics', wraps=DashboardService._calcular_admin_metrics
+        ) as calcular:
+            self.assertEqual(self.client.get(reverse('admin_dashboard')).status_code, 200)
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        calcular.assert_called_once_with()
+
+    def test_solo_administradores(self):
+        crear_usuario('cliente_metricas')
+        iniciar_sesion(self.client, 'cliente_metricas')
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class WarmCachesTests(CachesLimpiasMixin, TestCase):
+
+    def test_elige_las_empresas_con_mas_pedidos_recientes(self):
+        tranquila, activa, antigua = (crear_empresa(f'empresa_warm_{numero}') for numero in range(3))
+        VentaDiariaEmpresa.objects.create(empresa=activa, fecha=timezone.localdate(), pedidos_total=5)
+        VentaDiariaEmpresa.objects.create(empresa=tranquila, fecha=timezone.localdate(), pedidos_total=1)
+        VentaDiariaEmpresa.objects.create(
+            empresa=antigua, fecha=timezone.localdate() - timedelta(days=90), pedidos_total=50
+        )
+
+        empresas = WarmCachesCommand().empresas_mas_activas(2)
+        self.assertEqual(empresas, [activa, tranquila])
+
+    def test_las_tareas_dejan_calientes_los_dashboards(self):
+        empresa = crear_empresa('empresa_warm')
+
+        tareas = dict(WarmCachesCommand().construir_tareas(5))
+        self.assertIn(f'dashboard de empresa {empresa.id}', tareas)
+        # Los hilos no ven la transacción del test: las tareas se ejecutan aquí
+        for tarea in tareas.values():
+            tarea()
+
+        with mock.patch.object(DashboardService, '_calcular_company_dashboard') as calcular_empresa, \
+                mock.patch.object(DashboardService, '_calcular_admin_metrics') as calcular_admin:
+            DashboardService.get_company_dashboard_data(empresa)
+            DashboardService.get_admin_metrics()
+        calcular_empresa.assert_not_called()
+        calcular_admin.assert_not_called()
+
+    def test_respeta_el_presupuesto_de_tiempo(self):
+        liberar = threading.Event()
+        self.addCleanup(liberar.set)
+
+        def fallar():
+            raise RuntimeError('sin conexión')
+
+        tareas = [('rápida', lambda: None), ('con error', fallar), ('lenta', lambda: liberar.wait(10))]
+        salida = StringIO()
+        inicio = time.monotonic()
+        with mock.patch.object(WarmCachesCommand, 'construir_tareas', return_value=tareas):
+            call_command('warm_caches', '--forzar', '--hilos', '1', '--presupuesto', '1', stdout=salida)
+
+        self.assertLess(time.monotonic() - inicio, 5)
+        self.assertIn('1 cachés precalculados', salida.getvalue())
+        self.assertIn('1 con error', salida.getvalue())
+        self.assertIn('1 sin terminar dentro del presupuesto de 1s', salida.getvalue())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_no_calienta_una_cache_local_al_proceso(self):
+        with mock.patch.object(WarmCachesCommand, 'construir_tareas') as construir:
+            call_command('warm_caches', stdout=StringIO())
+        construir.assert_not_called()
+
+
+class BuscarUsuariosTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.usuarios = [crear_usuario(f'busqueda_{numero}') for numero in range(5)]
+        # Empates de fecha: el cursor desempata por id
+        User.objects.filter(username__startswith='busqueda_').update(date_joined=timezone.now())
+
+    def _nombres(self, resultado):
+        return [usuario.username for usuario in resultado['usuarios']]
+
+    def test_recorre_las_paginas_sin_repetir_ni_saltar(self):
+        resultado = UserService.buscar_usuarios('busqueda', limite=2)
+        paginas = [self._nombres(resultado)]
+        while resultado['siguiente']:
+            resultado = UserService.buscar_usuarios('busqueda', resultado['siguiente'], limite=2)
+            paginas.append(self._nombres(resultado))
+
+        vistos = [nombre for pagina in paginas for nombre in pagina]
+        self.assertEqual(vistos, [f'busqueda_{numero}' for numero in range(4, -1, -1)])
+        self.assertEqual([len(pagina) for pagina in paginas], [2, 2, 1])
+
+        # Volver hacia atrás desde la última página
+        anterior = UserService.buscar_usuarios('busqueda', resultado['anterior'], anterior=True, limite=2)
+        self.assertEqual(self._nombres(anterior), paginas[1])
+        self.assertIsNotNone(anterior['siguiente'])
+
+    def test_busca_en_usuario_email_y_empresa(self):
+        crear_usuario('por_email', email='ventas@busqueda.com')
+        crear_empresa('por_empresa')
+        PerfilUsuario.objects.filter(usuario__username='por_empresa').update(empresa='Busqueda SA')
+
+        nombres = self._nombres(UserService.buscar_usuarios('BUSQUEDA', limite=20))
+        self.assertIn('por_email', nombres)
+        self.assertIn('por_empresa', nombres)
+
+        # Las búsquedas cortas solo comparan el inicio
+        self.assertNotIn('por_email', self._nombres(UserService.buscar_usuarios('bu', limite=20)))
+
+    def test_conteos_anotados_en_una_consulta(self):
+        empresa = crear_empresa('busqueda_empresa')
+        crear_producto(empresa)
+        crear_producto(empresa, 'Otro')
+        crear_servicio(empresa)
+        Pedido.objects.create(usuario=self.usuarios[0], empresa=empresa, total=10)
+
+        with self.assertNumQueries(1):
+            resultado = UserService.buscar_usuarios('busqueda')
+        usuarios = {usuario.username: usuario for usuario in resultado['usuarios']}
+
+        self.assertEqual(
+            (usuarios['busqueda_empresa'].productos_count, usuarios['busqueda_empresa'].servicios_count), (2, 1)
+        )
+        self.assertEqual(usuarios['busqueda_empresa'].pedidos_recibidos_count, 1)
+        self.assertEqual(usuarios['busqueda_0'].pedidos_count, 1)
+
+    def test_cursor_no_valido(self):
+        with self.assertRaises(ValueError):
+            UserService.buscar_usuarios(cursor='mañana')
+
+        # La vista vuelve a la primera página
+        crear_usuario('admin_busqueda', is_superuser=True)
+        iniciar_sesion(self.client, 'admin_busqueda')
+        respuesta = self.client.get(reverse('manage_users'), {'search': 'busqueda_', 'despues': 'mañana'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['users']), 5)
+
+
+class CacheDosNivelesTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calcular = mock.Mock(side_effect=lambda: self.calcular.call_count)
+        # Reloj de cache_utils; las cachés siguen usando el real
+        self.reloj = mock.patch('apps.accounts.cache_utils.time', wraps=time).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _obtener(self):
+        return obtener_dos_niveles('dos_niveles', self.calcular, tags=['datos'], ttl=60, ttl_local=5)
+
+    def _avanzar(self, segundos):
+        self.reloj.time.return_value = time.time() + segundos
+
+    @skipUnless(settings.CACHE_BACKEND == 'db', 'Solo sin Redis')
+    def test_la_cache_compartida_es_la_base_de_datos_sin_redis(self):
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.db.DatabaseCache')
+        self.assertEqual(settings.CACHES['local']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        caches['default'].set('prueba', 1)
+        self.assertEqual(caches['default'].get('prueba'), 1)
+
+    def test_el_l1_responde_sin_consultar_la_cache_compartida(self):
+        self.assertEqual(self._obtener(), 1)
+
+        with mock.patch('apps.accounts.cache_utils.version_tags') as version:
+            self.assertEqual(self._obtener(), 1)
+        version.assert_not_called()
+
+    def test_la_invalidacion_llega_al_revalidar(self):
+        self._obtener()
+        invalidar_tags('datos')
+        self.assertEqual(self._obtener(), 1)
+
+        self._avanzar(6)
+        self.assertEqual(self._obtener(), 2)
+
+    def test_sin_cambios_se_sigue_usando_la_copia_local(self):
+        self._obtener()
+        self._avanzar(6)
+
+        with mock.patch('apps.accounts.cache_utils._obtener_entrada') as entrada_l2:
+            self.assertEqual(self._obtener(), 1)
+        entrada_l2.assert_not_called()
+
+    def test_un_valor_caducado_no_se_copia_al_l1(self):
+        self._obtener()
+        invalidar_tags('datos')
+        caches['local'].clear()
+        caches['default'].add('dos_niveles:lock', 1)
+
+        # Otro proceso recalcula: se sirve el valor anterior sin guardarlo en L1
+        self.assertEqual(self._obtener(), 1)
+        self.assertIsNone(caches['local'].get('dos_niveles'))
+
+
+class CarritoTests(CachesLimpiasMixin, TestCase):
+
+    def test_formato_compacto_y_escritura_solo_con_cambios(self):
+        sesion = {}
+        carrito = Carrito(sesion)
+        self.assertFalse(carrito.guardar())
+        self.assertEqual(sesion, {})
+
+        carrito.agregar(7)
+        carrito.agregar('7')
+        carrito.agregar(3, 4)
+        self.assertTrue(carrito.guardar())
+        self.assertEqual(sesion['cart'], '7:2,3:4')
+        self.assertFalse(Carrito(sesion).guardar())
+
+        carrito.vaciar()
+        carrito.guardar()
+        self.assertNotIn('cart', sesion)
+
+    def test_lee_el_formato_anterior_y_lo_convierte(self):
+        sesion = {'cart': {'12': 3, 'x': 1, '5': 0}}
+        carrito = Carrito(sesion)
+
+        self.assertEqual(carrito.items, {12: 3})
+        self.assertTrue(carrito.guardar())
+        self.assertEqual(sesion['cart'], '12:3')
+
+    def test_leer_el_carrito_no_modifica_la_sesion(self):
+        sesion = SessionStore()
+        sesion['cart'] = '1:2'
+        sesion.save()
+
+        sesion = SessionStore(sesion.session_key)
+        carrito = Carrito(sesion)
+        self.assertEqual(carrito.total_items, 2)
+        carrito.guardar()
+        self.assertFalse(sesion.modified)
+
+    def test_vistas_del_carrito(self):
+        producto = crear_producto(crear_empresa('empresa_carrito'), precio=Decimal('2.50'), stock=5)
+        crear_usuario('cliente_carrito')
+        iniciar_sesion(self.client, 'cliente_carrito')
+        url = reverse('add_to_cart', args=[producto.pk])
+
+        for _ in range(2):
+            datos = self.client.post(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual((datos['cart_count'], datos['cart_total']), (2, '5.00'))
+        self.assertEqual(self.client.session['cart'], f'{producto.pk}:2')
+
+        # La vista previa no reescribe la sesión
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(reverse('cart_preview')).json()
+        self.assertEqual(datos['cart_count'], 2)
+        self.assertFalse([
+            consulta for consulta in consultas
+            if 'django_session' in consulta['sql'] and not consulta['sql'].startswith('SELECT')
+        ])
+
+
+class ContextoAutorizacionTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_autorizacion')
+        PerfilUsuario.objects.filter(usuario=self.empresa).update(telefono='600000000', direccion='Calle 1')
+
+        @empresa_required
+        @profile_complete_required
+        def vista(request):
+            return HttpResponse('ok')
+        self.vista = vista
+
+    def _peticion(self, user):
+        peticion = RequestFactory().get('/')
+        peticion.user = user
+        peticion.session = {}
+        peticion._messages = FallbackStorage(peticion)
+        return peticion
+
+    def test_los_decoradores_cargan_el_perfil_una_vez(self):
+        peticion = self._peticion(User.objects.get(pk=self.empresa.pk))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.vista(peticion).status_code, 200)
+            contexto = obtener_contexto_autorizacion(peticion)
+            self.assertTrue(contexto.es_empresa)
+            self.assertFalse(contexto.es_admin)
+            self.assertIs(peticion.user.userprofile, contexto.perfil)
+
+    def test_deniega_a_los_consumidores(self):
+        respuesta = self.vista(self._peticion(crear_usuario('cliente_autorizacion')))
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_perfil_incompleto(self):
+        PerfilUsuario.objects.filter(usuario=self.empresa).update(direccion='')
+        peticion = self._peticion(User.objects.get(pk=self.empresa.pk))
+
+        self.assertEqual(self.vista(peticion).status_code, 302)
+        self.assertEqual(obtener_contexto_autorizacion(peticion).campos_faltantes, ['dirección'])
+
+    def test_anonimos_y_cambio_de_usuario(self):
+        peticion = self._peticion(AnonymousUser())
+        with self.assertNumQueries(0):
+            contexto = obtener_contexto_autorizacion(peticion)
+            self.assertFalse(contexto.es_empresa or contexto.es_admin or contexto.tiene_perfil)
+
+        # Tras un login en la misma petición el contexto se recalcula
+        peticion.user = User.objects.get(pk=self.empresa.pk)
+        self.assertTrue(obtener_contexto_autorizacion(peticion).es_empresa)
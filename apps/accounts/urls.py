@@ -1,11 +1,15 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
+from .decorators import rate_limit
 from .password_reset_views import PasswordResetView
 
 urlpatterns = [
     path('', views.landing, name='landing'),  # Página de inicio pública
-    path('login/', auth_views.LoginView.as_view(template_name='accounts/login.html'), name='login'),  # Login de usuario
+    # Login de usuario: máximo 10 intentos por IP cada 5 minutos
+    path('login/', rate_limit(10, 5, key='ip', methods=('POST',), scope='login')(
+        auth_views.LoginView.as_view(template_name='accounts/login.html')
+    ), name='login'),
     path('logout/', views.logout_view, name='logout'),  # Logout de usuario
     path('register/', views.register, name='register'),  # Registro de usuario
     path('home/', views.home, name='home'),  # Dashboard del usuario autenticado
@@ -21,6 +25,7 @@ urlpatterns = [
     
     # URLs del panel de administración
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),  # Dashboard de admin
+    path('dashboard/metrics/', views.admin_metrics_api, name='admin_metrics_api'),  # Métricas del dashboard (JSON)
     path('dashboard/users/', views.manage_users, name='manage_users'),  # Gestión de usuarios
     path('dashboard/users/<int:user_id>/', views.user_detail, name='user_detail'),  # Detalle de usuario
     path('dashboard/users/<int:user_id>/delete/', views.delete_user, name='delete_user'),  # Eliminar usuario
@@ -48,6 +53,7 @@ urlpatterns = [
     
     # URLs de pedidos - Vista de la empresa
     path('pedidos-empresa/', views.pedidos_empresa, name='pedidos_empresa'),
+    path('clientes-empresa/', views.clientes_empresa, name='clientes_empresa'),
     path('pedido-empresa/<int:pedido_id>/', views.pedido_empresa_detail, name='pedido_empresa_detail'),
     path('pedido/<int:pedido_id>/update-status/', views.update_pedido_status, name='update_pedido_status'),
 ] 
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .forms import RegistroUsuarioForm
-from apps.accounts.models import PerfilUsuario
+from apps.accounts.models import PerfilUsuario, ActivityEvent
 from django.contrib.auth import logout as auth_logout
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
@@ -9,8 +9,14 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_protect
 from apps.productservice.models import Producto, Servicio, Pedido, MensajePedido
-from apps.productservice.services import PedidoService
-from apps.accounts.services import UserService
+from apps.productservice.services import CatalogService, PedidoService
+from apps.productservice.exports import FORMATOS as FORMATOS_EXPORTACION, respuesta_exportacion
+from apps.accounts.services import UserService, DashboardService, MetricsService, ActivityService
+from apps.accounts.decorators import rate_limit
+from apps.accounts.cart import Carrito
+from apps.accounts.authorization import obtener_contexto_autorizacion
+from apps.accounts.prerender import servir_snapshot
+from apps.webpages.services import CompanyPageLoader
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
 from django.http import JsonResponse, Http404
@@ -18,6 +24,9 @@ from django.views.decorators.http import require_POST
 from django.template.context_processors import request
 from django.db.models import Q, Count, Prefetch
 from decimal import Decimal
+from datetime import datetime
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.core.cache import cache
 import logging
 
@@ -36,14 +45,14 @@ def user_profile_context(request):
     else:
         context['user_profile'] = None
     # Carrito desde sesión
-    cart_session = request.session.get('cart', {})
+    carrito = Carrito(request.session)
     # Contador total de items
-    total_count = sum(cart_session.values()) if isinstance(cart_session, dict) else 0
+    total_count = carrito.total_items
     context['cart_count'] = total_count
     # Preview de primeros 3 productos
     cart_preview = []
-    if total_count and isinstance(cart_session, dict):
-        for prod_id, qty in list(cart_session.items())[:3]:
+    if total_count:
+        for prod_id, qty in list(carrito.items.items())[:3]:
             try:
                 producto = Producto.objects.get(pk=int(prod_id))
                 cart_preview.append({'producto': producto, 'cantidad': qty})
@@ -77,16 +86,16 @@ def register(request):
 # Vista del dashboard principal del usuario autenticado. Muestra diferentes vistas según el tipo de cuenta.
 @login_required(login_url='login')
 def home(request):
-    from django.db.models import Count, Q, Prefetch, Min, Max
+    from django.db.models import Count, Q, Prefetch
     from django.core.cache import cache
     from django.core.paginator import Paginator
     from apps.productservice.models import Producto, Servicio, Pedido, ImagenProducto
     from decimal import Decimal
     
     # Obtener o crear perfil si no existe (por seguridad)
-    try:
-        perfil = PerfilUsuario.objects.select_related('usuario').get(usuario=request.user)
-    except PerfilUsuario.DoesNotExist:
+    contexto = obtener_contexto_autorizacion(request)
+    perfil = contexto.perfil
+    if perfil is None:
         # Si no tiene perfil, crear uno por defecto
         from django.utils import timezone
         from datetime import timedelta
@@ -101,6 +110,7 @@ def home(request):
             estado_suscripcion='inactiva',
             fecha_vencimiento=fecha_vencimiento
         )
+        contexto.perfil = perfil
     
     # Mostrar vista según tipo de usuario
     if perfil.tipo_cuenta == 'empresa':
@@ -192,10 +202,8 @@ def home(request):
         else:  # name (default)
             productos_qs = productos_qs.order_by('nombre')
         
-        # Cargar imágenes optimizadas
-        productos_qs = productos_qs.prefetch_related(
-            Prefetch('imagenes', queryset=ImagenProducto.objects.order_by('-principal', 'fecha_subida'))
-        )
+        # Anotar imagen principal (sin consultas adicionales por producto)
+        productos_qs = productos_qs.with_main_image()
         
         # === SERVICIOS SIMILARES ===
         servicios_qs = Servicio.objects.filter(
@@ -203,7 +211,7 @@ def home(request):
             activo=True
         ).select_related('usuario').only(
             'id', 'nombre', 'precio', 'categoria', 'descripcion', 'duracion',
-            'fecha_creacion', 'usuario__username'
+            'imagen', 'fecha_creacion', 'usuario__username'
         )
         
         # Aplicar mismo filtro de búsqueda
@@ -241,11 +249,8 @@ def home(request):
         else:  # name (default)
             servicios_qs = servicios_qs.order_by('nombre')
         
-        # Cargar imágenes de servicios
-        from apps.productservice.models import ImagenServicio
-        servicios_qs = servicios_qs.prefetch_related(
-            Prefetch('imagenes', queryset=ImagenServicio.objects.order_by('-fecha_subida'))
-        )
+        # Anotar imagen principal de servicios
+        servicios_qs = servicios_qs.with_main_image()
         
         # Paginación para productos
         paginator = Paginator(productos_qs, 12)  # 12 productos por página
@@ -257,63 +262,12 @@ def home(request):
         servicios_page_number = request.GET.get('services_page')
         servicios = servicios_paginator.get_page(servicios_page_number)
         
-        # Categorías optimizadas con caché - CORREGIDO PARA ELIMINAR DUPLICADOS
-        categories = cache.get('product_categories')
-        category_counts = cache.get('category_counts')
-        
-        if categories is None or category_counts is None:
-            # Obtener categorías y limpiarlas
-            raw_categories = Producto.objects.filter(
-                usuario__userprofile__tipo_cuenta='empresa',
-                activo=True
-            ).values_list('categoria', flat=True).distinct()
-            
-            # Limpiar categorías: eliminar espacios, normalizar caso y eliminar duplicados
-            cleaned_categories = {}
-            for cat in raw_categories:
-                if cat:  # Evitar valores None o vacíos
-                    cleaned_cat = cat.strip().title()  # Limpiar espacios y capitalizar
-                    if cleaned_cat not in cleaned_categories:
-                        cleaned_categories[cleaned_cat] = 0
-            
-            # Calcular conteos para categorías limpias
-            category_counts = {}
-            for clean_cat in cleaned_categories.keys():
-                # Contar productos que tengan esta categoría (ignorando caso y espacios)
-                count = Producto.objects.filter(
-                    usuario__userprofile__tipo_cuenta='empresa',
-                    activo=True,
-                    categoria__iexact=clean_cat.strip()
-                ).count()
-                if count > 0:  # Solo incluir categorías que tienen productos
-                    category_counts[clean_cat] = count
-            
-            # Solo mantener categorías que tienen productos
-            categories = list(category_counts.keys())
-            
-            # Guardar en caché
-            cache.set('product_categories', categories, 300)  # 5 minutos de caché
-            cache.set('category_counts', category_counts, 300)
-        
-        # Rango de precios para el filtro
-        price_range = Producto.objects.filter(
-            usuario__userprofile__tipo_cuenta='empresa',
-            activo=True
-        ).aggregate(
-            min_price=Min('precio'),
-            max_price=Max('precio')
-        )
+        # Categorías con caché invalidado por tag de catálogo
+        category_counts = DashboardService.get_category_counts()
+        categories = list(category_counts.keys())
         
-        # Estadísticas para el hero header
-        total_companies = User.objects.filter(userprofile__tipo_cuenta='empresa').count()
-        total_products_count = Producto.objects.filter(
-            usuario__userprofile__tipo_cuenta='empresa',
-            activo=True
-        ).count()
-        total_services_count = Servicio.objects.filter(
-            usuario__userprofile__tipo_cuenta='empresa',
-            activo=True
-        ).count()
+        # Rango de precios y estadísticas del hero header (cacheados)
+        marketplace_stats = DashboardService.get_marketplace_stats()
         
         context = {
             'perfil': perfil,
@@ -328,10 +282,10 @@ def home(request):
             'max_price': max_price,
             'sort_by': sort_by,
             'view_mode': view_mode,
-            'price_range': price_range,
-            'total_products': total_products_count,
-            'total_services': total_services_count,
-            'total_companies': total_companies,
+            'price_range': marketplace_stats['price_range'],
+            'total_products': marketplace_stats['total_products'],
+            'total_services': marketplace_stats['total_services'],
+            'total_companies': marketplace_stats['total_companies'],
         }
         return render(request, 'accounts/home_consumer.html', context)
 
@@ -344,7 +298,7 @@ def logout_view(request):
 # Vista de perfil del usuario autenticado. Permite ver y editar datos personales.
 @login_required(login_url='login')
 def perfil(request):
-    perfil = PerfilUsuario.objects.get(usuario=request.user)
+    perfil = obtener_contexto_autorizacion(request).perfil_o_404()
     
     if request.method == 'POST':
         from .forms import EditarPerfilForm
@@ -365,7 +319,7 @@ def perfil(request):
 # Vista para editar el perfil del usuario
 @login_required(login_url='login')
 def editar_perfil(request):
-    perfil = PerfilUsuario.objects.get(usuario=request.user)
+    perfil = obtener_contexto_autorizacion(request).perfil_o_404()
     
     if request.method == 'POST':
         from .forms import EditarPerfilForm
@@ -406,120 +360,80 @@ def landing(request):
 # Vista del dashboard de administración. Solo accesible para administradores. Muestra métricas globales.
 @login_required(login_url='login')
 def admin_dashboard(request):
-    # Verificar permisos admin compatible con ambos modelos
-    is_admin = False
-    if request.user.is_superuser:
-        is_admin = True
-    elif hasattr(request.user, 'userprofile') and request.user.userprofile.permisos == 'Administrador':
-        is_admin = True
-    elif hasattr(request.user, 'userprofile'):
-        try:
-            perfil = PerfilUsuario.objects.get(usuario=request.user)
-            if perfil.permisos == 'Administrador':
-                is_admin = True
-        except PerfilUsuario.DoesNotExist:
-            pass
-    
-    if not is_admin:
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para acceder al panel de administración.')
         return redirect('home')
     
-    from apps.productservice.models import Producto, Servicio, Pedido, ImagenProducto
-    from django.db.models import Count, Q
-    
-    # Optimizar métricas con una sola consulta usando agregaciones
-    user_stats = User.objects.aggregate(
-        total_users=Count('id'),
-        active_users=Count('id', filter=Q(is_active=True)),
-        total_companies=Count('id', filter=Q(userprofile__tipo_cuenta='empresa')),
-        total_admins=Count('id', filter=Q(userprofile__permisos='Administrador'))
-    )
+    # Snapshot cacheado de DashboardService (se invalida por tags)
+    metrics = DashboardService.get_admin_metrics()
     
-    # Métricas de productos y servicios (consultas separadas pero optimizadas)
-    total_products = Producto.objects.count()
-    total_services = Servicio.objects.count() 
-    total_orders = Pedido.objects.count()
-    
-    # Extraer valores de user_stats
-    total_users = user_stats['total_users']
-    active_users = user_stats['active_users']
-    total_companies = user_stats['total_companies']
-    total_admins = user_stats['total_admins']
-    inactive_users = total_users - active_users
-    
-    # Actividad reciente simulada (puedes reemplazar con datos reales)
-    recent_activities = [
-        {
-            'user': 'Sistema',
-            'action': 'Usuario registrado',
-            'target': 'Nuevo usuario',
-            'time': 'Hace 2 horas',
-            'icon': 'fas fa-user-plus',
-            'type': 'success'
-        },
-        {
-            'user': 'Admin',
-            'action': 'Producto aprobado',
-            'target': 'ID #123',
-            'time': 'Hace 3 horas',
-            'icon': 'fas fa-check-circle',
-            'type': 'success'
-        },
-        {
-            'user': 'Sistema',
-            'action': 'Pedido procesado',
-            'target': 'Orden #456',
-            'time': 'Hace 4 horas',
-            'icon': 'fas fa-shopping-cart',
-            'type': 'info'
-        },
-        {
-            'user': 'Admin',
-            'action': 'Usuario desactivado',
-            'target': 'ID #789',
-            'time': 'Hace 5 horas',
-            'icon': 'fas fa-user-times',
-            'type': 'warning'
-        }
-    ]
+    # Actividad reciente desde el feed en caché (sin consultar ActivityEvent)
+    recent_activities = ActivityService.get_recent(5)
     
     return render(request, 'accounts/admin/dashboard.html', {
-        'total_users': total_users,
-        'total_companies': total_companies,
-        'total_admins': total_admins,
-        'total_products': total_products,
-        'total_services': total_services,
-        'total_orders': total_orders,
-        'active_users': active_users,
-        'inactive_users': inactive_users,
+        **metrics,
+        'current_time': datetime.fromisoformat(metrics['last_updated']),
         'recent_activities': recent_activities,
+        'trends': MetricsService.get_user_activity_trends(),
+    })
+
+# Endpoint JSON con el snapshot de métricas del dashboard de administración.
+# Responde 304 si el ETag del cliente coincide con el de las métricas actuales.
+@login_required(login_url='login')
+@rate_limit(max_requests=20, window_minutes=1, json_response=True)
+def admin_metrics_api(request):
+    if not obtener_contexto_autorizacion(request).es_admin:
+        return JsonResponse({'error': 'No tienes permisos para realizar esta acción.'}, status=403)
+    
+    metrics = DashboardService.get_admin_metrics()
+    etag = f'"{metrics["etag"]}"' if metrics.get('etag') else None
+    
+    if etag:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+    
+    metadatos = {'etag', 'timings_ms', 'last_updated', 'cache_version'}
+    response = JsonResponse({
+        'metrics': {
+            clave: float(valor) if isinstance(valor, Decimal) else valor
+            for clave, valor in metrics.items() if clave not in metadatos
+        },
+        'last_updated': metrics['last_updated'],
+        'timings_ms': metrics.get('timings_ms', {}),
     })
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 # Vista para gestionar usuarios (listar, buscar, paginar). Solo para administradores.
 @login_required(login_url='login')
 def manage_users(request):
-    if request.user.userprofile.permisos != 'Administrador':
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para acceder a esta sección.')
         return redirect('home')
     
     search_query = request.GET.get('search', '')
-    users = User.objects.select_related('userprofile').all()
     
-    if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(userprofile__empresa__icontains=search_query)
-        )
+    # Paginación por cursor: ?despues=<cursor> o ?antes=<cursor>
+    cursor_antes = request.GET.get('antes')
+    cursor = cursor_antes or request.GET.get('despues')
+    try:
+        resultado = UserService.buscar_usuarios(search_query, cursor, anterior=bool(cursor_antes))
+    except ValueError:
+        resultado = UserService.buscar_usuarios(search_query)
     
-    # Ordenar usuarios para evitar warning de Paginator
-    users = users.order_by('-date_joined', 'username')
-    paginator = Paginator(users, 10)
-    page = request.GET.get('page')
-    users = paginator.get_page(page)
+    # Totales desde las métricas cacheadas en lugar de un COUNT por página
+    metrics = DashboardService.get_admin_metrics()
     
     return render(request, 'accounts/admin/manage_users.html', {
-        'users': users
+        'users': resultado['usuarios'],
+        'cursor_siguiente': resultado['siguiente'],
+        'cursor_anterior': resultado['anterior'],
+        'search_query': search_query,
+        'total_users_count': metrics.get('total_users', 0),
+        'active_users_count': metrics.get('active_users', 0),
     })
 
 # Vista para eliminar un usuario completamente. Solo para administradores.
@@ -530,7 +444,7 @@ def delete_user(request, user_id):
     Elimina completamente un usuario y todos sus datos relacionados.
     Solo accesible para administradores y mediante POST.
     """
-    if request.user.userprofile.permisos != 'Administrador':
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para realizar esta acción.')
         return redirect('home')
     
@@ -558,7 +472,7 @@ def delete_user(request, user_id):
         summary_text += f"{deleted_summary['servicios']} servicios, "
         summary_text += f"{deleted_summary['pedidos']} pedidos, "
         summary_text += f"{deleted_summary['landing_pages']} landing pages, "
-        summary_text += f"{deleted_summary['archivos_eliminados']} archivos."
+        summary_text += f"{deleted_summary['archivos_programados']} archivos programados para eliminación."
         
         messages.success(request, summary_text)
         logger.info(f"Usuario {username} eliminado por administrador {request.user.username}")
@@ -574,18 +488,27 @@ def delete_user(request, user_id):
 # Vista de detalle y edición de un usuario específico. Solo para administradores.
 @login_required(login_url='login')
 def user_detail(request, user_id):
-    if request.user.userprofile.permisos != 'Administrador':
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para acceder a esta sección.')
         return redirect('home')
     
     user_detail = get_object_or_404(User.objects.select_related('userprofile'), id=user_id)
     
     if request.method == 'POST':
+        estaba_activo = user_detail.is_active
         user_detail.username = request.POST.get('username')
         user_detail.email = request.POST.get('email')
         user_detail.is_active = request.POST.get('is_active') == 'on'
         user_detail.save()
         
+        if user_detail.is_active != estaba_activo:
+            ActivityService.registrar(
+                ActivityEvent.USUARIO_ACTIVADO if user_detail.is_active else ActivityEvent.USUARIO_DESACTIVADO,
+                actor=request.user,
+                objetivo=user_detail,
+                detalle=user_detail.username,
+            )
+        
         user_detail.userprofile.empresa = request.POST.get('empresa')
         user_detail.userprofile.telefono = request.POST.get('telefono')
         user_detail.userprofile.direccion = request.POST.get('direccion')
@@ -602,7 +525,7 @@ def user_detail(request, user_id):
 # Vista para ver los productos de un usuario específico. Solo para administradores.
 @login_required(login_url='login')
 def admin_products(request, user_id):
-    if request.user.userprofile.permisos != 'Administrador':
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para acceder a esta sección.')
         return redirect('home')
     
@@ -617,7 +540,7 @@ def admin_products(request, user_id):
 # Vista para ver los servicios de un usuario específico. Solo para administradores.
 @login_required(login_url='login')
 def admin_services(request, user_id):
-    if request.user.userprofile.permisos != 'Administrador':
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para acceder a esta sección.')
         return redirect('home')
     
@@ -632,7 +555,7 @@ def admin_services(request, user_id):
 # Vista para ver los pedidos de un usuario específico, con filtros y paginación. Solo para administradores.
 @login_required(login_url='login')
 def admin_orders(request, user_id):
-    if not request.user.userprofile.is_admin:
+    if not obtener_contexto_autorizacion(request).es_admin:
         messages.error(request, 'No tienes permisos para acceder a esta sección.')
         return redirect('home')
     
@@ -664,7 +587,7 @@ def admin_orders(request, user_id):
 @login_required(login_url='login')
 @require_POST
 def toggle_user_status(request):
-    if not request.user.userprofile.is_admin:
+    if not obtener_contexto_autorizacion(request).es_admin:
         return JsonResponse({'error': 'No tienes permisos para realizar esta acción.'}, status=403)
     
     user_id = request.POST.get('user_id')
@@ -672,6 +595,13 @@ def toggle_user_status(request):
     user.is_active = not user.is_active
     user.save()
     
+    ActivityService.registrar(
+        ActivityEvent.USUARIO_ACTIVADO if user.is_active else ActivityEvent.USUARIO_DESACTIVADO,
+        actor=request.user,
+        objetivo=user,
+        detalle=user.username,
+    )
+    
     return JsonResponse({
         'is_active': user.is_active
     })
@@ -679,7 +609,8 @@ def toggle_user_status(request):
 @login_required(login_url='login')
 def cart(request):
     """Muestra el carrito de compras y permite checkout."""
-    cart_session = request.session.get('cart', {})
+    carrito = Carrito(request.session)
+    cart_session = carrito.items
     productos_carrito = []
     total = Decimal('0')
     empresas_en_carrito = {}  # Cambiar a dict para almacenar más información
@@ -739,7 +670,8 @@ def cart(request):
             )
             
             # Limpiar carrito después de crear pedidos exitosamente
-            request.session['cart'] = {}
+            carrito.vaciar()
+            carrito.guardar()
             
             # Mensaje de éxito personalizado
             if len(pedidos_creados) == 1:
@@ -776,8 +708,8 @@ def add_to_cart(request, product_id):
             messages.error(request, message)
             return redirect(request.META.get('HTTP_REFERER', 'home'))
         
-        cart_session = request.session.get('cart', {})
-        current_qty = cart_session.get(str(product_id), 0)
+        carrito = Carrito(request.session)
+        current_qty = carrito.cantidad(product_id)
         
         # Verificar si no excede el stock
         if current_qty >= producto.stock:
@@ -787,18 +719,18 @@ def add_to_cart(request, product_id):
             messages.warning(request, message)
             return redirect(request.META.get('HTTP_REFERER', 'home'))
         
-        cart_session[str(product_id)] = current_qty + 1
-        request.session['cart'] = cart_session
+        carrito.agregar(product_id)
+        carrito.guardar()
         
-        # Calcular totales actualizados
-        total_items = sum(cart_session.values())
-        cart_total = Decimal('0')
-        for prod_id, qty in cart_session.items():
-            try:
-                prod = Producto.objects.get(pk=int(prod_id), activo=True)
-                cart_total += prod.precio * qty
-            except (Producto.DoesNotExist, ValueError):
-                continue
+        # Calcular totales actualizados (precios de todo el carrito en una consulta)
+        total_items = carrito.total_items
+        precios = dict(
+            Producto.objects.filter(pk__in=list(carrito.items), activo=True).values_list('pk', 'precio')
+        )
+        cart_total = sum(
+            (precios[prod_id] * qty for prod_id, qty in carrito.items.items() if prod_id in precios),
+            Decimal('0')
+        )
         
         success_message = f'✅ "{producto.nombre}" agregado al carrito. Tienes {total_items} productos.'
         
@@ -826,9 +758,9 @@ def add_to_cart(request, product_id):
 def remove_from_cart(request, product_id):
     """Elimina un producto del carrito."""
     try:
-        cart_session = request.session.get('cart', {})
+        carrito = Carrito(request.session)
         
-        if str(product_id) in cart_session:
+        if carrito.cantidad(product_id):
             # Obtener nombre del producto antes de eliminarlo
             try:
                 producto = Producto.objects.get(pk=product_id)
@@ -836,10 +768,10 @@ def remove_from_cart(request, product_id):
             except Producto.DoesNotExist:
                 producto_nombre = "Producto"
             
-            del cart_session[str(product_id)]
-            request.session['cart'] = cart_session
+            carrito.eliminar(product_id)
+            carrito.guardar()
             
-            total_items = sum(cart_session.values())
+            total_items = carrito.total_items
             if total_items > 0:
                 messages.success(request, f'🗑️ "{producto_nombre}" eliminado del carrito. Te quedan {total_items} productos.')
             else:
@@ -859,50 +791,39 @@ def cart_preview(request):
     Retorna los primeros 3 productos del carrito para mostrar en el dropdown.
     """
     try:
-        cart_session = request.session.get('cart', {})
+        carrito = Carrito(request.session)
         cart_items = []
         cart_count = 0
         cart_total = Decimal('0')
         
-
-        
-        if cart_session:
-            cart_count = sum(cart_session.values())
+        if carrito:
+            # Cargar todos los productos del carrito (con imagen principal) en una consulta
+            productos = (
+                Producto.objects.filter(activo=True)
+                .with_main_image()
+                .in_bulk(list(carrito.items))
+            )
+            
+            # Remover productos que ya no existen del carrito (solo entonces se escribe la sesión)
+            carrito.conservar(productos)
+            carrito.guardar()
+            
+            cart_count = carrito.total_items
             
-            # Obtener los primeros 3 productos para la vista previa
-            for i, (prod_id, qty) in enumerate(cart_session.items()):
-                if i >= 3:  # Solo mostrar los primeros 3
-                    break
-                    
-                try:
-                    producto = Producto.objects.prefetch_related('imagenes').get(pk=int(prod_id), activo=True)
-                    
-                    # Usar el método imagen_principal del modelo
-                    imagen_url = producto.imagen_principal
-                    
+            for i, (prod_id, qty) in enumerate(carrito.items.items()):
+                producto = productos[prod_id]
+                cart_total += producto.precio * qty
+                
+                # Obtener los primeros 3 productos para la vista previa
+                if i < 3:
                     cart_items.append({
                         'id': producto.pk,
                         'nombre': producto.nombre,
                         'precio': str(producto.precio),
                         'cantidad': qty,
-                        'imagen_principal': imagen_url,
+                        'imagen_principal': producto.imagen_principal,
                         'subtotal': str(producto.precio * qty)
                     })
-                    
-                except (Producto.DoesNotExist, ValueError) as e:
-                    # Remover productos que ya no existen del carrito
-                    if str(prod_id) in cart_session:
-                        del cart_session[str(prod_id)]
-                        request.session['cart'] = cart_session
-                        cart_count = sum(cart_session.values())
-            
-            # Calcular total del carrito
-            for prod_id, qty in cart_session.items():
-                try:
-                    producto = Producto.objects.get(pk=int(prod_id), activo=True)
-                    cart_total += producto.precio * qty
-                except (Producto.DoesNotExist, ValueError):
-                    continue
         
         response_data = {
             'success': True,
@@ -922,9 +843,9 @@ def cart_preview(request):
 @login_required(login_url='login')
 def buy_now(request, product_id):
     """Agrega el producto y redirige al carrito para proceder al pago."""
-    cart_session = request.session.get('cart', {})
-    cart_session[str(product_id)] = cart_session.get(str(product_id), 0) + 1
-    request.session['cart'] = cart_session
+    carrito = Carrito(request.session)
+    carrito.agregar(product_id)
+    carrito.guardar()
     return redirect('cart')
 
 # =========================== VISTAS DE PEDIDOS ===========================
@@ -1007,7 +928,7 @@ def pedido_detail(request, pedido_id):
 def pedidos_empresa(request):
     """Vista para que las empresas vean los pedidos que han recibido."""
     # Verificar que el usuario sea empresa
-    perfil = get_object_or_404(PerfilUsuario, usuario=request.user)
+    perfil = obtener_contexto_autorizacion(request).perfil_o_404()
     if perfil.tipo_cuenta != 'empresa':
         messages.error(request, 'Solo las empresas pueden acceder a esta sección.')
         return redirect('home')
@@ -1026,6 +947,14 @@ def pedidos_empresa(request):
     # Obtener pedidos de la empresa con optimización de consultas
     pedidos = PedidoService.get_pedidos_empresa_with_details(request.user, filters)
     
+    # Exportación del historial completo (con los mismos filtros)
+    formato = request.GET.get('export', '')
+    if formato == 'excel':
+        formato = 'xlsx'
+    if formato in FORMATOS_EXPORTACION:
+        nombre = f"pedidos_{request.user.username}_{timezone.localdate():%Y%m%d}"
+        return respuesta_exportacion(pedidos, formato, nombre)
+    
     # Paginación
     paginator = Paginator(pedidos, 10)  # 10 pedidos por página
     page_number = request.GET.get('page')
@@ -1058,11 +987,37 @@ def pedidos_empresa(request):
     
     return render(request, 'accounts/pedidos_empresa.html', context)
 
+@login_required(login_url='login')
+def clientes_empresa(request):
+    """Vista de estadísticas acumuladas por cliente para una empresa."""
+    perfil = obtener_contexto_autorizacion(request).perfil_o_404()
+    if perfil.tipo_cuenta != 'empresa':
+        messages.error(request, 'Solo las empresas pueden acceder a esta sección.')
+        return redirect('home')
+    
+    orden = request.GET.get('orden', 'ingresos')
+    if orden not in PedidoService.ORDENES_CLIENTES:
+        orden = 'ingresos'
+    # Cada orden tiene su propia lista cacheada, ya ordenada en la consulta
+    datos = PedidoService.get_clientes_empresa(request.user, orden)
+    
+    paginator = Paginator(datos['clientes'], 25)
+    clientes_page = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'clientes': clientes_page,
+        'resumen': datos['resumen'],
+        'orden': orden,
+        'limite': PedidoService.CLIENTES_LIMITE,
+    }
+    
+    return render(request, 'accounts/clientes_empresa.html', context)
+
 @login_required(login_url='login')
 def pedido_empresa_detail(request, pedido_id):
     """Vista detallada de un pedido específico para la empresa."""
     # Verificar que el usuario sea empresa
-    perfil = get_object_or_404(PerfilUsuario, usuario=request.user)
+    perfil = obtener_contexto_autorizacion(request).perfil_o_404()
     if perfil.tipo_cuenta != 'empresa':
         messages.error(request, 'Solo las empresas pueden acceder a esta sección.')
         return redirect('home')
@@ -1089,8 +1044,7 @@ def update_pedido_status(request, pedido_id):
     """Actualiza el estado de un pedido (solo para empresas) vía AJAX."""
     try:
         # Verificar que el usuario sea empresa
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
-        if perfil.tipo_cuenta != 'empresa':
+        if not obtener_contexto_autorizacion(request).es_empresa:
             return JsonResponse({
                 'success': False,
                 'message': 'Solo las empresas pueden actualizar pedidos.'
@@ -1131,79 +1085,60 @@ def update_pedido_status(request, pedido_id):
 # Vista de marketplace público para consumidores
 def marketplace(request):
     # Solo consumidores pueden acceder
-    if request.user.is_authenticated:
-        perfil = getattr(request.user, 'userprofile', None)
-        if perfil and perfil.tipo_cuenta == 'empresa':
-            return redirect('home')
+    if obtener_contexto_autorizacion(request).es_empresa:
+        return redirect('home')
     # Listar todas las empresas registradas
     empresas = PerfilUsuario.objects.filter(tipo_cuenta='empresa').select_related('usuario')
     return render(request, 'accounts/marketplace.html', {'empresas': empresas})
 
 # Vista pública de empresa: landing o catálogo
 # IMPORTANTE: Esta vista mantiene el sidebar del usuario logueado, no de la empresa visitada
+@servir_snapshot('empresa')
 def public_company_page(request, user_id):
     """
     Vista pública de empresa que muestra landing page si existe, 
     o catálogo de productos/servicios si no hay landing page.
     """
-    from django.contrib.auth.models import User
-    from apps.webpages.models import LandingPage
+    # Usuario, perfil y landing en una consulta; public_landing_page reutiliza la carga
+    empresa = CompanyPageLoader.load_or_404(user_id, request)
     
-    user_obj = get_object_or_404(User, id=user_id)
-    company_perfil = get_object_or_404(PerfilUsuario, usuario=user_obj)
-    if company_perfil.tipo_cuenta != 'empresa':
-        raise Http404('Empresa no encontrada')
+    if empresa.landing:
+        # Usar la vista pública de webpages para mostrar landing page
+        from apps.webpages.views import public_landing_page
+        return public_landing_page(request, user_id)
     
     # CORREGIDO: Obtener perfil del usuario actual logueado para el sidebar
-    user_perfil = None
-    if request.user.is_authenticated:
-        try:
-            user_perfil = PerfilUsuario.objects.get(usuario=request.user)
-        except PerfilUsuario.DoesNotExist:
-            user_perfil = None
-    
-    landing = LandingPage.objects.filter(usuario=user_obj).first()
-    products = Producto.objects.filter(usuario=user_obj, activo=True).prefetch_related('imagenes')
-    services = Servicio.objects.filter(usuario=user_obj, activo=True).prefetch_related('imagenes')
+    user_perfil = obtener_contexto_autorizacion(request).perfil
     
-    base_context = {
+    # Si no hay landing, mostrar la primera página del catálogo; el resto se carga por API
+    return render(request, 'accounts/company_catalog.html', {
         'perfil': user_perfil,  # Perfil del usuario logueado para el sidebar
         'user_profile': user_perfil,  # Alias adicional
-        'company_perfil': company_perfil,  # Perfil de la empresa visitada
-        'products': products,
-        'services': services,
-    }
-    
-    if landing:
-        # Usar la vista pública de webpages para mostrar landing page
-        from apps.webpages.views import public_landing_page
-        return public_landing_page(request, user_id)
-    # Si no hay landing, mostrar catálogo de productos y servicios
-    return render(request, 'accounts/company_catalog.html', base_context)
+        'company_perfil': empresa.perfil,  # Perfil de la empresa visitada
+        **CatalogService.get_primera_pagina_empresa(user_id, empresa.perfil),
+    })
 
 # Vista de catálogo completo de empresa (plantilla premium)
 # IMPORTANTE: Esta vista mantiene el sidebar del usuario logueado, no de la empresa visitada
+@servir_snapshot('catalogo')
 def company_full_catalog(request, user_id):
-    user_obj = get_object_or_404(User, id=user_id)
-    company_perfil = get_object_or_404(PerfilUsuario, usuario=user_obj)
-    if company_perfil.tipo_cuenta != 'empresa':
-        raise Http404('Empresa no encontrada')
+    empresa = CompanyPageLoader.load_or_404(user_id, request)
     
     # CORREGIDO: Obtener perfil del usuario actual logueado para el sidebar
-    user_perfil = None
-    if request.user.is_authenticated:
-        try:
-            user_perfil = PerfilUsuario.objects.get(usuario=request.user)
-        except PerfilUsuario.DoesNotExist:
-            user_perfil = None
-    
-    products = Producto.objects.filter(usuario=user_obj, activo=True).prefetch_related('imagenes')
-    services = Servicio.objects.filter(usuario=user_obj, activo=True).prefetch_related('imagenes')
+    user_perfil = obtener_contexto_autorizacion(request).perfil
+    
+    # Categorías para el filtro (la búsqueda se resuelve en la API del catálogo)
+    categorias = (
+        Producto.objects.filter(usuario_id=user_id, activo=True)
+        .order_by('categoria')
+        .values_list('categoria', flat=True)
+        .distinct()
+    )
     
     return render(request, 'accounts/company_full_catalog.html', {
         'perfil': user_perfil,  # Perfil del usuario logueado para el sidebar
         'user_profile': user_perfil,  # Alias adicional
-        'company_perfil': company_perfil,  # Perfil de la empresa visitada
-        'products': products,
-        'services': services,
+        'company_perfil': empresa.perfil,  # Perfil de la empresa visitada
+        'categorias': categorias,
+        **CatalogService.get_primera_pagina_empresa(user_id, empresa.perfil),
     })
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MensajePedido, Pedido
+from .models import MensajePedido, Pedido, PendingFileDeletion, VentaDiariaEmpresa
 
 @admin.register(MensajePedido)
 class MensajePedidoAdmin(admin.ModelAdmin):
@@ -22,3 +22,21 @@ class MensajePedidoAdmin(admin.ModelAdmin):
         return bool(obj.archivo_adjunto)
     tiene_adjunto.boolean = True
     tiene_adjunto.short_description = 'Tiene Adjunto'
+
+
+
+@admin.register(PendingFileDeletion)
+class PendingFileDeletionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'ruta', 'fecha_creacion', 'intentos', 'ultimo_error')
+    list_filter = ('fecha_creacion',)
+    search_fields = ('ruta',)
+    readonly_fields = ('fecha_creacion',)
+
+
+@admin.register(VentaDiariaEmpresa)
+class VentaDiariaEmpresaAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'fecha', 'pedidos_total', 'pedidos_completados', 'ingresos', 'items_vendidos', 'clientes_distintos')
+    list_filter = ('fecha',)
+    search_fields = ('empresa__username',)
+    date_hierarchy = 'fecha'
+    readonly_fields = [f.name for f in VentaDiariaEmpresa._meta.fields]
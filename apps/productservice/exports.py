@@ -0,0 +1,252 @@
+"""
+Exportación de pedidos de empresa a CSV y XLSX en streaming.
+
+Los pedidos se recorren con iterator() por bloques: Django precarga los
+detalles de cada bloque (prefetch por chunk) y no guarda en memoria el
+queryset completo, así que exportar el historial entero usa memoria
+constante sin importar el número de pedidos.
+
+- CSV: StreamingHttpResponse que envía cada fila en cuanto se genera.
+- XLSX: también en streaming. El libro es un zip que se escribe sobre un
+  destino no buscable (zipfile usa descriptores de datos) con una hoja
+  de cadenas inline, y los bytes comprimidos se envían cada
+  FILAS_POR_ENVIO filas; la descarga empieza enseguida y no se construye
+  el libro entero antes de responder.
+
+En el CSV, los textos que empiezan por =, +, -, @ (o tabulador/retorno)
+llevan un apóstrofo delante para que Excel no los interprete como
+fórmulas: el nombre de usuario, las notas y los nombres de los items los
+escriben clientes y empresas. El XLSX guarda los textos como cadenas
+inline, que nunca se evalúan, así que se escriben tal cual.
+
+Uso:
+    pedidos = PedidoService.get_pedidos_empresa_with_details(user, filters)
+    return respuesta_exportacion(pedidos, 'csv', 'pedidos')
+"""
+
+import csv
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import DetallePedido
+
+FORMATOS = ('csv', 'xlsx')
+
+# Pedidos cargados (y detalles precargados) por bloque
+CHUNK_SIZE = 2000
+
+# Filas XLSX comprimidas entre envíos al cliente
+FILAS_POR_ENVIO = 500
+
+# Primeros caracteres con los que Excel/LibreOffice interpretan una fórmula
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+# Caracteres de control que XML 1.0 no admite
+CARACTERES_INVALIDOS_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+COLUMNAS = (
+    'Pedido', 'Fecha', 'Cliente', 'Email', 'Teléfono',
+    'Estado', 'Artículos', 'Detalle', 'Total', 'Notas',
+)
+
+
+def neutralizar_formula(valor):
+    """Antepone un apóstrofo a los textos que una hoja de cálculo evaluaría."""
+    if isinstance(valor, str) and valor.startswith(INICIOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def preparar_queryset(pedidos):
+    """
+    Reduce un queryset de pedidos a las columnas que se exportan.
+
+    Sustituye el prefetch de productos y servicios completos por uno que
+    solo trae sus nombres.
+    """
+    detalles = DetallePedido.objects.select_related('producto', 'servicio').only(
+        'id', 'pedido_id', 'cantidad', 'producto__nombre', 'servicio__nombre'
+    )
+    return pedidos.select_related('usuario__userprofile').only(
+        'id', 'fecha_pedido', 'estado', 'total', 'notas',
+        'usuario__username', 'usuario__email', 'usuario__userprofile__telefono',
+    ).prefetch_related(None).prefetch_related(Prefetch('detalles', queryset=detalles))
+
+
+def filas_pedidos(pedidos, chunk_size=CHUNK_SIZE):
+    """
+    Genera una fila por pedido (sin cabecera).
+
+    Args:
+        pedidos (QuerySet): Pedidos a exportar
+        chunk_size (int): Pedidos cargados por bloque
+
+    Yields:
+        list: Valores en el orden de COLUMNAS
+    """
+    for pedido in preparar_queryset(pedidos).iterator(chunk_size=chunk_size):
+        detalles = pedido.detalles.all()
+        perfil = getattr(pedido.usuario, 'userprofile', None)
+        yield [
+            pedido.id,
+            timezone.localtime(pedido.fecha_pedido).strftime('%Y-%m-%d %H:%M'),
+            pedido.usuario.username,
+            pedido.usuario.email,
+            perfil.telefono if perfil else '',
+            pedido.get_estado_display(),
+            sum(detalle.cantidad for detalle in detalles),
+            '; '.join(f'{detalle.cantidad}x {detalle.item_name}' for detalle in detalles),
+            pedido.total,
+            pedido.notas or '',
+        ]
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve cada línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _lineas_csv(pedidos):
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca UTF-8 al abrir el CSV
+    yield '\ufeff' + escritor.writerow(COLUMNAS)
+    for fila in filas_pedidos(pedidos):
+        yield escritor.writerow([neutralizar_formula(valor) for valor in fila])
+
+
+def exportar_csv(pedidos, nombre):
+    """Respuesta CSV en streaming."""
+    response = StreamingHttpResponse(_lineas_csv(pedidos), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return response
+
+
+# Partes fijas del libro: una sola hoja con cadenas inline (sin sharedStrings)
+_PARTES_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Pedidos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class _DestinoZip:
+    """Destino no buscable para zipfile: acumula bytes hasta que se recogen."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def recoger(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _celda_xlsx(valor):
+    if isinstance(valor, bool):
+        valor = str(valor)
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CARACTERES_INVALIDOS_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xlsx(valores):
+    return ('<row>' + ''.join(_celda_xlsx(valor) for valor in valores) + '</row>').encode('utf-8')
+
+
+def _bytes_xlsx(pedidos):
+    destino = _DestinoZip()
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _PARTES_XLSX.items():
+            libro.writestr(nombre, contenido)
+        yield destino.recoger()
+
+        # force_zip64: el tamaño de la hoja no se conoce al empezar a escribirla
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja.write(_fila_xlsx(COLUMNAS))
+            for numero, fila in enumerate(filas_pedidos(pedidos), start=1):
+                hoja.write(_fila_xlsx(fila))
+                if numero % FILAS_POR_ENVIO == 0:
+                    datos = destino.recoger()
+                    if datos:
+                        yield datos
+            hoja.write(b'</sheetData></worksheet>')
+    # Al cerrar el zip se escribe el directorio central
+    yield destino.recoger()
+
+
+def exportar_xlsx(pedidos, nombre):
+    """Respuesta XLSX en streaming."""
+    response = StreamingHttpResponse(
+        _bytes_xlsx(pedidos),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.xlsx"'
+    return response
+
+
+def respuesta_exportacion(pedidos, formato, nombre):
+    """
+    Construye la respuesta de exportación en el formato pedido.
+
+    Args:
+        pedidos (QuerySet): Pedidos a exportar
+        formato (str): 'csv' o 'xlsx'
+        nombre (str): Nombre del archivo sin extensión
+
+    Returns:
+        StreamingHttpResponse: Respuesta de descarga
+    """
+    if formato == 'xlsx':
+        return exportar_xlsx(pedidos, nombre)
+    return exportar_csv(pedidos, nombre)
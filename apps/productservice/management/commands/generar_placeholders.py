@@ -0,0 +1,58 @@
+"""
+Comando para calcular dimensiones y placeholders LQIP de imágenes existentes.
+
+Las imágenes nuevas los calculan al guardarse; este comando rellena las
+que se subieron antes de existir los campos ancho, alto y placeholder.
+
+Uso:
+    python manage.py generar_placeholders
+    python manage.py generar_placeholders --force --batch-size 100
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.productservice.models import ImagenProducto, ImagenServicio
+
+
+class Command(BaseCommand):
+    help = 'Calcula dimensiones y placeholders LQIP de las imágenes de productos y servicios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recalcula también las imágenes que ya tienen placeholder',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Número de registros actualizados por lote. Por defecto: 200',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        for modelo in (ImagenProducto, ImagenServicio):
+            imagenes = modelo.objects.exclude(imagen='').only('id', 'imagen')
+            if not options['force']:
+                imagenes = imagenes.filter(placeholder='')
+
+            actualizadas = 0
+            lote = []
+            for imagen in imagenes.iterator(chunk_size=batch_size):
+                if not imagen.actualizar_placeholder():
+                    continue
+                lote.append(imagen)
+                if len(lote) >= batch_size:
+                    modelo.objects.bulk_update(lote, ['ancho', 'alto', 'placeholder'])
+                    actualizadas += len(lote)
+                    lote = []
+
+            if lote:
+                modelo.objects.bulk_update(lote, ['ancho', 'alto', 'placeholder'])
+                actualizadas += len(lote)
+
+            self.stdout.write(
+                self.style.SUCCESS(f'{modelo._meta.verbose_name_plural}: {actualizadas} placeholders generados')
+            )
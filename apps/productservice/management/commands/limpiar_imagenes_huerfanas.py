@@ -1,10 +1,39 @@
+"""
+Comando para eliminar archivos huérfanos del directorio media.
+
+Recorre en streaming los directorios de archivos subidos por usuarios
+(productos, servicios, adjuntos de mensajes y hero de landing pages),
+los compara contra las rutas registradas en la base de datos y elimina
+en lotes los que ya no tienen registro.
+
+Uso:
+    python manage.py limpiar_imagenes_huerfanas
+    python manage.py limpiar_imagenes_huerfanas --dry-run
+    python manage.py limpiar_imagenes_huerfanas --grace-minutes 120 --batch-size 200
+"""
+
 import os
-from django.core.management.base import BaseCommand
+import time
+
 from django.conf import settings
-from apps.productservice.models import ImagenProducto, ImagenServicio, Servicio
+from django.core.management.base import BaseCommand
+
+from apps.productservice.models import ImagenProducto, ImagenServicio, Servicio, MensajePedido
+from apps.webpages.models import LandingPage
+
+
+# Directorios barridos (relativos a MEDIA_ROOT) y campos que los referencian.
+# Cada entrada: (directorio, [(modelo, campo), ...])
+DIRECTORIOS_GESTIONADOS = [
+    ('productos', [(ImagenProducto, 'imagen')]),
+    ('servicios', [(ImagenServicio, 'imagen'), (Servicio, 'imagen')]),
+    ('mensajes_pedidos', [(MensajePedido, 'archivo_adjunto')]),
+    ('landing_hero', [(LandingPage, 'hero_image_file')]),
+]
+
 
 class Command(BaseCommand):
-    help = 'Elimina archivos de imagen huérfanos que no tienen registro en la base de datos'
+    help = 'Elimina archivos huérfanos del directorio media que no tienen registro en la base de datos'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -12,126 +41,181 @@ class Command(BaseCommand):
             action='store_true',
             help='Solo muestra qué archivos se eliminarían sin eliminarlos realmente',
         )
+        parser.add_argument(
+            '--grace-minutes',
+            type=int,
+            default=60,
+            help='Ignora archivos modificados en los últimos N minutos (subidas en curso). Por defecto: 60',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de archivos eliminados por lote. Por defecto: 500',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Filas leídas por iteración al consultar la base de datos. Por defecto: 2000',
+        )
+        parser.add_argument(
+            '--verbose-files',
+            action='store_true',
+            help='Muestra cada archivo eliminado (o que se eliminaría)',
+        )
 
     def handle(self, *args, **options):
-        dry_run = options['dry_run']
-        
-        if dry_run:
+        self.dry_run = options['dry_run']
+        self.batch_size = max(1, options['batch_size'])
+        self.verbose_files = options['verbose_files']
+        chunk_size = max(1, options['chunk_size'])
+        limite_gracia = time.time() - max(0, options['grace_minutes']) * 60
+
+        if self.dry_run:
             self.stdout.write(self.style.WARNING('MODO DRY-RUN: Solo mostrando archivos que se eliminarían'))
-        
-        # Directorios de imágenes
-        productos_dir = os.path.join(settings.MEDIA_ROOT, 'productos')
-        servicios_dir = os.path.join(settings.MEDIA_ROOT, 'servicios')
-        
-        archivos_eliminados = 0
-        
-        # Limpiar imágenes de productos
-        if os.path.exists(productos_dir):
-            archivos_eliminados += self.limpiar_directorio(
-                productos_dir, 
-                ImagenProducto, 
-                'imagen', 
-                'productos/',
-                dry_run
-            )
-        
-        # Limpiar imágenes de servicios (múltiples)
-        if os.path.exists(servicios_dir):
-            archivos_eliminados += self.limpiar_directorio(
-                servicios_dir, 
-                ImagenServicio, 
-                'imagen', 
-                'servicios/',
-                dry_run
-            )
-            
-            # También limpiar imágenes principales de servicios
-            archivos_eliminados += self.limpiar_imagenes_principales_servicios(
-                servicios_dir,
-                dry_run
-            )
-        
-        if dry_run:
+
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+
+        resumen_total = self._nuevo_resumen()
+
+        for directorio, campos in DIRECTORIOS_GESTIONADOS:
+            ruta_directorio = os.path.join(media_root, directorio)
+            if not os.path.isdir(ruta_directorio):
+                continue
+
+            referenciados = self.obtener_rutas_referenciadas(campos, chunk_size)
+            resumen = self.barrer_directorio(media_root, ruta_directorio, referenciados, limite_gracia)
+
             self.stdout.write(
-                self.style.SUCCESS(f'Se eliminarían {archivos_eliminados} archivos huérfanos')
+                f'{directorio}/: {resumen["escaneados"]} escaneados, '
+                f'{len(referenciados)} referenciados, {resumen["huerfanos"]} huérfanos, '
+                f'{resumen["recientes"]} recientes omitidos'
             )
-        else:
-            self.stdout.write(
-                self.style.SUCCESS(f'Se eliminaron {archivos_eliminados} archivos huérfanos')
+
+            for clave in resumen_total:
+                resumen_total[clave] += resumen[clave]
+
+        self.mostrar_resumen(resumen_total)
+
+    def obtener_rutas_referenciadas(self, campos, chunk_size):
+        """
+        Construye el conjunto de rutas (relativas a MEDIA_ROOT) registradas en la BD.
+
+        Lee solo la columna del archivo con values_list().iterator() para no
+        instanciar modelos completos ni cargar todo el resultado en memoria.
+        """
+        referenciados = set()
+        for modelo, campo in campos:
+            rutas = (
+                modelo.objects
+                .exclude(**{f'{campo}__isnull': True})
+                .exclude(**{campo: ''})
+                .values_list(campo, flat=True)
+                .iterator(chunk_size=chunk_size)
             )
+            for ruta in rutas:
+                referenciados.add(os.path.normpath(ruta))
+        return referenciados
+
+    def recorrer_archivos(self, ruta_directorio):
+        """Generador que recorre recursivamente un directorio usando os.scandir."""
+        pendientes = [ruta_directorio]
+        while pendientes:
+            actual = pendientes.pop()
+            try:
+                with os.scandir(actual) as entradas:
+                    for entrada in entradas:
+                        if entrada.is_dir(follow_symlinks=False):
+                            pendientes.append(entrada.path)
+                        elif entrada.is_file(follow_symlinks=False):
+                            yield entrada
+            except OSError as e:
+                self.stdout.write(self.style.ERROR(f'Error leyendo {actual}: {e}'))
+
+    def barrer_directorio(self, media_root, ruta_directorio, referenciados, limite_gracia):
+        """Compara los archivos del directorio con las rutas referenciadas y elimina huérfanos por lotes."""
+        resumen = self._nuevo_resumen()
+        lote = []
+
+        for entrada in self.recorrer_archivos(ruta_directorio):
+            resumen['escaneados'] += 1
+            ruta_relativa = os.path.normpath(os.path.relpath(entrada.path, media_root))
+
+            if ruta_relativa in referenciados:
+                continue
+
+            try:
+                stat = entrada.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+            # Respetar periodo de gracia para subidas que aún no tienen registro en BD
+            if stat.st_mtime > limite_gracia:
+                resumen['recientes'] += 1
+                continue
+
+            resumen['huerfanos'] += 1
+            lote.append((entrada.path, stat.st_size))
+
+            if len(lote) >= self.batch_size:
+                self.eliminar_lote(lote, resumen)
+                lote = []
+
+        if lote:
+            self.eliminar_lote(lote, resumen)
+
+        return resumen
+
+    def eliminar_lote(self, lote, resumen):
+        """Elimina (o simula eliminar) un lote de archivos huérfanos."""
+        for ruta, tamano in lote:
+            if self.dry_run:
+                if self.verbose_files:
+                    self.stdout.write(f'Se eliminaría: {ruta}')
+                resumen['eliminados'] += 1
+                resumen['bytes_liberados'] += tamano
+                continue
+
+            try:
+                os.remove(ruta)
+                resumen['eliminados'] += 1
+                resumen['bytes_liberados'] += tamano
+                if self.verbose_files:
+                    self.stdout.write(f'Eliminado: {ruta}')
+            except FileNotFoundError:
+                # Otro proceso lo eliminó entre el escaneo y el borrado
+                pass
+            except OSError as e:
+                resumen['errores'] += 1
+                self.stdout.write(self.style.ERROR(f'Error eliminando {ruta}: {e}'))
+
+        if len(lote) >= self.batch_size:
+            accion = 'simulado' if self.dry_run else 'procesado'
+            self.stdout.write(f'  Lote de {len(lote)} archivos {accion}')
+
+    def mostrar_resumen(self, resumen):
+        """Muestra el resumen final del barrido."""
+        megabytes = resumen['bytes_liberados'] / (1024 * 1024)
+        verbo = 'Se eliminarían' if self.dry_run else 'Se eliminaron'
+
+        self.stdout.write('')
+        self.stdout.write(f'Archivos escaneados: {resumen["escaneados"]}')
+        self.stdout.write(f'Archivos huérfanos: {resumen["huerfanos"]}')
+        self.stdout.write(f'Recientes omitidos (periodo de gracia): {resumen["recientes"]}')
+        if resumen['errores']:
+            self.stdout.write(self.style.ERROR(f'Errores: {resumen["errores"]}'))
+        self.stdout.write(
+            self.style.SUCCESS(f'{verbo} {resumen["eliminados"]} archivos huérfanos ({megabytes:.2f} MB)')
+        )
 
-    def limpiar_directorio(self, directorio, modelo, campo_imagen, prefijo_url, dry_run):
-        """Limpia archivos huérfanos en un directorio específico"""
-        archivos_eliminados = 0
-        
-        # Obtener todas las rutas de imágenes en la BD
-        imagenes_bd = set()
-        for obj in modelo.objects.all():
-            imagen_field = getattr(obj, campo_imagen)
-            if imagen_field:
-                # Obtener solo el nombre del archivo sin el prefijo
-                nombre_archivo = imagen_field.name.replace(prefijo_url, '')
-                imagenes_bd.add(nombre_archivo)
-        
-        # Recorrer archivos en el directorio
-        for archivo in os.listdir(directorio):
-            ruta_completa = os.path.join(directorio, archivo)
-            
-            # Solo procesar archivos (no directorios)
-            if os.path.isfile(ruta_completa):
-                if archivo not in imagenes_bd:
-                    if dry_run:
-                        self.stdout.write(f'Se eliminaría: {ruta_completa}')
-                    else:
-                        try:
-                            os.remove(ruta_completa)
-                            self.stdout.write(f'Eliminado: {ruta_completa}')
-                        except Exception as e:
-                            self.stdout.write(
-                                self.style.ERROR(f'Error eliminando {ruta_completa}: {e}')
-                            )
-                    archivos_eliminados += 1
-        
-        return archivos_eliminados
-
-    def limpiar_imagenes_principales_servicios(self, directorio, dry_run):
-        """Limpia imágenes principales de servicios huérfanas"""
-        archivos_eliminados = 0
-        
-        # Obtener todas las rutas de imágenes principales de servicios en la BD
-        imagenes_principales_bd = set()
-        for servicio in Servicio.objects.all():
-            if servicio.imagen:
-                nombre_archivo = servicio.imagen.name.replace('servicios/', '')
-                imagenes_principales_bd.add(nombre_archivo)
-        
-        # Obtener todas las imágenes múltiples de servicios
-        imagenes_multiples_bd = set()
-        for imagen in ImagenServicio.objects.all():
-            if imagen.imagen:
-                nombre_archivo = imagen.imagen.name.replace('servicios/', '')
-                imagenes_multiples_bd.add(nombre_archivo)
-        
-        # Combinar ambos conjuntos
-        todas_imagenes_servicios = imagenes_principales_bd.union(imagenes_multiples_bd)
-        
-        # Recorrer archivos en el directorio
-        for archivo in os.listdir(directorio):
-            ruta_completa = os.path.join(directorio, archivo)
-            
-            # Solo procesar archivos (no directorios)
-            if os.path.isfile(ruta_completa):
-                if archivo not in todas_imagenes_servicios:
-                    if dry_run:
-                        self.stdout.write(f'Se eliminaría (servicio): {ruta_completa}')
-                    else:
-                        try:
-                            os.remove(ruta_completa)
-                            self.stdout.write(f'Eliminado (servicio): {ruta_completa}')
-                        except Exception as e:
-                            self.stdout.write(
-                                self.style.ERROR(f'Error eliminando {ruta_completa}: {e}')
-                            )
-                    archivos_eliminados += 1
-        
-        return archivos_eliminados 
\ No newline at end of file
+    @staticmethod
+    def _nuevo_resumen():
+        return {
+            'escaneados': 0,
+            'huerfanos': 0,
+            'recientes': 0,
+            'eliminados': 0,
+            'bytes_liberados': 0,
+            'errores': 0,
+        }
@@ -0,0 +1,68 @@
+"""
+Comando que drena la cola PendingFileDeletion.
+
+Elimina del almacenamiento, por lotes, los archivos encolados por los
+overrides de delete() y por UserService.delete_user_completely una vez
+que sus transacciones hicieron commit. El proceso web ya drena la cola
+tras cada encolado (PendingFileDeletion.drenar_en_segundo_plano) y
+reintenta los fallos con un temporizador; start.sh ejecuta este comando
+al arrancar para vaciar lo que quedara y también sirve para hacerlo a
+mano. Los fallos se reintentan hasta
+--max-intentos; después el registro se descarta y el archivo queda para
+limpiar_imagenes_huerfanas.
+
+Uso:
+    python manage.py procesar_eliminaciones_pendientes
+    python manage.py procesar_eliminaciones_pendientes --batch-size 200
+    python manage.py procesar_eliminaciones_pendientes --loop --sleep 30
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.productservice.models import PendingFileDeletion
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes los archivos encolados en PendingFileDeletion'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Número de archivos procesados por lote. Por defecto: 200',
+        )
+        parser.add_argument(
+            '--max-intentos',
+            type=int,
+            default=PendingFileDeletion.MAX_INTENTOS,
+            help='Intentos fallidos antes de descartar un registro. Por defecto: 5',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Ejecuta como worker: sigue procesando la cola indefinidamente',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=int,
+            default=30,
+            help='Segundos de espera cuando la cola está vacía (con --loop). Por defecto: 30',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        max_intentos = max(1, options['max_intentos'])
+
+        while True:
+            eliminados, fallidos = PendingFileDeletion.drenar(batch_size, max_intentos)
+            if eliminados or fallidos:
+                self.stdout.write(
+                    self.style.SUCCESS(f'{eliminados} archivos eliminados, {fallidos} fallidos')
+                )
+
+            if not options['loop']:
+                break
+            time.sleep(max(1, options['sleep']))
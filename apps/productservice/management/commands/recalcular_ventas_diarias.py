@@ -0,0 +1,87 @@
+"""
+Comando que reconstruye la tabla VentaDiariaEmpresa a partir de los pedidos.
+
+La carga inicial la hace la migración 0013_poblar_ventas_diarias; este
+comando sirve para corregir desajustes (por ejemplo tras modificar
+pedidos con QuerySet.update(), que no pasa por Pedido.save()).
+Los resúmenes se calculan con consultas GROUP BY por empresa y día y se
+reemplazan por empresa dentro de una transacción.
+
+Uso:
+    python manage.py recalcular_ventas_diarias
+    python manage.py recalcular_ventas_diarias --empresa 123
+    python manage.py recalcular_ventas_diarias --solo-si-vacio
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.accounts.cache_utils import invalidar_tags, tag_metricas
+from apps.productservice.models import Pedido, VentaDiariaEmpresa
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios de ventas por empresa (backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='ID de la empresa a recalcular. Por defecto: todas',
+        )
+        parser.add_argument(
+            '--solo-si-vacio',
+            action='store_true',
+            help='No hace nada si la tabla ya tiene datos (para ejecutar en cada despliegue)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Filas insertadas por lote. Por defecto: 1000',
+        )
+
+    def handle(self, *args, **options):
+        if options['solo_si_vacio'] and VentaDiariaEmpresa.objects.exists():
+            self.stdout.write('La tabla de ventas diarias ya tiene datos; no se recalcula')
+            return
+
+        batch_size = max(1, options['batch_size'])
+
+        if options['empresa']:
+            empresas = [options['empresa']]
+        else:
+            empresas = (
+                Pedido.objects.order_by('empresa_id')
+                .values_list('empresa_id', flat=True)
+                .distinct()
+            )
+
+        total_filas = 0
+        total_empresas = 0
+        for empresa_id in empresas:
+            total_filas += self.recalcular_empresa(empresa_id, batch_size)
+            total_empresas += 1
+
+        # bulk_create no dispara señales: invalidar las series que leen la tabla
+        invalidar_tags(tag_metricas('pedidos'), tag_metricas('ingresos'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{total_filas} resúmenes diarios generados para {total_empresas} empresas')
+        )
+
+    def recalcular_empresa(self, empresa_id, batch_size):
+        """Reemplaza los resúmenes de una empresa. Devuelve el número de filas."""
+        resumenes = VentaDiariaEmpresa.calcular_resumenes(Pedido.objects.filter(empresa_id=empresa_id))
+
+        with transaction.atomic():
+            VentaDiariaEmpresa.objects.filter(empresa_id=empresa_id).delete()
+            VentaDiariaEmpresa.objects.bulk_create(
+                [
+                    VentaDiariaEmpresa(empresa_id=emp_id, fecha=fecha, **valores)
+                    for (emp_id, fecha), valores in resumenes.items()
+                ],
+                batch_size=batch_size,
+            )
+
+        return len(resumenes)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0005_reservaservicio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingFileDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(help_text='Ruta del archivo relativa a MEDIA_ROOT', max_length=500, verbose_name='Ruta')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, help_text='Fecha y hora en que se encoló la eliminación', verbose_name='Fecha de Creación')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, help_text='Número de intentos fallidos de eliminación', verbose_name='Intentos')),
+                ('ultimo_error', models.CharField(blank=True, help_text='Último error registrado al intentar eliminar el archivo', max_length=255, verbose_name='Último Error')),
+            ],
+            options={
+                'verbose_name': 'Eliminación de Archivo Pendiente',
+                'verbose_name_plural': 'Eliminaciones de Archivos Pendientes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0006_pendingfiledeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenproducto',
+            name='alto',
+            field=models.PositiveIntegerField(blank=True, help_text='Alto de la imagen en píxeles', null=True, verbose_name='Alto'),
+        ),
+        migrations.AddField(
+            model_name='imagenproducto',
+            name='ancho',
+            field=models.PositiveIntegerField(blank=True, help_text='Ancho de la imagen en píxeles', null=True, verbose_name='Ancho'),
+        ),
+        migrations.AddField(
+            model_name='imagenproducto',
+            name='placeholder',
+            field=models.TextField(blank=True, help_text='Miniatura LQIP (data URI) mostrada mientras carga la imagen', verbose_name='Placeholder'),
+        ),
+        migrations.AddField(
+            model_name='imagenservicio',
+            name='alto',
+            field=models.PositiveIntegerField(blank=True, help_text='Alto de la imagen en píxeles', null=True, verbose_name='Alto'),
+        ),
+        migrations.AddField(
+            model_name='imagenservicio',
+            name='ancho',
+            field=models.PositiveIntegerField(blank=True, help_text='Ancho de la imagen en píxeles', null=True, verbose_name='Ancho'),
+        ),
+        migrations.AddField(
+            model_name='imagenservicio',
+            name='placeholder',
+            field=models.TextField(blank=True, help_text='Miniatura LQIP (data URI) mostrada mientras carga la imagen', verbose_name='Placeholder'),
+        ),
+    ]
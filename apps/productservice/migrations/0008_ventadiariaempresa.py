@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0007_imagenproducto_alto_imagenproducto_ancho_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiariaEmpresa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día de creación de los pedidos', verbose_name='Fecha')),
+                ('pedidos_total', models.PositiveIntegerField(default=0, verbose_name='Pedidos')),
+                ('pedidos_pendientes', models.PositiveIntegerField(default=0, verbose_name='Pendientes')),
+                ('pedidos_en_proceso', models.PositiveIntegerField(default=0, verbose_name='En Proceso')),
+                ('pedidos_completados', models.PositiveIntegerField(default=0, verbose_name='Completados')),
+                ('pedidos_cancelados', models.PositiveIntegerField(default=0, verbose_name='Cancelados')),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, help_text='Suma de totales de pedidos completados', max_digits=14, verbose_name='Ingresos')),
+                ('items_vendidos', models.PositiveIntegerField(default=0, help_text='Suma de cantidades de pedidos completados', verbose_name='Items Vendidos')),
+                ('clientes_distintos', models.PositiveIntegerField(default=0, help_text='Clientes distintos que hicieron pedidos ese día', verbose_name='Clientes Distintos')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria de Empresa',
+                'verbose_name_plural': 'Ventas Diarias de Empresas',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['empresa', 'fecha_pedido'], name='productserv_empresa_ed8fde_idx'),
+        ),
+        migrations.AddField(
+            model_name='ventadiariaempresa',
+            name='empresa',
+            field=models.ForeignKey(help_text='Empresa que recibió los pedidos', on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to=settings.AUTH_USER_MODEL, verbose_name='Empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiariaempresa',
+            constraint=models.UniqueConstraint(fields=('empresa', 'fecha'), name='venta_diaria_empresa_fecha_unica'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0008_ventadiariaempresa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ventadiariaempresa',
+            index=models.Index(fields=['fecha'], name='productserv_fecha_fe069b_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0009_ventadiariaempresa_productserv_fecha_fe069b_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['empresa', 'usuario'], name='productserv_empresa_5b0da5_idx'),
+        ),
+    ]
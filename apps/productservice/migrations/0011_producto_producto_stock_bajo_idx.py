@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0010_pedido_productserv_empresa_5b0da5_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True), ('stock__lt', 5)), fields=['usuario', 'stock', 'id'], name='producto_stock_bajo_idx'),
+        ),
+    ]
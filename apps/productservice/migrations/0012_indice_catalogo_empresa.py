@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0011_producto_producto_stock_bajo_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='productserv_usuario_7344a2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='servicio',
+            name='productserv_usuario_588efa_idx',
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['usuario', 'activo', '-fecha_creacion', '-id'], name='producto_catalogo_empresa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['usuario', 'activo', '-fecha_creacion', '-id'], name='servicio_catalogo_empresa_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:33
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def poblar_ventas_diarias(apps, schema_editor):
+    """Reconstruye los resúmenes diarios a partir de los pedidos existentes."""
+    Pedido = apps.get_model('productservice', 'Pedido')
+    DetallePedido = apps.get_model('productservice', 'DetallePedido')
+    VentaDiariaEmpresa = apps.get_model('productservice', 'VentaDiariaEmpresa')
+
+    pedidos = Pedido.objects.filter(empresa__isnull=False)
+    completado = Q(estado='completado')
+    filas = (
+        pedidos.order_by()
+        .annotate(dia=TruncDate('fecha_pedido'))
+        .values('empresa_id', 'dia')
+        .annotate(
+            pedidos_total=Count('id'),
+            pedidos_pendientes=Count('id', filter=Q(estado='pendiente')),
+            pedidos_en_proceso=Count('id', filter=Q(estado='en_proceso')),
+            pedidos_completados=Count('id', filter=completado),
+            pedidos_cancelados=Count('id', filter=Q(estado='cancelado')),
+            ingresos=Sum('total', filter=completado),
+            clientes_distintos=Count('usuario_id', distinct=True),
+        )
+    )
+    resumenes = {}
+    for fila in filas:
+        clave = (fila.pop('empresa_id'), fila.pop('dia'))
+        fila['ingresos'] = fila['ingresos'] or 0
+        fila['items_vendidos'] = 0
+        resumenes[clave] = fila
+
+    items = (
+        DetallePedido.objects.filter(pedido__in=pedidos.filter(completado).values('id'))
+        .order_by()
+        .annotate(dia=TruncDate('pedido__fecha_pedido'))
+        .values('pedido__empresa_id', 'dia')
+        .annotate(cantidad=Sum('cantidad'))
+    )
+    for fila in items:
+        clave = (fila['pedido__empresa_id'], fila['dia'])
+        if clave in resumenes:
+            resumenes[clave]['items_vendidos'] = fila['cantidad'] or 0
+
+    # Idempotente: reemplaza lo que hubiera generado recalcular_ventas_diarias
+    VentaDiariaEmpresa.objects.all().delete()
+    VentaDiariaEmpresa.objects.bulk_create(
+        [
+            VentaDiariaEmpresa(empresa_id=empresa_id, fecha=fecha, **valores)
+            for (empresa_id, fecha), valores in resumenes.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0012_indice_catalogo_empresa'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_ventas_diarias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productservice', '0013_poblar_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Fecha y hora de la última modificación del producto', verbose_name='Última Actualización'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Fecha y hora de la última modificación del servicio', verbose_name='Última Actualización'),
+            preserve_default=False,
+        ),
+    ]
@@ -5,6 +5,8 @@ Este módulo contiene los modelos relacionados con:
 - Gestión de productos (Producto, ImagenProducto)
 - Gestión de servicios (Servicio, ImagenServicio)
 - Sistema de pedidos (Pedido, DetallePedido)
+- Resumen diario de ventas por empresa (VentaDiariaEmpresa)
+- Cola de eliminación diferida de archivos (PendingFileDeletion)
 
 Arquitectura MVT: Estos modelos representan la capa de datos (Model) 
 para la funcionalidad de catálogo y comercio electrónico.
@@ -12,18 +14,170 @@ para la funcionalidad de catálogo y comercio electrónico.
 Características principales:
 - Soporte para múltiples imágenes por producto/servicio
 - Sistema de imágenes principales y secundarias
-- Gestión automática de archivos (limpieza al eliminar)
+- Gestión automática de archivos (limpieza diferida tras el commit)
 - Sistema de pedidos con detalles
 - Optimización de consultas con propiedades calculadas
 """
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
-import os
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 import json
+import base64
+import io
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# Lado máximo (px) de la miniatura usada como placeholder LQIP
+PLACEHOLDER_LADO = 16
+
+
+def generar_placeholder(archivo):
+    """
+    Genera las dimensiones y un placeholder LQIP de una imagen.
+    
+    El placeholder es una miniatura de PLACEHOLDER_LADO px codificada como
+    data URI (WEBP si Pillow lo soporta, PNG si no), pensada para pintarse
+    como fondo difuminado mientras carga la imagen real.
+    
+    Args:
+        archivo: Archivo de imagen (FieldFile, UploadedFile o ruta)
+        
+    Returns:
+        tuple: (ancho, alto, data_uri)
+    """
+    with Image.open(archivo) as img:
+        ancho, alto = img.size
+        # En JPEG decodifica directamente a escala reducida
+        img.draft('RGB', (PLACEHOLDER_LADO * 4, PLACEHOLDER_LADO * 4))
+        miniatura = img.convert('RGB')
+        miniatura.thumbnail((PLACEHOLDER_LADO, PLACEHOLDER_LADO))
+    
+    formato = 'WEBP' if features.check('webp') else 'PNG'
+    buffer = io.BytesIO()
+    miniatura.save(buffer, formato, quality=40)
+    datos = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return ancho, alto, f"data:image/{formato.lower()};base64,{datos}"
+
+
+class PlaceholderImagenMixin:
+    """
+    Cálculo de dimensiones y placeholder para modelos con campo `imagen`.
+    
+    No se usa ImageField(width_field=...) porque Django recalcularía las
+    dimensiones en cada instanciación de registros sin ellas, abriendo el
+    archivo (o fallando si ya no existe en el volumen).
+    """
+    
+    def actualizar_placeholder(self):
+        """
+        Recalcula ancho, alto y placeholder a partir del archivo actual.
+        
+        Returns:
+            bool: True si se pudieron calcular
+        """
+        if not self.imagen:
+            return False
+        try:
+            self.ancho, self.alto, self.placeholder = generar_placeholder(self.imagen)
+            return True
+        except Exception as e:
+            logger.warning(f"No se pudo generar el placeholder de {self.imagen.name}: {e}")
+            return False
+        finally:
+            # Dejar el archivo listo para que el storage lo lea desde el inicio
+            if self.imagen._committed:
+                self.imagen.close()
+            else:
+                self.imagen.seek(0)
+
+
+def _anotar_imagen_principal(queryset, modelo_imagen, campo_padre):
+    """
+    Anota en el queryset los datos de la imagen principal de cada elemento.
+    
+    Usa subconsultas correlacionadas con el mismo orden que el Meta de las
+    imágenes (principal primero, luego la más reciente), de modo que el
+    listado completo se resuelve en una sola consulta.
+    """
+    imagenes = (
+        modelo_imagen.objects
+        .filter(**{campo_padre: models.OuterRef('pk')})
+        .order_by('-principal', '-fecha_subida')
+    )
+    return queryset.annotate(
+        imagen_principal_ruta=models.Subquery(imagenes.values('imagen')[:1]),
+        imagen_principal_principal=models.Subquery(imagenes.values('principal')[:1]),
+        imagen_principal_ancho=models.Subquery(imagenes.values('ancho')[:1]),
+        imagen_principal_alto=models.Subquery(imagenes.values('alto')[:1]),
+        imagen_principal_placeholder=models.Subquery(imagenes.values('placeholder')[:1]),
+    )
+
+
+def _imagen_principal_en_cache(instancia, modelo_imagen, campo_padre):
+    """
+    Resuelve la imagen principal sin consultas si hay datos precargados.
+    
+    Consulta primero las anotaciones de with_main_image() y después la
+    caché de prefetch_related('imagenes').
+    
+    Returns:
+        tuple: (resuelto, imagen) donde resuelto indica si se usaron datos precargados
+    """
+    if 'imagen_principal_ruta' in instancia.__dict__:
+        if not instancia.imagen_principal_ruta:
+            return True, None
+        # Registro de solo lectura reconstruido a partir de las anotaciones
+        return True, modelo_imagen(
+            **{campo_padre: instancia},
+            imagen=instancia.imagen_principal_ruta,
+            principal=bool(instancia.imagen_principal_principal),
+            ancho=instancia.imagen_principal_ancho,
+            alto=instancia.imagen_principal_alto,
+            placeholder=instancia.imagen_principal_placeholder or '',
+        )
+    
+    if 'imagenes' in getattr(instancia, '_prefetched_objects_cache', {}):
+        imagenes = list(instancia.imagenes.all())
+        principal = next((img for img in imagenes if img.principal), None)
+        return True, principal or (imagenes[0] if imagenes else None)
+    
+    return False, None
+
+
+class ProductoQuerySet(models.QuerySet):
+    """QuerySet de productos con utilidades para listados."""
+    
+    def with_main_image(self):
+        """
+        Anota la imagen principal (ruta, dimensiones y placeholder).
+        
+        imagen_principal e imagen_principal_registro usan estas anotaciones
+        sin consultas adicionales por producto.
+        
+        Usage:
+            Producto.objects.filter(activo=True).with_main_image()
+        """
+        return _anotar_imagen_principal(self, ImagenProducto, 'producto')
+
+
+# Umbral de stock bajo (Producto.UMBRAL_STOCK_BAJO). Se define a nivel de
+# módulo porque la condición del índice parcial producto_stock_bajo_idx,
+# declarada en Producto.Meta, no puede referirse a atributos de la clase
+UMBRAL_STOCK_BAJO = 5
 
 
 class Producto(models.Model):
@@ -98,6 +252,12 @@ class Producto(models.Model):
         verbose_name="Fecha de Creación"
     )
     
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha y hora de la última modificación del producto",
+        verbose_name="Última Actualización"
+    )
+    
     activo = models.BooleanField(
         default=True,
         help_text="Determina si el producto está visible y disponible para venta",
@@ -117,39 +277,67 @@ class Producto(models.Model):
         verbose_name="Políticas de Devoluciones"
     )
 
+    # Por debajo de este stock (y con al menos una unidad) el producto está en alerta.
+    # Es la constante de módulo que usa la condición de producto_stock_bajo_idx
+    UMBRAL_STOCK_BAJO = UMBRAL_STOCK_BAJO
+
+    objects = ProductoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-fecha_creacion']  # Más recientes primero
         # Índices para optimizar consultas frecuentes
         indexes = [
-            models.Index(fields=['usuario', 'activo']),  # Productos activos por usuario
+            # Productos activos por usuario, en el orden del catálogo paginado
+            # (CatalogService.get_catalogo_empresa)
+            models.Index(
+                fields=['usuario', 'activo', '-fecha_creacion', '-id'],
+                name='producto_catalogo_empresa_idx',
+            ),
             models.Index(fields=['categoria']),          # Filtros por categoría
             models.Index(fields=['fecha_creacion']),     # Ordenamiento temporal
             models.Index(fields=['precio']),             # Filtros por precio
+            # Índice parcial: solo productos activos con stock bajo (alertas de inventario).
+            # La condición debe coincidir con InventoryService.get_alertas_stock, que filtra
+            # por Producto.UMBRAL_STOCK_BAJO; si cambia el umbral, makemigrations recrea el índice
+            models.Index(
+                fields=['usuario', 'stock', 'id'],
+                name='producto_stock_bajo_idx',
+                condition=Q(activo=True, stock__lt=UMBRAL_STOCK_BAJO),
+            ),
         ]
 
+    # Valor de activo con el que se cargó; None en productos nuevos.
+    # Lo usan los contadores de uso de PerfilUsuario (apps.accounts.signals)
+    _activo_original = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._activo_original = instancia.__dict__.get('activo')
+        return instancia
+
     def __str__(self):
         """Representación string del modelo para admin y debugging."""
         return f"{self.nombre} - {self.usuario.username}"
 
+    def save(self, *args, **kwargs):
+        """Las señales post_save ven el activo anterior; se actualiza después."""
+        super().save(*args, **kwargs)
+        self._activo_original = self.activo
+
     def delete(self, *args, **kwargs):
         """
         Override del método delete para limpieza de archivos.
         
-        Elimina todas las imágenes asociadas al producto antes de
-        eliminar el producto para evitar archivos huérfanos.
+        Programa la eliminación de los archivos de todas las imágenes del
+        producto; los registros ImagenProducto se eliminan en cascada.
+        Los archivos se borran después del commit (ver PendingFileDeletion).
         """
-        # Elimina todas las imágenes asociadas al producto
-        for img in self.imagenes.all():
-            img.delete()  # Esto también eliminará el archivo físico
-            
-        # Eliminar imagen principal si existe (campo legacy)
-        if hasattr(self, 'imagen') and self.imagen:
-            if self.imagen.path and os.path.isfile(self.imagen.path):
-                os.remove(self.imagen.path)
-                
+        archivos = list(self.imagenes.values_list('imagen', flat=True))
         super().delete(*args, **kwargs)
+        PendingFileDeletion.programar(archivos)
 
     @property
     def imagen_principal(self):
@@ -167,18 +355,29 @@ class Producto(models.Model):
                 <img src="{{ producto.imagen_principal }}" alt="{{ producto.nombre }}">
             {% endif %}
         """
-        # Buscar imagen marcada como principal
-        principal = self.imagenes.filter(principal=True).first()
-        if principal:
-            return principal.imagen.url
-            
-        # Si no hay principal, usar la primera disponible
-        primera = self.imagenes.first()
-        if primera:
-            return primera.imagen.url
+        registro = self.imagen_principal_registro
+        if registro:
+            return registro.imagen.url
             
         return None
     
+    @cached_property
+    def imagen_principal_registro(self):
+        """
+        Obtiene el registro ImagenProducto principal (con ancho, alto y placeholder).
+        
+        Usa las anotaciones de with_main_image() o las imágenes precargadas
+        si existen; si no, una sola consulta (el ordering de ImagenProducto
+        pone la principal primero).
+        
+        Returns:
+            ImagenProducto|None: Imagen principal o None si no hay imágenes
+        """
+        resuelto, imagen = _imagen_principal_en_cache(self, ImagenProducto, 'producto')
+        if resuelto:
+            return imagen
+        return self.imagenes.first()
+    
     @property
     def tiene_stock(self):
         """
@@ -195,9 +394,9 @@ class Producto(models.Model):
         Determina si el producto tiene stock bajo (menos de 5 unidades).
         
         Returns:
-            bool: True si el stock es menor a 5 unidades
+            bool: True si el stock es menor a UMBRAL_STOCK_BAJO unidades
         """
-        return self.stock < 5
+        return self.stock < self.UMBRAL_STOCK_BAJO
     
     @property
     def total_imagenes(self):
@@ -207,6 +406,8 @@ class Producto(models.Model):
         Returns:
             int: Número total de imágenes
         """
+        if 'imagenes' in getattr(self, '_prefetched_objects_cache', {}):
+            return len(self.imagenes.all())
         return self.imagenes.count()
 
     def clean(self):
@@ -257,7 +458,7 @@ class Producto(models.Model):
         return self.get_politicas_devoluciones_default()
 
 
-class ImagenProducto(models.Model):
+class ImagenProducto(PlaceholderImagenMixin, models.Model):
     """
     Modelo que gestiona las imágenes asociadas a un producto.
     
@@ -306,6 +507,27 @@ class ImagenProducto(models.Model):
         help_text="Marca esta imagen como la principal del producto",
         verbose_name="Imagen Principal"
     )
+    
+    # Dimensiones y placeholder (calculados al guardar)
+    ancho = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Ancho de la imagen en píxeles",
+        verbose_name="Ancho"
+    )
+    
+    alto = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Alto de la imagen en píxeles",
+        verbose_name="Alto"
+    )
+    
+    placeholder = models.TextField(
+        blank=True,
+        help_text="Miniatura LQIP (data URI) mostrada mientras carga la imagen",
+        verbose_name="Placeholder"
+    )
 
     class Meta:
         verbose_name = "Imagen de Producto"
@@ -325,20 +547,24 @@ class ImagenProducto(models.Model):
         """
         Override del método delete para limpieza de archivos.
         
-        Elimina el archivo físico de la imagen del sistema de archivos
-        antes de eliminar el registro de la base de datos.
+        Programa la eliminación del archivo físico de la imagen para
+        cuando la transacción que elimina el registro haga commit.
         """
-        if self.imagen and self.imagen.path and os.path.isfile(self.imagen.path):
-            os.remove(self.imagen.path)
+        archivo = self.imagen.name if self.imagen else None
         super().delete(*args, **kwargs)
+        PendingFileDeletion.programar([archivo])
 
     def save(self, *args, **kwargs):
         """
         Override del método save para lógica de imagen principal.
         
         Si se marca esta imagen como principal, desmarca las demás
-        imágenes del mismo producto como principales.
+        imágenes del mismo producto como principales. Calcula las
+        dimensiones y el placeholder si aún no existen.
         """
+        if self.imagen and not self.placeholder:
+            self.actualizar_placeholder()
+            
         if self.principal:
             # Desmarcar otras imágenes principales del mismo producto
             ImagenProducto.objects.filter(
@@ -349,6 +575,18 @@ class ImagenProducto(models.Model):
         super().save(*args, **kwargs)
 
 
+class ServicioQuerySet(models.QuerySet):
+    """QuerySet de servicios con utilidades para listados."""
+    
+    def with_main_image(self):
+        """
+        Anota la imagen principal (ruta, dimensiones y placeholder).
+        
+        Ver ProductoQuerySet.with_main_image().
+        """
+        return _anotar_imagen_principal(self, ImagenServicio, 'servicio')
+
+
 class Servicio(models.Model):
     """
     Modelo que representa un servicio ofrecido por el usuario.
@@ -430,6 +668,12 @@ class Servicio(models.Model):
         verbose_name="Fecha de Creación"
     )
     
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha y hora de la última modificación del servicio",
+        verbose_name="Última Actualización"
+    )
+    
     activo = models.BooleanField(
         default=True,
         help_text="Determina si el servicio está visible y disponible",
@@ -449,17 +693,31 @@ class Servicio(models.Model):
         verbose_name="Políticas de Cancelación"
     )
 
+    objects = ServicioQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Servicio"
         verbose_name_plural = "Servicios"
         ordering = ['-fecha_creacion']
         indexes = [
-            models.Index(fields=['usuario', 'activo']),
+            models.Index(
+                fields=['usuario', 'activo', '-fecha_creacion', '-id'],
+                name='servicio_catalogo_empresa_idx',
+            ),
             models.Index(fields=['categoria']),
             models.Index(fields=['fecha_creacion']),
             models.Index(fields=['precio']),
         ]
 
+    # Valor de activo con el que se cargó; None en servicios nuevos
+    _activo_original = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._activo_original = instancia.__dict__.get('activo')
+        return instancia
+
     def __str__(self):
         """Representación string del modelo."""
         return f"{self.nombre} - {self.usuario.username}"
@@ -468,38 +726,38 @@ class Servicio(models.Model):
         """
         Override del método delete para limpieza de archivos.
         
-        Elimina todas las imágenes asociadas al servicio antes de
-        eliminar el servicio para evitar archivos huérfanos.
+        Programa la eliminación de los archivos de todas las imágenes del
+        servicio (incluida la imagen legacy); los registros ImagenServicio
+        se eliminan en cascada.
         """
-        # Elimina todas las imágenes asociadas al servicio
-        for img in self.imagenes.all():
-            img.delete()
-            
-        # Eliminar imagen principal si existe
+        archivos = list(self.imagenes.values_list('imagen', flat=True))
         if self.imagen:
-            if self.imagen.path and os.path.isfile(self.imagen.path):
-                os.remove(self.imagen.path)
-                
+            archivos.append(self.imagen.name)
         super().delete(*args, **kwargs)
+        PendingFileDeletion.programar(archivos)
 
     def save(self, *args, **kwargs):
         """
         Override del método save para gestión de imagen principal.
         
-        Elimina la imagen anterior si se reemplaza para evitar
-        acumulación de archivos no utilizados.
+        Programa la eliminación de la imagen anterior si se reemplaza para
+        evitar acumulación de archivos no utilizados.
         """
-        try:
-            # Obtener la instancia actual de la base de datos
-            this = Servicio.objects.get(pk=self.pk)
-            # Si la imagen cambió, eliminar la anterior
-            if this.imagen != self.imagen and this.imagen and os.path.isfile(this.imagen.path):
-                os.remove(this.imagen.path)
-        except Servicio.DoesNotExist:
-            # Es un nuevo servicio, no hay imagen anterior
-            pass
+        imagen_anterior = None
+        if self.pk:
+            # Obtener solo la ruta de la imagen actual en la base de datos
+            imagen_anterior = (
+                Servicio.objects.filter(pk=self.pk)
+                .values_list('imagen', flat=True)
+                .first()
+            )
             
         super().save(*args, **kwargs)
+        self._activo_original = self.activo
+        
+        # Si la imagen cambió, eliminar la anterior tras el commit
+        if imagen_anterior and imagen_anterior != self.imagen.name:
+            PendingFileDeletion.programar([imagen_anterior])
 
     @property
     def imagen_principal(self):
@@ -513,20 +771,32 @@ class Servicio(models.Model):
         Returns:
             str|None: URL de la imagen principal o None si no hay imágenes
         """
-        # Buscar imagen marcada como principal en imágenes múltiples
-        principal = self.imagenes.filter(principal=True).first()
-        if principal:
-            return principal.imagen.url
+        registro = self.imagen_principal_registro
+        if registro:
+            return registro.imagen.url
             
         # Usar imagen del campo legacy si existe
         if self.imagen:
             return self.imagen.url
             
-        # Si no hay principal, usar la primera disponible
-        primera = self.imagenes.first()
-        if primera:
-            return primera.imagen.url
-            
+        return None
+    
+    @cached_property
+    def imagen_principal_registro(self):
+        """
+        Obtiene el registro ImagenServicio que se muestra como principal.
+        
+        Respeta la prioridad de imagen_principal: imagen marcada como
+        principal, luego imagen legacy (sin registro) y por último la primera.
+        
+        Returns:
+            ImagenServicio|None: Imagen principal o None si se usa la legacy o no hay imágenes
+        """
+        resuelto, primera = _imagen_principal_en_cache(self, ImagenServicio, 'servicio')
+        if not resuelto:
+            primera = self.imagenes.first()
+        if primera and (primera.principal or not self.imagen):
+            return primera
         return None
     
     @property
@@ -539,7 +809,10 @@ class Servicio(models.Model):
         Returns:
             int: Número total de imágenes
         """
-        total = self.imagenes.count()
+        if 'imagenes' in getattr(self, '_prefetched_objects_cache', {}):
+            total = len(self.imagenes.all())
+        else:
+            total = self.imagenes.count()
         if self.imagen:
             total += 1
         return total
@@ -584,7 +857,7 @@ class Servicio(models.Model):
             })
 
 
-class ImagenServicio(models.Model):
+class ImagenServicio(PlaceholderImagenMixin, models.Model):
     """
     Modelo que gestiona las imágenes asociadas a un servicio.
     
@@ -632,6 +905,27 @@ class ImagenServicio(models.Model):
         help_text="Marca esta imagen como la principal del servicio",
         verbose_name="Imagen Principal"
     )
+    
+    # Dimensiones y placeholder (calculados al guardar)
+    ancho = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Ancho de la imagen en píxeles",
+        verbose_name="Ancho"
+    )
+    
+    alto = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Alto de la imagen en píxeles",
+        verbose_name="Alto"
+    )
+    
+    placeholder = models.TextField(
+        blank=True,
+        help_text="Miniatura LQIP (data URI) mostrada mientras carga la imagen",
+        verbose_name="Placeholder"
+    )
 
     class Meta:
         verbose_name = "Imagen de Servicio"
@@ -648,13 +942,16 @@ class ImagenServicio(models.Model):
         return f"Imagen de {self.servicio.nombre} ({self.id}){principal_text}"
 
     def delete(self, *args, **kwargs):
-        """Override del método delete para limpieza de archivos."""
-        if self.imagen and self.imagen.path and os.path.isfile(self.imagen.path):
-            os.remove(self.imagen.path)
+        """Override del método delete para limpieza diferida de archivos."""
+        archivo = self.imagen.name if self.imagen else None
         super().delete(*args, **kwargs)
+        PendingFileDeletion.programar([archivo])
 
     def save(self, *args, **kwargs):
-        """Override del método save para lógica de imagen principal."""
+        """Override del método save para lógica de imagen principal y placeholder."""
+        if self.imagen and not self.placeholder:
+            self.actualizar_placeholder()
+            
         if self.principal:
             # Desmarcar otras imágenes principales del mismo servicio
             ImagenServicio.objects.filter(
@@ -751,11 +1048,44 @@ class Pedido(models.Model):
             models.Index(fields=['empresa', 'estado']),  # Para empresas viendo sus pedidos
             models.Index(fields=['fecha_pedido']),
             models.Index(fields=['estado']),
+            models.Index(fields=['empresa', 'fecha_pedido']),  # Recalcular resúmenes diarios
+            models.Index(fields=['empresa', 'usuario']),  # Estadísticas por cliente
         ]
 
+    # Estado con el que se cargó el pedido; None en pedidos nuevos
+    _estado_original = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._estado_original = instancia.__dict__.get('estado')
+        return instancia
+
     def __str__(self):
         """Representación string del modelo."""
         return f"Pedido #{self.id} - {self.usuario.username} → {self.empresa_info} ({self.get_estado_display()})"
+
+    def save(self, *args, **kwargs):
+        """
+        Override del método save para mantener VentaDiariaEmpresa.
+        
+        El resumen del día se recalcula al crear el pedido, al cambiar de
+        estado o al cambiar el total de un pedido completado. Las
+        eliminaciones se manejan en descontar_pedido_eliminado().
+        """
+        creado = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        afecta_resumen = (
+            creado
+            or self.estado != self._estado_original
+            or (self.estado == 'completado' and (update_fields is None or 'total' in update_fields))
+        )
+        
+        super().save(*args, **kwargs)
+        
+        if afecta_resumen:
+            VentaDiariaEmpresa.programar_refresco(self.empresa_id, self.fecha_pedido)
+        self._estado_original = self.estado
     
     @property
     def empresa_info(self):
@@ -1086,11 +1416,12 @@ class MensajePedido(models.Model):
     def delete(self, *args, **kwargs):
         """
         Override del método delete para eliminar archivos adjuntos.
+        
+        El archivo se elimina después del commit mediante PendingFileDeletion.
         """
-        if self.archivo_adjunto:
-            if os.path.isfile(self.archivo_adjunto.path):
-                os.remove(self.archivo_adjunto.path)
+        archivo = self.archivo_adjunto.name if self.archivo_adjunto else None
         super().delete(*args, **kwargs)
+        PendingFileDeletion.programar([archivo])
 
 
 class ReservaServicio(models.Model):
@@ -1324,4 +1655,373 @@ class ReservaServicio(models.Model):
                 except Servicio.DoesNotExist:
                     pass
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class PendingFileDeletion(models.Model):
+    """
+    Cola de archivos pendientes de eliminar del almacenamiento.
+    
+    Los overrides de delete() no borran archivos dentro de la petición ni
+    de la transacción: registran aquí las rutas mediante
+    transaction.on_commit(), de modo que solo se encolan si el borrado en
+    base de datos se confirma.
+    
+    El propio proceso web drena la cola en un thread después de cada
+    encolado (drenar_en_segundo_plano): los archivos viven en el volumen
+    del servicio web, así que no hace falta ningún worker aparte. Si
+    algún archivo falla, el thread programa otro drenado a los
+    REINTENTO_DRENADO segundos, hasta que se elimina o se descarta tras
+    MAX_INTENTOS. start.sh drena lo que quedara al arrancar y el comando
+    procesar_eliminaciones_pendientes permite hacerlo a mano.
+    
+    Si el proceso se detiene entre el commit y el encolado, el archivo
+    queda huérfano y lo recoge limpiar_imagenes_huerfanas.
+    """
+    
+    # Lock del drenado en segundo plano: un solo thread por despliegue
+    CLAVE_LOCK_DRENADO = 'pending_file_deletion:drenando'
+    LOCK_DRENADO_TIMEOUT = 300
+    MAX_INTENTOS = 5
+    # Segundos hasta el reintento de los archivos que fallaron
+    REINTENTO_DRENADO = 600
+    
+    # Ruta relativa al storage (FieldFile.name), no ruta absoluta
+    ruta = models.CharField(
+        max_length=500,
+        help_text="Ruta del archivo relativa a MEDIA_ROOT",
+        verbose_name="Ruta"
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Fecha y hora en que se encoló la eliminación",
+        verbose_name="Fecha de Creación"
+    )
+    
+    # Control de reintentos
+    intentos = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Número de intentos fallidos de eliminación",
+        verbose_name="Intentos"
+    )
+    
+    ultimo_error = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Último error registrado al intentar eliminar el archivo",
+        verbose_name="Último Error"
+    )
+
+    class Meta:
+        verbose_name = "Eliminación de Archivo Pendiente"
+        verbose_name_plural = "Eliminaciones de Archivos Pendientes"
+        ordering = ['id']  # Orden de llegada (FIFO)
+
+    def __str__(self):
+        """Representación string del modelo."""
+        return f"{self.ruta} ({self.intentos} intentos)"
+
+    @classmethod
+    def programar(cls, rutas):
+        """
+        Encola rutas de archivos para eliminarlas tras el commit actual.
+        
+        Fuera de un bloque atómico el callback se ejecuta inmediatamente.
+        
+        Args:
+            rutas (iterable): Nombres de archivo (FieldFile.name); se ignoran vacíos
+        """
+        rutas = [ruta for ruta in rutas if ruta]
+        if not rutas:
+            return
+        
+        def encolar():
+            cls.objects.bulk_create([cls(ruta=ruta) for ruta in rutas], batch_size=500)
+            cls.drenar_en_segundo_plano()
+        
+        transaction.on_commit(encolar)
+
+    @classmethod
+    def drenar_en_segundo_plano(cls):
+        """
+        Drena la cola en un thread si no hay otro drenado en curso.
+        
+        Returns:
+            bool: True si se inició el thread
+        """
+        if not cache.add(cls.CLAVE_LOCK_DRENADO, 1, cls.LOCK_DRENADO_TIMEOUT):
+            return False
+        
+        def drenar_async():
+            fallidos = 0
+            try:
+                _, fallidos = cls.drenar()
+            except Exception as e:
+                logger.error(f"Error drenando la cola de eliminación de archivos: {e}", exc_info=True)
+            finally:
+                cache.delete(cls.CLAVE_LOCK_DRENADO)
+                # El thread abre su propia conexión a la base de datos
+                connection.close()
+            if fallidos:
+                cls.programar_reintento()
+        
+        try:
+            threading.Thread(target=drenar_async, name='pending-file-deletion').start()
+        except Exception as e:
+            cache.delete(cls.CLAVE_LOCK_DRENADO)
+            logger.error(f"No se pudo iniciar el thread de eliminación de archivos: {e}")
+            return False
+        return True
+
+    @classmethod
+    def programar_reintento(cls):
+        """Vuelve a drenar la cola dentro de REINTENTO_DRENADO segundos."""
+        temporizador = threading.Timer(cls.REINTENTO_DRENADO, cls.drenar_en_segundo_plano)
+        # No retiene el cierre del proceso; lo pendiente se drena al arrancar
+        temporizador.daemon = True
+        temporizador.start()
+        return temporizador
+
+    @classmethod
+    def drenar(cls, batch_size=200, max_intentos=MAX_INTENTOS):
+        """Procesa lotes hasta vaciar la cola. Devuelve (eliminados, fallidos)."""
+        total_eliminados = 0
+        total_fallidos = 0
+        ultimo_id = 0
+
+        while True:
+            eliminados, fallidos, ultimo_id = cls.procesar_lote(batch_size, max_intentos, ultimo_id)
+            total_eliminados += eliminados
+            total_fallidos += fallidos
+            if ultimo_id is None:
+                break
+
+        return total_eliminados, total_fallidos
+
+    @classmethod
+    def procesar_lote(cls, batch_size, max_intentos, desde_id):
+        """
+        Procesa un lote de la cola a partir de desde_id.
+
+        Los registros se bloquean con skip_locked para que varios procesos
+        puedan drenar la cola a la vez sin procesar el mismo archivo.
+
+        Returns:
+            tuple: (eliminados, fallidos, ultimo_id) con ultimo_id=None si no quedan registros
+        """
+        with transaction.atomic():
+            lote = list(
+                cls.objects
+                .select_for_update(skip_locked=True)
+                .filter(id__gt=desde_id)
+                .order_by('id')
+                .values_list('id', 'ruta')[:batch_size]
+            )
+            if not lote:
+                return 0, 0, None
+
+            completados = []
+            errores = {}
+            for pk, ruta in lote:
+                try:
+                    # FileSystemStorage.delete ignora archivos inexistentes
+                    default_storage.delete(ruta)
+                    completados.append(pk)
+                except Exception as e:
+                    errores[pk] = str(e)[:255]
+                    logger.warning(f"No se pudo eliminar archivo {ruta}: {e}")
+
+            cls.objects.filter(id__in=completados).delete()
+
+            for pk, error in errores.items():
+                cls.objects.filter(id=pk).update(
+                    intentos=F('intentos') + 1,
+                    ultimo_error=error,
+                )
+
+            if errores:
+                descartados, _ = cls.objects.filter(
+                    id__in=list(errores),
+                    intentos__gte=max_intentos,
+                ).delete()
+                if descartados:
+                    logger.error(f"{descartados} archivos descartados tras {max_intentos} intentos fallidos")
+
+        return len(completados), len(errores), lote[-1][0]
+
+
+class VentaDiariaEmpresa(models.Model):
+    """
+    Resumen diario de pedidos recibidos por una empresa.
+    
+    Una fila por empresa y día (fecha de creación del pedido) con los
+    conteos por estado, ingresos e items de pedidos completados y clientes
+    distintos. Las estadísticas y gráficas de la empresa leen estas filas
+    en lugar de recorrer todos sus pedidos.
+    
+    Pedido.save() y el receptor post_delete programan el recálculo del día
+    afectado tras el commit. La migración 0013_poblar_ventas_diarias carga
+    los pedidos anteriores; el comando recalcular_ventas_diarias reconstruye
+    la tabla completa o la de una empresa para corregir desajustes.
+    """
+    
+    empresa = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='ventas_diarias',
+        help_text="Empresa que recibió los pedidos",
+        verbose_name="Empresa"
+    )
+    
+    fecha = models.DateField(
+        help_text="Día de creación de los pedidos",
+        verbose_name="Fecha"
+    )
+    
+    # Conteos por estado
+    pedidos_total = models.PositiveIntegerField(default=0, verbose_name="Pedidos")
+    pedidos_pendientes = models.PositiveIntegerField(default=0, verbose_name="Pendientes")
+    pedidos_en_proceso = models.PositiveIntegerField(default=0, verbose_name="En Proceso")
+    pedidos_completados = models.PositiveIntegerField(default=0, verbose_name="Completados")
+    pedidos_cancelados = models.PositiveIntegerField(default=0, verbose_name="Cancelados")
+    
+    # Solo pedidos completados
+    ingresos = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Suma de totales de pedidos completados",
+        verbose_name="Ingresos"
+    )
+    
+    items_vendidos = models.PositiveIntegerField(
+        default=0,
+        help_text="Suma de cantidades de pedidos completados",
+        verbose_name="Items Vendidos"
+    )
+    
+    clientes_distintos = models.PositiveIntegerField(
+        default=0,
+        help_text="Clientes distintos que hicieron pedidos ese día",
+        verbose_name="Clientes Distintos"
+    )
+    
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+
+    class Meta:
+        verbose_name = "Venta Diaria de Empresa"
+        verbose_name_plural = "Ventas Diarias de Empresas"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha']),  # Series globales (MetricsService)
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fecha'], name='venta_diaria_empresa_fecha_unica'),
+        ]
+
+    def __str__(self):
+        """Representación string del modelo."""
+        return f"{self.empresa.username} {self.fecha}: {self.pedidos_total} pedidos"
+
+    @staticmethod
+    def calcular_resumenes(pedidos):
+        """
+        Agrupa un queryset de pedidos por empresa y día.
+        
+        Usa dos consultas GROUP BY: una sobre pedidos y otra sobre las
+        cantidades de sus detalles (separada para no multiplicar totales).
+        
+        Args:
+            pedidos (QuerySet): Pedidos a resumir
+            
+        Returns:
+            dict: {(empresa_id, fecha): {campo: valor}}
+        """
+        completado = Q(estado='completado')
+        filas = (
+            pedidos.order_by()
+            .annotate(dia=TruncDate('fecha_pedido'))
+            .values('empresa_id', 'dia')
+            .annotate(
+                pedidos_total=Count('id'),
+                pedidos_pendientes=Count('id', filter=Q(estado='pendiente')),
+                pedidos_en_proceso=Count('id', filter=Q(estado='en_proceso')),
+                pedidos_completados=Count('id', filter=completado),
+                pedidos_cancelados=Count('id', filter=Q(estado='cancelado')),
+                ingresos=Sum('total', filter=completado),
+                clientes_distintos=Count('usuario_id', distinct=True),
+            )
+        )
+        resumenes = {}
+        for fila in filas:
+            clave = (fila.pop('empresa_id'), fila.pop('dia'))
+            fila['ingresos'] = fila['ingresos'] or 0
+            fila['items_vendidos'] = 0
+            resumenes[clave] = fila
+        
+        items = (
+            DetallePedido.objects.filter(pedido__in=pedidos.filter(completado).values('id'))
+            .order_by()
+            .annotate(dia=TruncDate('pedido__fecha_pedido'))
+            .values('pedido__empresa_id', 'dia')
+            .annotate(cantidad=Sum('cantidad'))
+        )
+        for fila in items:
+            clave = (fila['pedido__empresa_id'], fila['dia'])
+            if clave in resumenes:
+                resumenes[clave]['items_vendidos'] = fila['cantidad'] or 0
+        
+        return resumenes
+
+    @classmethod
+    def programar_refresco(cls, empresa_id, fecha_pedido):
+        """
+        Recalcula el día del pedido cuando la transacción actual haga commit.
+        
+        Args:
+            empresa_id (int): Empresa del pedido
+            fecha_pedido (datetime): Fecha de creación del pedido
+        """
+        if not empresa_id or fecha_pedido is None:
+            return
+        fecha = timezone.localdate(fecha_pedido)
+        transaction.on_commit(lambda: cls.refrescar(empresa_id, fecha))
+
+    @classmethod
+    @transaction.atomic
+    def refrescar(cls, empresa_id, fecha):
+        """
+        Recalcula la fila de una empresa y día a partir de sus pedidos.
+        
+        Antes de agregar se bloquea el usuario de la empresa, que siempre
+        existe (la fila del día puede no existir todavía y entonces
+        select_for_update no bloquearía nada): dos recálculos concurrentes
+        de la misma empresa se serializan y el último ve ambos commits.
+        """
+        list(User.objects.select_for_update().filter(pk=empresa_id).values_list('pk', flat=True))
+        filas = cls.objects.filter(empresa_id=empresa_id, fecha=fecha)
+        
+        inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+        pedidos = Pedido.objects.filter(
+            empresa_id=empresa_id,
+            fecha_pedido__gte=inicio,
+            fecha_pedido__lt=inicio + timedelta(days=1),
+        )
+        resumen = cls.calcular_resumenes(pedidos).get((empresa_id, fecha))
+        
+        if resumen is None:
+            filas.delete()
+            return
+        
+        cls.objects.update_or_create(empresa_id=empresa_id, fecha=fecha, defaults=resumen)
+
+
+@receiver(post_delete, sender=Pedido)
+def descontar_pedido_eliminado(sender, instance, **kwargs):
+    """
+    Recalcula el resumen diario al eliminar un pedido.
+    
+    Se usa post_delete en lugar de un override de delete() porque también
+    se dispara en borrados en cascada (por ejemplo al eliminar un cliente).
+    """
+    VentaDiariaEmpresa.programar_refresco(instance.empresa_id, instance.fecha_pedido)
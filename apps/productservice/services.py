@@ -16,12 +16,21 @@ Beneficios:
 
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.db.models import Q, Prefetch, Avg
+from django.db.models import DecimalField, F, Q, Prefetch, Avg, Count, Max, Min, Sum, Window
+from django.db.models.functions import NullIf, Rank
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 import logging
 from PIL import Image
-import os
 
-from .models import Producto, Servicio, ImagenProducto, ImagenServicio, Pedido, DetallePedido, ReservaServicio
+from .models import (
+    Producto, Servicio, ImagenProducto, ImagenServicio, Pedido, DetallePedido, ReservaServicio,
+    VentaDiariaEmpresa,
+)
+from .upload_handlers import validar_imagen
+from apps.accounts.cache_utils import TAG_CATALOGO, obtener_dos_niveles, obtener_o_calcular, tag_empresa
+from apps.accounts.models import PerfilUsuario
 from apps.accounts.services import SuscripcionService
 
 # Configurar logger para este módulo
@@ -97,29 +106,33 @@ class ProductService:
                 principal=(i == 0)  # Primera imagen como principal
             )
             
-            # Optimizar imagen si es necesario
-            ProductService._optimize_image(imagen_producto.imagen.path)
+            # Optimizar imagen si es necesario (recalcula dimensiones si cambió)
+            if ProductService._optimize_image(imagen_producto.imagen.path):
+                imagen_producto.actualizar_placeholder()
+                imagen_producto.save(update_fields=['ancho', 'alto', 'placeholder'])
     
     @staticmethod
     def _validate_image(image_file):
         """
         Valida que el archivo de imagen cumpla con los requisitos.
         
+        Las subidas HTTP ya llegan validadas por ImagenStreamingUploadHandler
+        (firma, dimensiones y tamaño comprobados mientras se recibían); el
+        resto de archivos se validan leyendo solo su cabecera.
+        
         Args:
             image_file: Archivo de imagen
             
         Raises:
             ValidationError: Si la imagen no es válida
         """
-        # Validar tamaño (máximo 5MB)
-        if image_file.size > 5 * 1024 * 1024:
-            raise ValidationError("La imagen no puede exceder 5MB")
+        if getattr(image_file, 'imagen_validada', False):
+            return
         
-        # Validar formato
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif']
-        ext = os.path.splitext(image_file.name)[1].lower()
-        if ext not in valid_extensions:
-            raise ValidationError("Formato de imagen no válido. Use JPG, PNG o GIF")
+        validador = validar_imagen(image_file)
+        image_file.imagen_validada = True
+        image_file.formato_imagen = validador.formato
+        image_file.dimensiones = validador.dimensiones
     
     @staticmethod
     def _optimize_image(image_path):
@@ -128,6 +141,9 @@ class ProductService:
         
         Args:
             image_path (str): Ruta de la imagen
+            
+        Returns:
+            bool: True si la imagen fue redimensionada
         """
         try:
             with Image.open(image_path) as img:
@@ -136,9 +152,12 @@ class ProductService:
                 if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
                     img.thumbnail(max_size, Image.Resampling.LANCZOS)
                     img.save(image_path, optimize=True, quality=85)
+                    return True
                     
         except Exception as e:
             logger.warning(f"No se pudo optimizar la imagen {image_path}: {str(e)}")
+        
+        return False
     
     @staticmethod
     def update_product(producto, product_data, new_images=None, images_to_delete=None):
@@ -256,20 +275,119 @@ class ProductService:
         Returns:
             dict: Estadísticas de productos
         """
-        productos = user.productos.all()
+        inventario = InventoryService.get_resumen_inventario(user)
         
         stats = {
-            'total_productos': productos.count(),
-            'productos_activos': productos.filter(activo=True).count(),
-            'productos_sin_stock': productos.filter(stock=0).count(),
-            'productos_stock_bajo': productos.filter(stock__lt=5, stock__gt=0).count(),
-            'valor_total_inventario': sum(p.precio * p.stock for p in productos if p.activo),
-            'categorias': list(productos.values_list('categoria', flat=True).distinct()),
+            'total_productos': inventario['total_productos'],
+            'productos_activos': inventario['productos_activos'],
+            'productos_sin_stock': inventario['productos_sin_stock'],
+            'productos_stock_bajo': inventario['productos_stock_bajo'],
+            'valor_total_inventario': inventario['valor_total_inventario'],
+            'categorias': list(
+                user.productos.order_by().values_list('categoria', flat=True).distinct()
+            ),
         }
         
         return stats
 
 
+class InventoryService:
+    """
+    Servicio para el inventario de productos de una empresa.
+    
+    Calcula la valoración y los tramos de stock en la base de datos con
+    una sola consulta, y lista las alertas de stock bajo usando el índice
+    parcial producto_stock_bajo_idx, de modo que ambas operaciones no
+    dependen del número total de productos de la empresa.
+    """
+    
+    ALERTAS_LIMITE = 50
+    ALERTAS_LIMITE_MAXIMO = 200
+    
+    @staticmethod
+    def get_resumen_inventario(user):
+        """
+        Obtiene la valoración y los tramos de stock del inventario.
+        
+        Args:
+            user (User): Usuario empresa
+            
+        Returns:
+            dict: Conteos por tramo de stock, unidades y valor del inventario activo
+        """
+        umbral = Producto.UMBRAL_STOCK_BAJO
+        activo = Q(activo=True)
+        
+        datos = Producto.objects.filter(usuario=user).aggregate(
+            total_productos=Count('id'),
+            productos_activos=Count('id', filter=activo),
+            productos_sin_stock=Count('id', filter=Q(stock=0)),
+            productos_stock_bajo=Count('id', filter=Q(stock__gt=0, stock__lt=umbral)),
+            productos_stock_normal=Count('id', filter=Q(stock__gte=umbral)),
+            alertas_stock=Count('id', filter=activo & Q(stock__lt=umbral)),
+            unidades_inventario=Sum('stock', filter=activo, default=0),
+            valor_total_inventario=Sum(
+                F('precio') * F('stock'),
+                filter=activo,
+                output_field=DecimalField(max_digits=16, decimal_places=2),
+                default=Decimal('0'),
+            ),
+        )
+        
+        return datos
+    
+    @staticmethod
+    def get_alertas_stock(user, limite=ALERTAS_LIMITE, cursor=None):
+        """
+        Lista los productos activos con stock bajo, del menor stock al mayor.
+        
+        Usa paginación por cursor (stock, id) en lugar de OFFSET para que
+        cada página cueste lo mismo sin importar cuántas alertas haya.
+        
+        Args:
+            user (User): Usuario empresa
+            limite (int): Productos por página
+            cursor (str): Cursor 'stock:id' devuelto por la página anterior
+            
+        Returns:
+            dict: 'productos' (lista de dicts) y 'siguiente' (cursor o None)
+            
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        limite = max(1, min(limite, InventoryService.ALERTAS_LIMITE_MAXIMO))
+        
+        # Misma condición que el índice parcial producto_stock_bajo_idx
+        productos = Producto.objects.filter(
+            usuario=user,
+            activo=True,
+            stock__lt=Producto.UMBRAL_STOCK_BAJO,
+        )
+        
+        if cursor:
+            try:
+                stock, ultimo_id = (int(valor) for valor in cursor.split(':'))
+            except ValueError:
+                raise ValueError("Cursor de paginación no válido")
+            productos = productos.filter(Q(stock__gt=stock) | Q(stock=stock, id__gt=ultimo_id))
+        
+        filas = list(
+            productos.order_by('stock', 'id').values(
+                'id', 'nombre', 'categoria', 'precio', 'stock'
+            )[:limite + 1]
+        )
+        
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = f"{filas[-1]['stock']}:{filas[-1]['id']}"
+        
+        return {
+            'productos': filas,
+            'siguiente': siguiente,
+        }
+
+
 class ServiceService:
     """
     Servicio para operaciones relacionadas con servicios.
@@ -335,8 +453,10 @@ class ServiceService:
                 principal=(i == 0)  # Primera imagen como principal
             )
             
-            # Optimizar imagen
-            ProductService._optimize_image(imagen_servicio.imagen.path)
+            # Optimizar imagen (recalcula dimensiones si cambió)
+            if ProductService._optimize_image(imagen_servicio.imagen.path):
+                imagen_servicio.actualizar_placeholder()
+                imagen_servicio.save(update_fields=['ancho', 'alto', 'placeholder'])
     
     @staticmethod
     def get_services_with_images(user, filters=None):
@@ -570,7 +690,7 @@ class PedidoService:
             
             # Reducir stock
             producto.stock -= cantidad
-            producto.save()
+            producto.save(update_fields=['stock'])
             
         elif tipo == 'servicio':
             servicio = Servicio.objects.get(id=item_id, activo=True)
@@ -649,19 +769,21 @@ class PedidoService:
         Returns:
             dict: Estadísticas de pedidos
         """
-        pedidos = user.pedidos.all()
+        # Una sola consulta agregada sobre el índice (usuario, estado)
+        datos = user.pedidos.aggregate(
+            total_pedidos=Count('id'),
+            pedidos_pendientes=Count('id', filter=Q(estado='pendiente')),
+            pedidos_en_proceso=Count('id', filter=Q(estado='en_proceso')),
+            pedidos_completados=Count('id', filter=Q(estado='completado')),
+            pedidos_cancelados=Count('id', filter=Q(estado='cancelado')),
+            total_gastado=Sum('total', filter=Q(estado='completado')),
+            pedido_promedio=Avg('total'),
+        )
         
-        stats = {
-            'total_pedidos': pedidos.count(),
-            'pedidos_pendientes': pedidos.filter(estado='pendiente').count(),
-            'pedidos_completados': pedidos.filter(estado='completado').count(),
-            'total_gastado': sum(p.total for p in pedidos.filter(estado='completado')),
-            'pedido_promedio': pedidos.aggregate(
-                promedio=Avg('total')
-            )['promedio'] or 0,
-        }
+        datos['total_gastado'] = datos['total_gastado'] or 0
+        datos['pedido_promedio'] = datos['pedido_promedio'] or 0
         
-        return stats
+        return datos
     
     @staticmethod
     def get_pedidos_empresa_with_details(empresa_user, filters=None):
@@ -702,22 +824,161 @@ class PedidoService:
         Returns:
             dict: Estadísticas de pedidos de la empresa
         """
-        pedidos = empresa_user.pedidos_recibidos.all()
+        # Se lee el resumen diario (una fila por día) en lugar de los pedidos
+        datos = VentaDiariaEmpresa.objects.filter(empresa=empresa_user).aggregate(
+            total_pedidos=Sum('pedidos_total'),
+            pedidos_pendientes=Sum('pedidos_pendientes'),
+            pedidos_en_proceso=Sum('pedidos_en_proceso'),
+            pedidos_completados=Sum('pedidos_completados'),
+            pedidos_cancelados=Sum('pedidos_cancelados'),
+            total_vendido=Sum('ingresos'),
+            items_vendidos=Sum('items_vendidos'),
+        )
         
-        stats = {
-            'total_pedidos': pedidos.count(),
-            'pedidos_pendientes': pedidos.filter(estado='pendiente').count(),
-            'pedidos_en_proceso': pedidos.filter(estado='en_proceso').count(),
-            'pedidos_completados': pedidos.filter(estado='completado').count(),
-            'pedidos_cancelados': pedidos.filter(estado='cancelado').count(),
-            'total_vendido': sum(p.total for p in pedidos.filter(estado='completado')),
-            'venta_promedio': pedidos.filter(estado='completado').aggregate(
-                promedio=Avg('total')
-            )['promedio'] or 0,
-        }
+        stats = {campo: valor or 0 for campo, valor in datos.items()}
+        stats['venta_promedio'] = (
+            stats['total_vendido'] / stats['pedidos_completados']
+            if stats['pedidos_completados'] else 0
+        )
         
         return stats
     
+    @staticmethod
+    def get_empresa_ventas_diarias(empresa_user, dias=30):
+        """
+        Obtiene la serie diaria de ventas de una empresa para gráficas.
+        
+        Args:
+            empresa_user (User): Usuario empresa
+            dias (int): Número de días hacia atrás (incluye hoy)
+            
+        Returns:
+            list: Diccionarios por día, con ceros en los días sin pedidos
+        """
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=dias - 1)
+        
+        filas = {
+            fila.fecha: fila
+            for fila in VentaDiariaEmpresa.objects.filter(empresa=empresa_user, fecha__gte=desde)
+        }
+        
+        serie = []
+        for i in range(dias):
+            fecha = desde + timedelta(days=i)
+            fila = filas.get(fecha)
+            serie.append({
+                'fecha': fecha,
+                'pedidos': fila.pedidos_total if fila else 0,
+                'completados': fila.pedidos_completados if fila else 0,
+                'ingresos': fila.ingresos if fila else 0,
+                'items_vendidos': fila.items_vendidos if fila else 0,
+                'clientes': fila.clientes_distintos if fila else 0,
+            })
+        
+        return serie
+    
+    # Clientes guardados en caché por empresa (el resumen cubre a todos)
+    CLIENTES_LIMITE = 500
+    CLIENTES_TTL = 1800
+    
+    # orden: expresión de la consulta. Cada orden guarda su propia ventana
+    # de CLIENTES_LIMITE clientes; el ranking siempre es por ingresos
+    ORDENES_CLIENTES = {
+        'ingresos': F('ingresos').desc(),
+        'pedidos': F('pedidos').desc(),
+        'recientes': F('ultimo_pedido').desc(),
+        'ticket': F('ticket').desc(nulls_last=True),
+    }
+    
+    @staticmethod
+    def get_clientes_empresa(empresa_user, orden='ingresos', force_refresh=False):
+        """
+        Obtiene estadísticas acumuladas por cliente de una empresa.
+        
+        Se invalida con el tag de la empresa, igual que su dashboard,
+        cada vez que se crea, modifica o elimina uno de sus pedidos.
+        
+        Args:
+            empresa_user (User): Usuario empresa
+            orden (str): Clave de ORDENES_CLIENTES
+            force_refresh (bool): Forzar actualización del caché
+            
+        Returns:
+            dict: 'clientes' (los primeros CLIENTES_LIMITE según el orden) y 'resumen'
+        """
+        if orden not in PedidoService.ORDENES_CLIENTES:
+            raise ValueError(f"Orden de clientes no válido: {orden}")
+        return obtener_o_calcular(
+            f'clientes_empresa_{empresa_user.id}_{orden}',
+            lambda: PedidoService._calcular_clientes_empresa(empresa_user, orden),
+            tags=(tag_empresa(empresa_user.id),),
+            ttl=PedidoService.CLIENTES_TTL,
+            forzar=force_refresh,
+        )
+    
+    @staticmethod
+    def _calcular_clientes_empresa(empresa_user, orden='ingresos'):
+        """Agrupa los pedidos no cancelados por cliente en una sola consulta."""
+        filas = Pedido.objects.filter(empresa=empresa_user).exclude(estado='cancelado').values(
+            'usuario_id', 'usuario__username', 'usuario__email'
+        ).annotate(
+            pedidos=Count('id'),
+            completados=Count('id', filter=Q(estado='completado')),
+            ingresos=Sum('total', filter=Q(estado='completado'), default=Decimal('0')),
+            primer_pedido=Min('fecha_pedido'),
+            ultimo_pedido=Max('fecha_pedido'),
+        ).annotate(
+            ticket=F('ingresos') / NullIf(F('completados'), 0),
+            ranking=Window(Rank(), order_by=F('ingresos').desc()),
+        ).order_by(PedidoService.ORDENES_CLIENTES[orden], 'ranking', 'usuario_id')
+        
+        clientes = []
+        total_clientes = recurrentes = 0
+        total_pedidos = total_completados = 0
+        total_ingresos = Decimal('0')
+        
+        for fila in filas.iterator():
+            total_clientes += 1
+            total_pedidos += fila['pedidos']
+            total_completados += fila['completados']
+            total_ingresos += fila['ingresos']
+            if fila['pedidos'] > 1:
+                recurrentes += 1
+            
+            if len(clientes) < PedidoService.CLIENTES_LIMITE:
+                clientes.append({
+                    'usuario_id': fila['usuario_id'],
+                    'username': fila['usuario__username'],
+                    'email': fila['usuario__email'],
+                    'pedidos': fila['pedidos'],
+                    'completados': fila['completados'],
+                    'ingresos': fila['ingresos'],
+                    'ticket_promedio': (
+                        fila['ingresos'] / fila['completados'] if fila['completados'] else Decimal('0')
+                    ),
+                    'primer_pedido': fila['primer_pedido'],
+                    'ultimo_pedido': fila['ultimo_pedido'],
+                    'ranking': fila['ranking'],
+                })
+        
+        for cliente in clientes:
+            cliente['participacion'] = (
+                float(cliente['ingresos'] / total_ingresos * 100) if total_ingresos else 0
+            )
+        
+        return {
+            'clientes': clientes,
+            'resumen': {
+                'total_clientes': total_clientes,
+                'clientes_recurrentes': recurrentes,
+                'tasa_recurrencia': recurrentes / total_clientes * 100 if total_clientes else 0,
+                'pedidos_por_cliente': total_pedidos / total_clientes if total_clientes else 0,
+                'ingresos_totales': total_ingresos,
+                'ticket_promedio': total_ingresos / total_completados if total_completados else Decimal('0'),
+            },
+        }
+    
     @staticmethod
     def update_pedido_status_by_empresa(pedido_id, empresa_user, nuevo_estado):
         """
@@ -763,20 +1024,10 @@ class CatalogService:
             dict: Catálogo con productos y servicios
         """
         # Productos públicos activos
-        productos = Producto.objects.filter(activo=True).select_related('usuario').prefetch_related(
-            Prefetch(
-                'imagenes',
-                queryset=ImagenProducto.objects.filter(principal=True)
-            )
-        )
+        productos = Producto.objects.filter(activo=True).select_related('usuario').with_main_image()
         
         # Servicios públicos activos
-        servicios = Servicio.objects.filter(activo=True).select_related('usuario').prefetch_related(
-            Prefetch(
-                'imagenes',
-                queryset=ImagenServicio.objects.filter(principal=True)
-            )
-        )
+        servicios = Servicio.objects.filter(activo=True).select_related('usuario').with_main_image()
         
         # Aplicar filtros
         if filters:
@@ -803,27 +1054,146 @@ class CatalogService:
             'total_servicios': servicios.count(),
         }
     
+    # Los destacados se invalidan con el tag de catálogo
+    DESTACADOS_TTL = 900
+    
     @staticmethod
-    def get_featured_items():
+    def get_featured_items(force_refresh=False):
         """
         Obtiene items destacados para la página principal.
         
+        Args:
+            force_refresh (bool): Forzar actualización del caché
+            
         Returns:
             dict: Items destacados
         """
+        return obtener_dos_niveles(
+            'catalogo_destacados',
+            CatalogService._calcular_featured_items,
+            tags=(TAG_CATALOGO,),
+            ttl=CatalogService.DESTACADOS_TTL,
+            forzar=force_refresh,
+        )
+    
+    @staticmethod
+    def _calcular_featured_items():
+        """Obtiene los productos y servicios más recientes ya evaluados."""
         # Productos más recientes
-        productos_recientes = Producto.objects.filter(activo=True).select_related('usuario').prefetch_related(
-            'imagenes'
-        ).order_by('-fecha_creacion')[:6]
+        productos_recientes = Producto.objects.filter(activo=True).select_related('usuario').with_main_image().order_by(
+            '-fecha_creacion'
+        )[:6]
         
         # Servicios más recientes
-        servicios_recientes = Servicio.objects.filter(activo=True).select_related('usuario').prefetch_related(
-            'imagenes'
-        ).order_by('-fecha_creacion')[:6]
+        servicios_recientes = Servicio.objects.filter(activo=True).select_related('usuario').with_main_image().order_by(
+            '-fecha_creacion'
+        )[:6]
+        
+        return {
+            'productos_recientes': list(productos_recientes),
+            'servicios_recientes': list(servicios_recientes),
+        }
+    
+    # Catálogo de una empresa por páginas (páginas públicas y su API JSON)
+    CATALOGO_EMPRESA_LIMITE = 24
+    CATALOGO_EMPRESA_LIMITE_MAXIMO = 60
+    MODELOS_CATALOGO = {'productos': Producto, 'servicios': Servicio}
+    # Páginas con tarjetas en templates/catalogo/<vista>_<producto|servicio>.html
+    VISTAS_TARJETAS = ('catalogo', 'catalogo_completo') + tuple(f'plantilla{numero}' for numero in range(1, 8))
+    _EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    
+    @staticmethod
+    def get_catalogo_empresa(user_id, tipo, limite=CATALOGO_EMPRESA_LIMITE, cursor=None, busqueda='', categoria=''):
+        """
+        Página de productos o servicios activos de una empresa, más recientes primero.
+        
+        Paginación por cursor (fecha_creacion, id) sobre el índice
+        (usuario, activo, fecha_creacion, id): cada página cuesta lo mismo
+        sin importar el tamaño del catálogo. Solo se carga la imagen
+        principal de cada elemento (with_main_image).
+        
+        Args:
+            user_id (int): ID de la empresa
+            tipo (str): 'productos' o 'servicios'
+            limite (int): Elementos por página
+            cursor (str): Cursor 'microsegundos:id' devuelto por la página anterior
+            busqueda (str): Texto a buscar en nombre y descripción
+            categoria (str): Categoría exacta
+            
+        Returns:
+            dict: 'items' (lista de productos o servicios) y 'siguiente' (cursor o None)
+            
+        Raises:
+            ValueError: Si el tipo o el cursor no son válidos
+        """
+        modelo = CatalogService.MODELOS_CATALOGO.get(tipo)
+        if modelo is None:
+            raise ValueError("Tipo de catálogo no válido")
+        limite = max(1, min(limite, CatalogService.CATALOGO_EMPRESA_LIMITE_MAXIMO))
+        
+        items = modelo.objects.filter(usuario_id=user_id, activo=True)
+        if busqueda:
+            items = items.filter(Q(nombre__icontains=busqueda) | Q(descripcion__icontains=busqueda))
+        if categoria:
+            items = items.filter(categoria=categoria)
+        
+        if cursor:
+            try:
+                microsegundos, ultimo_id = (int(valor) for valor in cursor.split(':'))
+                fecha = CatalogService._EPOCH + timedelta(microseconds=microsegundos)
+            except (ValueError, OverflowError):
+                raise ValueError("Cursor de paginación no válido")
+            items = items.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=ultimo_id))
+        
+        items = list(items.with_main_image().order_by('-fecha_creacion', '-id')[:limite + 1])
+        
+        siguiente = None
+        if len(items) > limite:
+            items = items[:limite]
+            ultimo = items[-1]
+            microsegundos = (ultimo.fecha_creacion - CatalogService._EPOCH) // timedelta(microseconds=1)
+            siguiente = f"{microsegundos}:{ultimo.id}"
+        
+        return {
+            'items': items,
+            'siguiente': siguiente,
+        }
+    
+    @staticmethod
+    def get_primera_pagina_empresa(user_id, perfil=None):
+        """
+        Contexto con la primera página de productos y servicios de una empresa.
+        
+        Las plantillas públicas renderizan esta página en el servidor y
+        cargan las siguientes desde la API (products:catalogo_empresa).
+        
+        Args:
+            user_id (int): ID de la empresa
+            perfil (PerfilUsuario): Perfil ya cargado, para leer los totales sin consultarlo
+            
+        Returns:
+            dict: products, services, sus cursores (*_siguiente) y los
+            totales de activos (*_total)
+        """
+        productos = CatalogService.get_catalogo_empresa(user_id, 'productos')
+        servicios = CatalogService.get_catalogo_empresa(user_id, 'servicios')
+        if perfil is not None:
+            totales = {
+                'total_productos_activos': perfil.total_productos_activos,
+                'total_servicios_activos': perfil.total_servicios_activos,
+            }
+        else:
+            totales = PerfilUsuario.objects.filter(usuario_id=user_id).values(
+                'total_productos_activos', 'total_servicios_activos'
+            ).first() or {}
         
         return {
-            'productos_recientes': productos_recientes,
-            'servicios_recientes': servicios_recientes,
+            'products': productos['items'],
+            'products_siguiente': productos['siguiente'],
+            'products_total': totales.get('total_productos_activos', len(productos['items'])),
+            'services': servicios['items'],
+            'services_siguiente': servicios['siguiente'],
+            'services_total': totales.get('total_servicios_activos', len(servicios['items'])),
         }
 
 
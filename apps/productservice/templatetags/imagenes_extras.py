@@ -0,0 +1,38 @@
+"""
+Template tags para imágenes de productos y servicios.
+
+Permite pintar las imágenes de los catálogos sin saltos de layout:
+width/height reservan el espacio y el placeholder LQIP se muestra
+como fondo mientras se descarga la imagen real.
+"""
+
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.filter
+def atributos_placeholder(item):
+    """
+    Atributos width, height y fondo LQIP de la imagen principal de un producto o servicio.
+    
+    Devuelve cadena vacía si la imagen no tiene dimensiones calculadas.
+    
+    Usage:
+        <img src="{{ product.imagen_principal }}" alt="{{ product.nombre }}"
+             {{ product|atributos_placeholder }} loading="lazy" decoding="async">
+    """
+    registro = getattr(item, 'imagen_principal_registro', None)
+    if registro is None or not registro.ancho or not registro.alto:
+        return ''
+    
+    if not registro.placeholder:
+        return format_html(' width="{}" height="{}"', registro.ancho, registro.alto)
+    
+    return format_html(
+        ' width="{}" height="{}" style="background: url(\'{}\') center / cover no-repeat;"',
+        registro.ancho,
+        registro.alto,
+        registro.placeholder,
+    )
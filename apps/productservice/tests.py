@@ -1,3 +1,607 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import time
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Q
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from apps.accounts.models import PerfilUsuario
+from apps.accounts.testing import (
+    CachesLimpiasMixin, MediaTemporalMixin, crear_empresa, crear_producto, crear_servicio, crear_usuario,
+    iniciar_sesion,
+)
+from apps.productservice.models import (
+    DetallePedido, ImagenProducto, ImagenServicio, Pedido, PendingFileDeletion, Producto, Servicio,
+    VentaDiariaEmpresa,
+)
+from apps.productservice.services import CatalogService, InventoryService, PedidoService
+from apps.productservice.upload_handlers import DIMENSION_MAXIMA, validar_imagen
+
+
+class VentaDiariaEmpresaTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_ventas')
+        self.clientes = [crear_usuario(f'cliente_ventas_{numero}') for numero in range(2)]
+        self.producto = crear_producto(self.empresa)
+
+    def _resumen(self):
+        return VentaDiariaEmpresa.objects.filter(empresa=self.empresa, fecha=timezone.localdate()).first()
+
+    def test_se_actualiza_al_crear_completar_y_eliminar_pedidos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            primero = Pedido.objects.create(usuario=self.clientes[0], empresa=self.empresa, total=30)
+            Pedido.objects.create(usuario=self.clientes[1], empresa=self.empresa, total=20)
+
+        resumen = self._resumen()
+        self.assertEqual(resumen.pedidos_total, 2)
+        self.assertEqual(resumen.pedidos_pendientes, 2)
+        self.assertEqual(resumen.clientes_distintos, 2)
+        self.assertEqual(resumen.ingresos, 0)
+
+        DetallePedido.objects.create(pedido=primero, producto=self.producto, cantidad=3, precio_unitario=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            primero.estado = 'completado'
+            primero.save()
+
+        resumen = self._resumen()
+        self.assertEqual(resumen.pedidos_pendientes, 1)
+        self.assertEqual(resumen.pedidos_completados, 1)
+        self.assertEqual(resumen.ingresos, 30)
+        self.assertEqual(resumen.items_vendidos, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for pedido in Pedido.objects.filter(empresa=self.empresa):
+                pedido.delete()
+
+        self.assertIsNone(self._resumen())
+
+    def test_refrescar_es_idempotente(self):
+        Pedido.objects.create(usuario=self.clientes[0], empresa=self.empresa, total=15)
+
+        VentaDiariaEmpresa.refrescar(self.empresa.pk, timezone.localdate())
+        VentaDiariaEmpresa.refrescar(self.empresa.pk, timezone.localdate())
+
+        self.assertEqual(VentaDiariaEmpresa.objects.filter(empresa=self.empresa).count(), 1)
+        self.assertEqual(self._resumen().pedidos_total, 1)
+
+    def test_la_migracion_reconstruye_los_resumenes(self):
+        # Sin ejecutar los on_commit: los pedidos existen pero no su resumen
+        Pedido.objects.create(usuario=self.clientes[0], empresa=self.empresa, total=15)
+        Pedido.objects.create(usuario=self.clientes[1], empresa=self.empresa, total=25, estado='completado')
+        self.assertIsNone(self._resumen())
+
+        migracion = import_module('apps.productservice.migrations.0013_poblar_ventas_diarias')
+        migracion.poblar_ventas_diarias(apps, None)
+        migracion.poblar_ventas_diarias(apps, None)
+
+        resumen = self._resumen()
+        self.assertEqual(resumen.pedidos_total, 2)
+        self.assertEqual(resumen.pedidos_completados, 1)
+        self.assertEqual(resumen.ingresos, 25)
+
+
+class CatalogoEmpresaAPITests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_catalogo')
+        self.productos = [crear_producto(self.empresa, f'Producto {numero}') for numero in range(5)]
+        crear_producto(self.empresa, 'Producto inactivo', activo=False)
+        self.url = reverse('products:catalogo_empresa', args=[self.empresa.pk])
+
+    def _paginas(self, **parametros):
+        """Recorre todas las páginas siguiendo el cursor; devuelve los nombres."""
+        nombres, cursor = [], None
+        while True:
+            datos = self.client.get(self.url, {**parametros, **({'cursor': cursor} if cursor else {})}).json()
+            self.assertTrue(datos['success'])
+            nombres.extend(item['nombre'] for item in datos['items'])
+            cursor = datos['siguiente']
+            if cursor is None:
+                return nombres
+
+    def test_recorre_el_catalogo_sin_repetir_ni_saltar(self):
+        esperados = [producto.nombre for producto in reversed(self.productos)]
+        self.assertEqual(self._paginas(limite=2), esperados)
+
+    def test_empates_de_fecha_se_ordenan_por_id(self):
+        Producto.objects.filter(usuario=self.empresa).update(fecha_creacion=timezone.now())
+
+        esperados = [producto.nombre for producto in reversed(self.productos)]
+        self.assertEqual(self._paginas(limite=2), esperados)
+
+    def test_busqueda_y_html_de_tarjetas(self):
+        datos = self.client.get(self.url, {'q': 'Producto 3', 'vista': 'catalogo'}).json()
+
+        self.assertEqual([item['nombre'] for item in datos['items']], ['Producto 3'])
+        self.assertIsNone(datos['siguiente'])
+        self.assertIn('Producto 3', datos['html'])
+
+    def test_parametros_no_validos(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'no-es-un-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'tipo': 'otros'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'vista': 'inexistente'}).status_code, 400)
+
+    def test_solo_empresas(self):
+        cliente = crear_usuario('cliente_catalogo')
+        respuesta = self.client.get(reverse('products:catalogo_empresa', args=[cliente.pk]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_primera_pagina_de_las_plantillas(self):
+        for numero in range(CatalogService.CATALOGO_EMPRESA_LIMITE):
+            crear_producto(self.empresa, f'Extra {numero}')
+
+        contexto = CatalogService.get_primera_pagina_empresa(self.empresa.pk)
+
+        self.assertEqual(len(contexto['products']), CatalogService.CATALOGO_EMPRESA_LIMITE)
+        self.assertIsNotNone(contexto['products_siguiente'])
+        self.assertEqual(contexto['products_total'], CatalogService.CATALOGO_EMPRESA_LIMITE + 5)
+        self.assertEqual(contexto['services'], [])
+
+
+class ExportacionPedidosTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_exportacion')
+        cliente = crear_usuario('cliente_exportacion')
+        PerfilUsuario.objects.filter(usuario=cliente).update(telefono='+52 555')
+        producto = crear_producto(self.empresa, '=SUMA(A1)')
+        pedido = Pedido.objects.create(usuario=cliente, empresa=self.empresa, total=30, notas='@notas')
+        DetallePedido.objects.create(pedido=pedido, producto=producto, cantidad=3, precio_unitario=10)
+        iniciar_sesion(self.client, 'empresa_exportacion')
+        self.url = reverse('pedidos_empresa')
+
+    def test_csv_neutraliza_las_formulas(self):
+        respuesta = self.client.get(self.url, {'export': 'csv'})
+
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        cabecera, fila = list(csv.reader(io.StringIO(contenido)))
+        self.assertEqual(cabecera[0], 'Pedido')
+        self.assertEqual(fila[4], "'+52 555")
+        self.assertEqual(fila[7], '3x =SUMA(A1)')  # No empieza por un signo de fórmula
+        self.assertEqual(fila[9], "'@notas")
+
+    def test_xlsx_escribe_los_textos_tal_cual(self):
+        respuesta = self.client.get(self.url, {'export': 'excel'})
+
+        self.assertIn('attachment; filename="pedidos_empresa_exportacion_', respuesta['Content-Disposition'])
+        libro = zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content)))
+        self.assertIsNone(libro.testzip())
+        hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t xml:space="preserve">+52 555</t>', hoja)
+        self.assertIn('<t xml:space="preserve">@notas</t>', hoja)
+        self.assertNotIn("'+52 555", hoja)
+        self.assertEqual(hoja.count('<row>'), 2)
+
+    def test_solo_exporta_los_pedidos_filtrados(self):
+        respuesta = self.client.get(self.url, {'export': 'csv', 'estado': 'completado'})
+
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        self.assertEqual(len(list(csv.reader(io.StringIO(contenido)))), 1)
+
+
+class PendingFileDeletionTests(MediaTemporalMixin, CachesLimpiasMixin, TestCase):
+
+    def _archivo(self, nombre):
+        return default_storage.save(nombre, io.BytesIO(b'datos'))
+
+    def test_solo_se_encola_al_confirmar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            PendingFileDeletion.programar(['productos/a.jpg', '', None])
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+        with mock.patch.object(PendingFileDeletion, 'drenar_en_segundo_plano') as drenado:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(list(PendingFileDeletion.objects.values_list('ruta', flat=True)), ['productos/a.jpg'])
+        drenado.assert_called_once_with()
+
+    def test_eliminar_un_producto_encola_sus_imagenes(self):
+        producto = crear_producto(crear_empresa('empresa_archivos'))
+        ImagenProducto.objects.create(producto=producto, imagen='productos/1.jpg', placeholder='x')
+        ImagenProducto.objects.create(producto=producto, imagen='productos/2.jpg', placeholder='x')
+
+        with mock.patch.object(PendingFileDeletion, 'drenar_en_segundo_plano'), \
+                self.captureOnCommitCallbacks(execute=True):
+            producto.delete()
+
+        self.assertEqual(
+            sorted(PendingFileDeletion.objects.values_list('ruta', flat=True)),
+            ['productos/1.jpg', 'productos/2.jpg'],
+        )
+
+    def test_drenar_elimina_los_archivos_por_lotes(self):
+        rutas = [self._archivo(f'productos/{numero}.jpg') for numero in range(5)]
+        PendingFileDeletion.objects.bulk_create([PendingFileDeletion(ruta=ruta) for ruta in rutas])
+
+        self.assertEqual(PendingFileDeletion.drenar(batch_size=2), (5, 0))
+
+        self.assertFalse(PendingFileDeletion.objects.exists())
+        self.assertFalse(any(os.path.exists(os.path.join(self.media, ruta)) for ruta in rutas))
+
+    def test_los_fallos_se_reintentan_y_se_descartan(self):
+        PendingFileDeletion.objects.create(ruta='productos/bloqueado.jpg')
+
+        with mock.patch.object(default_storage, 'delete', side_effect=OSError('Permiso denegado')):
+            self.assertEqual(PendingFileDeletion.drenar(max_intentos=2), (0, 1))
+            registro = PendingFileDeletion.objects.get()
+            self.assertEqual(registro.intentos, 1)
+            self.assertEqual(registro.ultimo_error, 'Permiso denegado')
+
+            PendingFileDeletion.drenar(max_intentos=2)
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_el_drenado_con_fallos_programa_un_reintento(self):
+        with mock.patch('apps.productservice.models.threading') as hilos, \
+                mock.patch('apps.productservice.models.connection'), \
+                mock.patch.object(PendingFileDeletion, 'drenar', return_value=(0, 1)):
+            # El "thread" se ejecuta en el acto
+            hilos.Thread.side_effect = lambda target, name: mock.Mock(start=target)
+            self.assertTrue(PendingFileDeletion.drenar_en_segundo_plano())
+
+        hilos.Timer.assert_called_once_with(
+            PendingFileDeletion.REINTENTO_DRENADO, PendingFileDeletion.drenar_en_segundo_plano
+        )
+        self.assertTrue(hilos.Timer.return_value.daemon)
+        hilos.Timer.return_value.start.assert_called_once_with()
+        # El lock se liberó al terminar
+        self.assertTrue(caches['default'].add(PendingFileDeletion.CLAVE_LOCK_DRENADO, 1))
+
+    def test_el_comando_drena_la_cola(self):
+        ruta = self._archivo('productos/comando.jpg')
+        PendingFileDeletion.objects.create(ruta=ruta)
+
+        call_command('procesar_eliminaciones_pendientes', stdout=io.StringIO())
+
+        self.assertFalse(PendingFileDeletion.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media, ruta)))
+
+
+class LimpiarImagenesHuerfanasTests(MediaTemporalMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        producto = crear_producto(crear_empresa('empresa_huerfanas'))
+        ImagenProducto.objects.create(producto=producto, imagen='productos/registrada.jpg', placeholder='x')
+
+        self.registrada = self._archivo('productos/registrada.jpg', antiguo=True)
+        self.huerfana = self._archivo('productos/huerfana.jpg', antiguo=True)
+        self.reciente = self._archivo('productos/reciente.jpg')
+
+    def _archivo(self, nombre, antiguo=False):
+        ruta = os.path.join(self.media, nombre)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'datos')
+        if antiguo:
+            hace_un_dia = time.time() - 86400
+            os.utime(ruta, (hace_un_dia, hace_un_dia))
+        return ruta
+
+    def test_elimina_solo_los_huerfanos_fuera_del_periodo_de_gracia(self):
+        call_command('limpiar_imagenes_huerfanas', '--batch-size', '1', stdout=io.StringIO())
+
+        self.assertTrue(os.path.exists(self.registrada))
+        self.assertFalse(os.path.exists(self.huerfana))
+        self.assertTrue(os.path.exists(self.reciente))
+
+    def test_sin_periodo_de_gracia_elimina_tambien_los_recientes(self):
+        call_command('limpiar_imagenes_huerfanas', '--grace-minutes', '0', stdout=io.StringIO())
+
+        self.assertTrue(os.path.exists(self.registrada))
+        self.assertFalse(os.path.exists(self.reciente))
+
+    def test_dry_run_no_elimina_nada(self):
+        salida = io.StringIO()
+        call_command('limpiar_imagenes_huerfanas', '--dry-run', '--verbose-files', stdout=salida)
+
+        self.assertTrue(all(os.path.exists(ruta) for ruta in (self.registrada, self.huerfana, self.reciente)))
+        self.assertIn('productos/huerfana.jpg', salida.getvalue())
+        self.assertNotIn('productos/registrada.jpg', salida.getvalue())
+
+
+def imagen_png(ancho=4, alto=4):
+    """Bytes de una imagen PNG real del tamaño indicado."""
+    contenido = io.BytesIO()
+    Image.new('RGB', (ancho, alto), 'red').save(contenido, 'PNG')
+    return contenido.getvalue()
+
+
+class ValidacionImagenStreamingTests(TestCase):
+
+    def _peticion(self, campo, nombre, contenido):
+        archivo = SimpleUploadedFile(nombre, contenido, content_type='image/png')
+        return RequestFactory().post('/subida/', {campo: archivo})
+
+    def test_acepta_una_imagen_valida_con_sus_datos(self):
+        contenido = imagen_png(30, 20)
+        peticion = self._peticion('imagen', 'foto.png', contenido)
+
+        archivo = peticion.FILES['imagen']
+        self.assertTrue(archivo.imagen_validada)
+        self.assertEqual(archivo.formato_imagen, 'PNG')
+        self.assertEqual(archivo.dimensiones, (30, 20))
+        self.assertEqual(archivo.sha256, hashlib.sha256(contenido).hexdigest())
+        self.assertEqual(archivo.read(), contenido)
+        self.assertFalse(hasattr(peticion, 'archivos_rechazados'))
+
+    def test_descarta_los_archivos_no_validos(self):
+        casos = [
+            ('documento.pdf', imagen_png()),
+            ('falsa.png', b'%PDF-1.4 no es una imagen' * 10),
+            ('enorme.png', imagen_png(DIMENSION_MAXIMA + 1, 1)),
+        ]
+        for nombre, contenido in casos:
+            with self.subTest(nombre=nombre):
+                peticion = self._peticion('imagen', nombre, contenido)
+
+                self.assertNotIn('imagen', peticion.FILES)
+                self.assertEqual([archivo for archivo, _ in peticion.archivos_rechazados], [nombre])
+
+    def test_corta_la_subida_al_superar_el_tamano_maximo(self):
+        contenido = imagen_png() + b'\0' * 1024
+        with mock.patch('apps.productservice.upload_handlers.TAMANO_MAXIMO', len(contenido) - 1):
+            peticion = self._peticion('imagen', 'pesada.png', contenido)
+
+            self.assertNotIn('imagen', peticion.FILES)
+        self.assertIn('5MB', peticion.archivos_rechazados[0][1])
+
+    def test_otros_campos_usan_los_handlers_por_defecto(self):
+        peticion = self._peticion('archivo_adjunto', 'notas.txt', b'texto')
+
+        archivo = peticion.FILES['archivo_adjunto']
+        self.assertEqual(archivo.read(), b'texto')
+        self.assertFalse(hasattr(archivo, 'imagen_validada'))
+
+    def test_validar_imagen_lee_solo_la_cabecera(self):
+        validador = validar_imagen(SimpleUploadedFile('foto.png', imagen_png(7, 3)))
+        self.assertEqual((validador.formato, validador.dimensiones), ('PNG', (7, 3)))
+
+        with self.assertRaises(ValidationError):
+            validar_imagen(SimpleUploadedFile('foto.png', b'GIF89a' + b'\0' * 64))
+
+
+class PlaceholderImagenTests(MediaTemporalMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        empresa = crear_empresa('empresa_placeholders')
+        self.producto = crear_producto(empresa)
+        self.servicio = crear_servicio(empresa)
+
+    def test_se_calcula_al_guardar_la_imagen(self):
+        for imagen in (
+            ImagenProducto(producto=self.producto, imagen=SimpleUploadedFile('p.png', imagen_png(60, 40))),
+            ImagenServicio(servicio=self.servicio, imagen=SimpleUploadedFile('s.png', imagen_png(60, 40))),
+        ):
+            with self.subTest(modelo=type(imagen).__name__):
+                imagen.save()
+                imagen.refresh_from_db()
+
+                self.assertEqual((imagen.ancho, imagen.alto), (60, 40))
+                self.assertTrue(imagen.placeholder.startswith('data:image/'))
+                # El archivo se guardó completo pese a haberse leído para la miniatura
+                with imagen.imagen.open('rb') as archivo:
+                    self.assertEqual(archivo.read(), imagen_png(60, 40))
+
+    def test_el_comando_rellena_las_imagenes_sin_placeholder(self):
+        ruta = default_storage.save('productos/antigua.png', io.BytesIO(imagen_png(30, 10)))
+        imagen = ImagenProducto.objects.create(producto=self.producto, imagen=ruta, placeholder='pendiente')
+        ImagenProducto.objects.filter(pk=imagen.pk).update(placeholder='')
+
+        call_command('generar_placeholders', stdout=io.StringIO())
+
+        imagen.refresh_from_db()
+        self.assertEqual((imagen.ancho, imagen.alto), (30, 10))
+        self.assertTrue(imagen.placeholder.startswith('data:image/'))
+
+    def test_atributos_placeholder(self):
+        plantilla = Template('{% load imagenes_extras %}<img{{ producto|atributos_placeholder }}>')
+        ImagenProducto.objects.create(
+            producto=self.producto, imagen='productos/x.png', ancho=60, alto=40, placeholder='data:image/png;base64,AA'
+        )
+
+        html = plantilla.render(Context({'producto': Producto.objects.get(pk=self.producto.pk)}))
+        self.assertIn('width="60" height="40"', html)
+        self.assertIn("url('data:image/png;base64,AA')", html)
+
+        html = plantilla.render(Context({'producto': crear_producto(self.producto.usuario, 'Sin imagen')}))
+        self.assertEqual(html, '<img>')
+
+
+class ImagenPrincipalTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_imagen_principal')
+        for numero in range(3):
+            producto = crear_producto(self.empresa, f'Producto {numero}')
+            ImagenProducto.objects.create(producto=producto, imagen=f'productos/{numero}-principal.jpg',
+                                          principal=True, placeholder='x')
+            ImagenProducto.objects.create(producto=producto, imagen=f'productos/{numero}-otra.jpg', placeholder='x')
+        crear_producto(self.empresa, 'Sin imagen')
+
+    def _imagenes(self, productos):
+        return {producto.nombre: producto.imagen_principal for producto in productos}
+
+    def test_with_main_image_resuelve_el_listado_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            imagenes = self._imagenes(Producto.objects.filter(usuario=self.empresa).with_main_image())
+
+        self.assertEqual(imagenes['Producto 1'], '/media/productos/1-principal.jpg')
+        self.assertIsNone(imagenes['Sin imagen'])
+
+    def test_usa_las_imagenes_precargadas(self):
+        with self.assertNumQueries(2):
+            productos = list(Producto.objects.filter(usuario=self.empresa).prefetch_related('imagenes'))
+            imagenes = self._imagenes(productos)
+            totales = {producto.nombre: producto.total_imagenes for producto in productos}
+
+        self.assertEqual(imagenes, self._imagenes(Producto.objects.filter(usuario=self.empresa)))
+        self.assertEqual(totales['Producto 0'], 2)
+        self.assertEqual(totales['Sin imagen'], 0)
+
+    def test_servicio_respeta_la_prioridad_de_la_imagen_legacy(self):
+        servicio = crear_servicio(self.empresa, imagen='servicios/legacy.jpg')
+        imagen = ImagenServicio.objects.create(servicio=servicio, imagen='servicios/nueva.jpg', placeholder='x')
+
+        for servicios in (Servicio.objects.with_main_image(), Servicio.objects.prefetch_related('imagenes')):
+            self.assertEqual(servicios.get(pk=servicio.pk).imagen_principal, '/media/servicios/legacy.jpg')
+
+        imagen.principal = True
+        imagen.save()
+        for servicios in (Servicio.objects.with_main_image(), Servicio.objects.prefetch_related('imagenes')):
+            self.assertEqual(servicios.get(pk=servicio.pk).imagen_principal, '/media/servicios/nueva.jpg')
+
+
+class ClientesEmpresaTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_clientes')
+        self.frecuente, self.grande, self.nuevo = (
+            crear_usuario(f'cliente_{nombre}') for nombre in ('frecuente', 'grande', 'nuevo')
+        )
+        self._pedido(self.frecuente, 30, 'completado', dias=10)
+        self._pedido(self.frecuente, 10, 'completado', dias=5)
+        self._pedido(self.frecuente, 500, 'cancelado', dias=5)
+        self._pedido(self.grande, 100, 'completado', dias=20)
+        self._pedido(self.nuevo, 5, 'pendiente', dias=1)
+
+    def _pedido(self, cliente, total, estado, dias):
+        pedido = Pedido.objects.create(usuario=cliente, empresa=self.empresa, total=total, estado=estado)
+        Pedido.objects.filter(pk=pedido.pk).update(fecha_pedido=timezone.now() - timedelta(days=dias))
+
+    def _usernames(self, orden):
+        clientes = PedidoService.get_clientes_empresa(self.empresa, orden)['clientes']
+        return [cliente['username'] for cliente in clientes]
+
+    def test_estadisticas_por_cliente(self):
+        datos = PedidoService.get_clientes_empresa(self.empresa)
+        clientes = {cliente['username']: cliente for cliente in datos['clientes']}
+
+        frecuente = clientes['cliente_frecuente']
+        self.assertEqual((frecuente['pedidos'], frecuente['completados']), (2, 2))
+        self.assertEqual((frecuente['ingresos'], frecuente['ticket_promedio']), (40, 20))
+        self.assertEqual(frecuente['ranking'], 2)
+        self.assertLess(frecuente['primer_pedido'], frecuente['ultimo_pedido'])
+        self.assertEqual(clientes['cliente_nuevo']['ticket_promedio'], 0)
+
+        resumen = datos['resumen']
+        self.assertEqual((resumen['total_clientes'], resumen['clientes_recurrentes']), (3, 1))
+        self.assertEqual(resumen['ingresos_totales'], 140)
+        self.assertEqual(resumen['ticket_promedio'], Decimal('140') / 3)
+
+    def test_cada_orden_se_calcula_en_la_consulta(self):
+        self.assertEqual(self._usernames('ingresos'), ['cliente_grande', 'cliente_frecuente', 'cliente_nuevo'])
+        self.assertEqual(self._usernames('pedidos')[0], 'cliente_frecuente')
+        self.assertEqual(self._usernames('recientes'), ['cliente_nuevo', 'cliente_frecuente', 'cliente_grande'])
+        self.assertEqual(self._usernames('ticket'), ['cliente_grande', 'cliente_frecuente', 'cliente_nuevo'])
+
+        with self.assertRaises(ValueError):
+            PedidoService.get_clientes_empresa(self.empresa, 'nombre')
+
+    def test_el_limite_se_aplica_despues_de_ordenar(self):
+        with mock.patch.object(PedidoService, 'CLIENTES_LIMITE', 1):
+            self.assertEqual(self._usernames('ingresos'), ['cliente_grande'])
+            self.assertEqual(self._usernames('recientes'), ['cliente_nuevo'])
+            resumen = PedidoService.get_clientes_empresa(self.empresa, 'recientes')['resumen']
+        self.assertEqual(resumen['total_clientes'], 3)
+
+    def test_un_pedido_nuevo_invalida_la_cache(self):
+        self.assertEqual(len(self._usernames('ingresos')), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._pedido(crear_usuario('cliente_ultimo'), 1, 'pendiente', dias=0)
+
+        self.assertEqual(len(self._usernames('ingresos')), 4)
+
+    def test_vista_de_clientes(self):
+        iniciar_sesion(self.client, 'empresa_clientes')
+
+        respuesta = self.client.get(reverse('clientes_empresa'), {'orden': 'recientes'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['clientes'][0]['username'], 'cliente_nuevo')
+        self.assertEqual(self.client.get(reverse('clientes_empresa'), {'orden': 'x'}).status_code, 200)
+
+
+class InventoryServiceTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_inventario')
+        self.productos = {
+            nombre: crear_producto(self.empresa, nombre, activo=activo, precio=precio, stock=stock)
+            for nombre, activo, precio, stock in (
+                ('agotado', True, 10, 0),
+                ('bajo', True, 20, 2),
+                ('bajo_2', True, 5, 2),
+                ('normal', True, Decimal('2.50'), 100),
+                ('inactivo', False, 1000, 1),
+            )
+        }
+
+    def test_resumen_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            resumen = InventoryService.get_resumen_inventario(self.empresa)
+
+        self.assertEqual(resumen['total_productos'], 5)
+        self.assertEqual(resumen['productos_activos'], 4)
+        self.assertEqual(resumen['productos_sin_stock'], 1)
+        self.assertEqual(resumen['productos_stock_bajo'], 3)
+        self.assertEqual(resumen['productos_stock_normal'], 1)
+        self.assertEqual(resumen['alertas_stock'], 3)
+        self.assertEqual(resumen['unidades_inventario'], 104)
+        self.assertEqual(resumen['valor_total_inventario'], Decimal('300'))
+
+    def test_resumen_de_una_empresa_sin_productos(self):
+        resumen = InventoryService.get_resumen_inventario(crear_empresa('empresa_vacia'))
+        self.assertEqual((resumen['total_productos'], resumen['valor_total_inventario']), (0, 0))
+
+    def test_alertas_paginadas_por_stock_e_id(self):
+        primera = InventoryService.get_alertas_stock(self.empresa, limite=2)
+        self.assertEqual([producto['nombre'] for producto in primera['productos']], ['agotado', 'bajo'])
+
+        segunda = InventoryService.get_alertas_stock(self.empresa, limite=2, cursor=primera['siguiente'])
+        self.assertEqual([producto['nombre'] for producto in segunda['productos']], ['bajo_2'])
+        self.assertIsNone(segunda['siguiente'])
+
+        with self.assertRaises(ValueError):
+            InventoryService.get_alertas_stock(self.empresa, cursor='no-valido')
+
+    def test_el_indice_parcial_usa_el_umbral(self):
+        indice = next(indice for indice in Producto._meta.indexes if indice.name == 'producto_stock_bajo_idx')
+        self.assertEqual(indice.condition, Q(activo=True, stock__lt=Producto.UMBRAL_STOCK_BAJO))
+
+    def test_endpoint_de_alertas(self):
+        iniciar_sesion(self.client, 'empresa_inventario')
+        url = reverse('products:alertas_stock')
+
+        datos = self.client.get(url, {'limite': 1}).json()
+        self.assertEqual(datos['umbral'], Producto.UMBRAL_STOCK_BAJO)
+        self.assertEqual(datos['productos'][0]['nombre'], 'agotado')
+        self.assertEqual(datos['productos'][0]['precio'], 10.0)
+
+        self.assertEqual(self.client.get(url, {'cursor': 'x'}).status_code, 400)
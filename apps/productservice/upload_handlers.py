@@ -0,0 +1,251 @@
+"""
+Validación de imágenes durante la subida (streaming).
+
+Django bufferiza cada archivo completo antes de que la vista pueda revisarlo.
+ImagenStreamingUploadHandler intercepta los campos de imagen y valida cada
+bloque a medida que llega:
+
+- Extensión y firma (magic bytes) en el primer bloque
+- Dimensiones leídas de la cabecera con PIL.ImageFile.Parser
+- Tamaño máximo acumulado
+- Hash SHA-256 calculado al vuelo
+
+Los archivos inválidos se descartan con SkipFile sin escribir el resto en
+disco; el motivo queda en request.archivos_rechazados para que la vista
+pueda informarlo al usuario.
+"""
+
+import hashlib
+import logging
+import os
+
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+from PIL import ImageFile
+
+logger = logging.getLogger(__name__)
+
+# Campos de formulario que se tratan como imágenes
+CAMPOS_IMAGEN = {'imagen', 'hero_image_file'}
+
+EXTENSIONES_VALIDAS = {'.jpg', '.jpeg', '.png', '.gif'}
+
+# Firmas de archivo aceptadas: (prefijo, formato PIL)
+FIRMAS_IMAGEN = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+TAMANO_MAXIMO = 5 * 1024 * 1024  # 5MB
+DIMENSION_MAXIMA = 8000  # píxeles por lado
+LIMITE_CABECERA = 256 * 1024  # bytes máximos para encontrar las dimensiones
+
+
+class ValidadorImagen:
+    """
+    Valida una imagen bloque a bloque sin necesitar el archivo completo.
+
+    Uso:
+        validador = ValidadorImagen(nombre)
+        for bloque in bloques:
+            validador.alimentar(bloque)
+        validador.finalizar()
+
+    Raises:
+        ValidationError: En cuanto un bloque hace inválida la imagen
+    """
+
+    def __init__(self, nombre):
+        ext = os.path.splitext(nombre or '')[1].lower()
+        if ext not in EXTENSIONES_VALIDAS:
+            raise ValidationError("Formato de imagen no válido. Use JPG, PNG o GIF")
+
+        self.tamano = 0
+        self.formato = None
+        self.dimensiones = None
+        self._hash = hashlib.sha256()
+        self._parser = ImageFile.Parser()
+        self._cabecera = b''
+
+    @property
+    def sha256(self):
+        """Hash hexadecimal del contenido recibido hasta el momento."""
+        return self._hash.hexdigest()
+
+    def alimentar(self, datos):
+        """Procesa el siguiente bloque de datos del archivo."""
+        self.tamano += len(datos)
+        if self.tamano > TAMANO_MAXIMO:
+            raise ValidationError("La imagen no puede exceder 5MB")
+
+        self._hash.update(datos)
+
+        if self.dimensiones is None:
+            self._leer_cabecera(datos)
+
+    def finalizar(self):
+        """Verifica que se haya podido leer la cabecera completa."""
+        if self.dimensiones is None:
+            raise ValidationError("El archivo no es una imagen válida")
+
+    def _leer_cabecera(self, datos):
+        """Comprueba la firma y extrae las dimensiones a partir de la cabecera."""
+        if self.formato is None:
+            self._cabecera += datos[:16]
+            if len(self._cabecera) < 8 and self.tamano < LIMITE_CABECERA:
+                return
+            for firma, formato in FIRMAS_IMAGEN:
+                if self._cabecera.startswith(firma):
+                    self.formato = formato
+                    break
+            else:
+                raise ValidationError("El contenido del archivo no corresponde a una imagen JPG, PNG o GIF")
+
+        try:
+            self._parser.feed(datos)
+        except Exception:
+            raise ValidationError("El archivo no es una imagen válida")
+
+        imagen = self._parser.image
+        if imagen is not None:
+            ancho, alto = imagen.size
+            if imagen.format != self.formato:
+                raise ValidationError("El contenido del archivo no corresponde a su formato")
+            if ancho > DIMENSION_MAXIMA or alto > DIMENSION_MAXIMA:
+                raise ValidationError(
+                    f"La imagen no puede superar {DIMENSION_MAXIMA}x{DIMENSION_MAXIMA} píxeles"
+                )
+            self.dimensiones = (ancho, alto)
+            # Liberar el decodificador: solo se necesitaba la cabecera
+            self._parser = None
+        elif self.tamano > LIMITE_CABECERA:
+            raise ValidationError("No se pudieron leer las dimensiones de la imagen")
+
+
+def validar_imagen(archivo):
+    """
+    Valida un archivo de imagen ya recibido leyéndolo por bloques.
+
+    Se detiene en cuanto conoce las dimensiones; se usa para archivos
+    que no pasaron por ImagenStreamingUploadHandler.
+
+    Args:
+        archivo: File/UploadedFile de Django
+
+    Returns:
+        ValidadorImagen: Validador con formato y dimensiones
+
+    Raises:
+        ValidationError: Si la imagen no es válida
+    """
+    if archivo.size and archivo.size > TAMANO_MAXIMO:
+        raise ValidationError("La imagen no puede exceder 5MB")
+
+    validador = ValidadorImagen(archivo.name)
+    for bloque in archivo.chunks():
+        validador.alimentar(bloque)
+        if validador.dimensiones is not None:
+            break
+    validador.finalizar()
+    archivo.seek(0)
+    return validador
+
+
+class ImagenStreamingUploadHandler(FileUploadHandler):
+    """
+    Upload handler que escribe las imágenes a disco validándolas en streaming.
+
+    Solo actúa sobre los campos de CAMPOS_IMAGEN; el resto de archivos
+    (por ejemplo adjuntos de mensajes) pasan a los handlers por defecto.
+
+    Los archivos aceptados son TemporaryUploadedFile con los atributos
+    adicionales imagen_validada, formato_imagen, dimensiones y sha256.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.validador = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        self.validador = None
+        if field_name not in CAMPOS_IMAGEN:
+            return
+
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+        try:
+            if self.content_length and self.content_length > TAMANO_MAXIMO:
+                raise ValidationError("La imagen no puede exceder 5MB")
+            self.validador = ValidadorImagen(self.file_name)
+        except ValidationError as e:
+            self._rechazar(e)
+
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.validador is None:
+            return raw_data
+
+        try:
+            self.validador.alimentar(raw_data)
+        except ValidationError as e:
+            self._rechazar(e)
+
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.validador is None:
+            return None
+
+        try:
+            self.validador.finalizar()
+        except ValidationError as e:
+            self._rechazar(e)
+
+        archivo = self.file
+        archivo.seek(0)
+        archivo.size = file_size
+        archivo.imagen_validada = True
+        archivo.formato_imagen = self.validador.formato
+        archivo.dimensiones = self.validador.dimensiones
+        archivo.sha256 = self.validador.sha256
+
+        # El archivo ya pertenece a request.FILES; evitar que el parser lo cierre
+        del self.file
+        self.validador = None
+        return archivo
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+            del self.file
+
+    def _rechazar(self, error):
+        """Descarta el archivo actual y registra el motivo en el request."""
+        motivo = error.messages[0] if error.messages else str(error)
+        logger.info(f"Subida rechazada '{self.file_name}': {motivo}")
+
+        if self.request is not None:
+            if not hasattr(self.request, 'archivos_rechazados'):
+                self.request.archivos_rechazados = []
+            self.request.archivos_rechazados.append((self.file_name, motivo))
+
+        if hasattr(self, 'file'):
+            self.file.close()
+            del self.file
+        self.validador = None
+        raise SkipFile()
+
+
+def notificar_archivos_rechazados(request):
+    """Muestra un mensaje por cada archivo descartado durante la subida."""
+    for nombre, motivo in getattr(request, 'archivos_rechazados', []):
+        messages.warning(request, f"La imagen '{nombre}' no se guardó: {motivo}")
@@ -6,6 +6,9 @@ app_name = 'products'
 urlpatterns = [
     path('productos/', views.productos, name='productos'),
     path('productos/crear/', views.crear_producto, name='crear_producto'),
+    path('productos/alertas-stock/', views.alertas_stock, name='alertas_stock'),
+    # Catálogo público de una empresa por páginas (JSON)
+    path('empresa/<int:user_id>/catalogo/', views.catalogo_empresa, name='catalogo_empresa'),
     path('productos/editar/<int:pk>/', views.editar_producto, name='editar_producto'),
     path('productos/eliminar/<int:pk>/', views.eliminar_producto, name='eliminar_producto'),
     path('productos/imagen/eliminar/<int:imagen_id>/', views.eliminar_imagen_producto, name='eliminar_imagen_producto'),
@@ -1,13 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from apps.productservice.models import Producto, Servicio, Pedido, ImagenProducto, ImagenServicio, MensajePedido, ReservaServicio
 from apps.productservice.forms import ProductoForm, ServicioForm, PoliticasProductoForm, PoliticasServicioForm, ReservaServicioForm
-from apps.productservice.services import ReservaService
+from apps.productservice.services import CatalogService, InventoryService, ReservaService
+from apps.productservice.upload_handlers import notificar_archivos_rechazados
 from django.http import JsonResponse, Http404
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from apps.accounts.models import PerfilUsuario
+from apps.accounts.decorators import rate_limit
+from apps.accounts.authorization import obtener_contexto_autorizacion
 from datetime import datetime
 
 # Decorador para verificar que el usuario sea una empresa
@@ -17,7 +22,7 @@ def empresa_required(view_func):
             return redirect('login')
         
         # Verificar si el usuario tiene perfil y es empresa
-        if hasattr(request.user, 'userprofile') and request.user.userprofile.tipo_cuenta == 'empresa':
+        if obtener_contexto_autorizacion(request).es_empresa:
             return view_func(request, *args, **kwargs)
         else:
             # Si no es empresa, redirigir al marketplace
@@ -34,11 +39,94 @@ def productos(request):
     productos = Producto.objects.filter(usuario=request.user).prefetch_related('imagenes')
     return render(request, 'productservice/productos.html', {'productos': productos})
 
+# Endpoint JSON con los productos activos con stock bajo (paginado por cursor).
+@login_required(login_url='login')
+@empresa_required
+def alertas_stock(request):
+    try:
+        limite = int(request.GET.get('limite', InventoryService.ALERTAS_LIMITE))
+    except ValueError:
+        limite = InventoryService.ALERTAS_LIMITE
+    
+    try:
+        alertas = InventoryService.get_alertas_stock(request.user, limite, request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'umbral': Producto.UMBRAL_STOCK_BAJO,
+        'productos': [
+            {**producto, 'precio': float(producto['precio'])}
+            for producto in alertas['productos']
+        ],
+        'siguiente': alertas['siguiente'],
+    })
+
+# Endpoint JSON público con el catálogo de una empresa (paginado por cursor).
+# Con ?vista= incluye el HTML de las tarjetas de esa página para el scroll infinito.
+@require_http_methods(["GET"])
+@rate_limit(max_requests=120, window_minutes=1, key='user_or_ip', json_response=True)
+def catalogo_empresa(request, user_id):
+    if not PerfilUsuario.objects.filter(usuario_id=user_id, tipo_cuenta='empresa').exists():
+        return JsonResponse({'success': False, 'error': 'Empresa no encontrada'}, status=404)
+    
+    tipo = request.GET.get('tipo', 'productos')
+    vista = request.GET.get('vista', '')
+    if vista and vista not in CatalogService.VISTAS_TARJETAS:
+        return JsonResponse({'success': False, 'error': 'Vista no válida'}, status=400)
+    
+    try:
+        limite = int(request.GET.get('limite', CatalogService.CATALOGO_EMPRESA_LIMITE))
+    except ValueError:
+        limite = CatalogService.CATALOGO_EMPRESA_LIMITE
+    
+    try:
+        pagina = CatalogService.get_catalogo_empresa(
+            user_id,
+            tipo,
+            limite,
+            request.GET.get('cursor'),
+            busqueda=request.GET.get('q', '').strip(),
+            categoria=request.GET.get('categoria', '').strip(),
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    detalle = 'products:detalle_producto' if tipo == 'productos' else 'products:detalle_servicio'
+    datos = {
+        'success': True,
+        'items': [
+            {
+                'id': item.id,
+                'nombre': item.nombre,
+                'descripcion': item.descripcion,
+                'categoria': item.categoria,
+                'precio': float(item.precio),
+                'imagen': item.imagen_principal,
+                'url': reverse(detalle, args=[item.id]),
+            }
+            for item in pagina['items']
+        ],
+        'siguiente': pagina['siguiente'],
+    }
+    
+    if vista:
+        # Mismas tarjetas (y nombre de variable) que el bucle de la plantilla
+        if tipo == 'productos':
+            plantilla, variable = f'catalogo/{vista}_producto.html', 'product'
+        else:
+            plantilla, variable = f'catalogo/{vista}_servicio.html', 'srv'
+        datos['html'] = ''.join(render_to_string(plantilla, {variable: item}) for item in pagina['items'])
+    
+    return JsonResponse(datos)
+
 # Vista para crear un nuevo producto. Muestra y procesa el formulario de creación.
 @login_required(login_url='login')
 @empresa_required
 def crear_producto(request):
     if request.method == 'POST':
+        notificar_archivos_rechazados(request)
         form = ProductoForm(request.POST)
         if form.is_valid():
             producto = form.save(commit=False)
@@ -58,6 +146,7 @@ def editar_producto(request, pk):
     producto = get_object_or_404(Producto, pk=pk, usuario=request.user)
     imagenes_actuales = producto.imagenes.all()
     if request.method == 'POST':
+        notificar_archivos_rechazados(request)
         form = ProductoForm(request.POST, instance=producto)
         nuevas_imagenes = request.FILES.getlist('imagen')
         if form.is_valid():
@@ -120,6 +209,7 @@ def pedidos(request):
 @empresa_required
 def crear_servicio(request):
     if request.method == 'POST':
+        notificar_archivos_rechazados(request)
         form = ServicioForm(request.POST)
         if form.is_valid():
             servicio = form.save(commit=False)
@@ -139,6 +229,7 @@ def editar_servicio(request, pk):
     servicio = get_object_or_404(Servicio, pk=pk, usuario=request.user)
     imagenes_actuales = servicio.imagenes.all()
     if request.method == 'POST':
+        notificar_archivos_rechazados(request)
         form = ServicioForm(request.POST, instance=servicio)
         nuevas_imagenes = request.FILES.getlist('imagen')
         if form.is_valid():
@@ -214,7 +305,7 @@ def detalle_producto(request, pk):
     producto = get_object_or_404(Producto, pk=pk, activo=True)
     
     # Obtener perfil del usuario
-    perfil = PerfilUsuario.objects.get(usuario=request.user)
+    perfil = request.user.userprofile
     
     # Si es empresa, solo puede ver sus productos
     if perfil.tipo_cuenta == 'empresa' and producto.usuario != request.user:
@@ -273,7 +364,7 @@ def detalle_servicio(request, pk):
     servicio = get_object_or_404(Servicio, pk=pk, activo=True)
     
     # Obtener perfil del usuario
-    perfil = PerfilUsuario.objects.get(usuario=request.user)
+    perfil = request.user.userprofile
     
     # Si es empresa, solo puede ver sus servicios
     if perfil.tipo_cuenta == 'empresa' and servicio.usuario != request.user:
@@ -449,6 +540,7 @@ def enviar_mensaje_pedido(request, pedido_id):
 
 
 @login_required(login_url='login')
+@rate_limit(max_requests=60, window_minutes=1, json_response=True)
 def obtener_mensajes_pedido(request, pedido_id):
     """
     Vista para obtener los mensajes de un pedido (JSON).
@@ -521,13 +613,14 @@ def marcar_mensajes_leidos(request, pedido_id):
 
 
 @login_required(login_url='login')
+@rate_limit(max_requests=60, window_minutes=1, json_response=True)
 def conteo_mensajes_no_leidos(request):
     """
     Vista para obtener el conteo total de mensajes no leídos del usuario.
     Útil para mostrar notificaciones en el navbar.
     """
     try:
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
+        perfil = request.user.userprofile
     except PerfilUsuario.DoesNotExist:
         return JsonResponse({'success': True, 'conteo': 0})
     
@@ -550,13 +643,14 @@ def conteo_mensajes_no_leidos(request):
 
 
 @login_required(login_url='login')
+@rate_limit(max_requests=60, window_minutes=1, json_response=True)
 def obtener_chats_actualizados(request):
     """
     Vista API para obtener la información actualizada de los chats.
     Útil para actualización en tiempo real sin recargar la página.
     """
     try:
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
+        perfil = request.user.userprofile
     except PerfilUsuario.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Perfil no encontrado'}, status=404)
     
@@ -613,13 +707,14 @@ def obtener_chats_actualizados(request):
 
 
 @login_required(login_url='login')
+@rate_limit(max_requests=30, window_minutes=1)
 def notificaciones_mensajes(request):
     """
     Vista para mostrar todas las conversaciones de mensajes del usuario.
     Incluye chats activos (mensajes recientes) y pasados (mensajes antiguos).
     """
     try:
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
+        perfil = request.user.userprofile
     except PerfilUsuario.DoesNotExist:
         perfil = None
     
@@ -701,7 +796,7 @@ def crear_reserva(request, servicio_id):
     
     # Verificar que el usuario sea tipo 'usuario' (no empresa)
     try:
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
+        perfil = request.user.userprofile
         if perfil.tipo_cuenta == 'empresa':
             messages.error(request, 'Las empresas no pueden crear reservas. Debes ser un usuario consumidor.')
             return redirect('products:detalle_servicio', pk=servicio_id)
@@ -736,7 +831,7 @@ def mis_reservas(request):
     Vista para mostrar las reservas del usuario autenticado.
     """
     try:
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
+        perfil = request.user.userprofile
     except PerfilUsuario.DoesNotExist:
         perfil = None
     
@@ -783,7 +878,7 @@ def detalle_reserva(request, reserva_id):
         return redirect('products:mis_reservas')
     
     try:
-        perfil = PerfilUsuario.objects.get(usuario=request.user)
+        perfil = request.user.userprofile
     except PerfilUsuario.DoesNotExist:
         perfil = None
     
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webpages', '0003_alter_landingpage_plantilla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='landingpage',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Fecha de la última modificación (Last-Modified de la página pública)', verbose_name='Última Actualización'),
+            preserve_default=False,
+        ),
+    ]
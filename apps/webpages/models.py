@@ -239,6 +239,12 @@ class LandingPage(models.Model):
         help_text="Fecha de creación de la landing page",
         verbose_name="Fecha de Creación"
     )
+    
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha de la última modificación (Last-Modified de la página pública)",
+        verbose_name="Última Actualización"
+    )
 
     class Meta:
         verbose_name = "Landing Page"
@@ -5,17 +5,112 @@ Este módulo contiene la lógica de negocio relacionada con:
 - Creación y gestión de landing pages
 - Preparación de contextos para renderizado
 - Validaciones de límites de plan
+- Caché del HTML renderizado de las landing pages públicas
+- Carga compartida de la empresa en sus páginas públicas (CompanyPageLoader)
 
 Diseñado para escalabilidad: La lógica de negocio está separada
 en servicios para facilitar mantenimiento y futura migración a microservicios.
 """
 
+import hashlib
 import logging
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.db.models import FilteredRelation, Max
+from django.http import Http404
+from django.template.loader import render_to_string
+
 from .models import LandingPage
+from apps.accounts.cache_utils import obtener_o_calcular, tag_landing
 from apps.accounts.services import SuscripcionService
+from apps.productservice.models import Producto, Servicio
+from apps.productservice.services import CatalogService
 
 logger = logging.getLogger(__name__)
 
+# El HTML cacheado se invalida por la versión de tag_landing; el TTL solo
+# limita cuánto vive una entrada que nadie invalida
+TTL_LANDING_HTML = 24 * 3600
+
+# Empresa de una página pública: usuario, perfil y landing page (o None)
+PaginaEmpresa = namedtuple('PaginaEmpresa', ['usuario', 'perfil', 'landing'])
+
+
+class CompanyPageLoader:
+    """
+    Carga la empresa de las páginas públicas (public_company_page,
+    public_landing_page y company_full_catalog).
+    
+    Usuario, perfil y landing page salen de una sola consulta
+    (select_related del perfil y de la landing con FilteredRelation) y se
+    cachean unos segundos por empresa con el tag tag_landing, que cambia
+    con cualquier modificación de los tres. Dentro de una petición el
+    resultado se reutiliza, así que public_company_page y la
+    public_landing_page a la que delega no repiten la carga.
+    
+    Usage:
+        empresa = CompanyPageLoader.load_or_404(user_id, request)
+        empresa.perfil.empresa, empresa.landing
+    """
+    
+    TTL = 60
+    ATRIBUTO_REQUEST = '_paginas_empresa'
+    
+    @staticmethod
+    def load(user_id, request=None):
+        """
+        Obtiene la empresa o None si el usuario no existe o no es empresa.
+        
+        Args:
+            user_id (int): ID del usuario empresa
+            request (HttpRequest): Petición en la que reutilizar el resultado
+            
+        Returns:
+            PaginaEmpresa | None
+        """
+        cargadas = getattr(request, CompanyPageLoader.ATRIBUTO_REQUEST, None) if request is not None else None
+        if cargadas is not None and user_id in cargadas:
+            return cargadas[user_id]
+        
+        empresa = obtener_o_calcular(
+            f'company_page_{user_id}',
+            lambda: CompanyPageLoader._cargar(user_id),
+            tags=[tag_landing(user_id)],
+            ttl=CompanyPageLoader.TTL,
+        )
+        
+        if request is not None:
+            if cargadas is None:
+                cargadas = {}
+                setattr(request, CompanyPageLoader.ATRIBUTO_REQUEST, cargadas)
+            cargadas[user_id] = empresa
+        return empresa
+    
+    @staticmethod
+    def load_or_404(user_id, request=None):
+        empresa = CompanyPageLoader.load(user_id, request)
+        if empresa is None:
+            raise Http404('Empresa no encontrada')
+        return empresa
+    
+    @staticmethod
+    def _cargar(user_id):
+        usuario = (
+            User.objects
+            .defer('password')
+            .annotate(landing=FilteredRelation('landing_pages'))
+            .select_related('userprofile', 'landing')
+            .filter(pk=user_id, userprofile__tipo_cuenta='empresa')
+            # Misma landing que LandingPage.objects.filter(usuario=...).first()
+            .order_by('-landing__fecha_creacion', '-landing__id')
+            .first()
+        )
+        if usuario is None:
+            return None
+        # Django solo asigna la relación filtrada cuando hay fila relacionada
+        return PaginaEmpresa(usuario, usuario.userprofile, getattr(usuario, 'landing', None))
+
 
 class LandingPageService:
     """
@@ -80,11 +175,72 @@ class LandingPageService:
         context = {
             'landing_page': landing_page,
             'empresa': user.userprofile.empresa if hasattr(user, 'userprofile') else '',
-            'productos_destacados': user.productos.filter(activo=True)[:6],
-            'servicios_destacados': user.servicios.filter(activo=True)[:6],
+            'productos_destacados': user.productos.filter(activo=True).with_main_image()[:6],
+            'servicios_destacados': user.servicios.filter(activo=True).with_main_image()[:6],
             'hero_image_url': landing_page.get_hero_image_url(),
             'tiene_imagen_hero': landing_page.tiene_imagen_hero,
         }
         
         return context
-
+    
+    @staticmethod
+    def get_rendered_landing(user_id):
+        """
+        Obtiene el HTML de la plantilla de la landing page de una empresa.
+        
+        El resultado se cachea por empresa y versión de contenido: las
+        señales de LandingPage, PerfilUsuario, productos, servicios y sus
+        imágenes incrementan tag_landing(user_id), así que cada cambio genera
+        un HTML (y un ETag) nuevo y las visitas sin cambios no consultan la BD.
+        
+        Args:
+            user_id (int): ID de la empresa
+            
+        Returns:
+            dict | None: {'titulo', 'html', 'etag', 'modificado'} o None si el
+            usuario no es una empresa con landing page
+        """
+        return obtener_o_calcular(
+            f'landing_html_{user_id}',
+            lambda: LandingPageService._render_landing(user_id),
+            tags=[tag_landing(user_id)],
+            ttl=TTL_LANDING_HTML,
+        )
+    
+    @staticmethod
+    def _render_landing(user_id):
+        empresa = CompanyPageLoader.load(user_id)
+        if empresa is None or empresa.landing is None:
+            return None
+        landing = empresa.landing
+        
+        # Primera página del catálogo; la plantilla carga el resto desde la API
+        html = render_to_string(f'plantillas/{landing.plantilla}.html', {
+            'landing': landing,
+            **CatalogService.get_primera_pagina_empresa(user_id, empresa.perfil),
+        })
+        return {
+            'titulo': landing.titulo,
+            'html': html,
+            'etag': hashlib.md5(f'{landing.titulo}\n{html}'.encode()).hexdigest(),
+            'modificado': LandingPageService._ultima_modificacion(user_id, landing),
+        }
+    
+    @staticmethod
+    def _ultima_modificacion(user_id, landing):
+        """
+        Fecha del último cambio de la landing, sus productos, servicios o imágenes.
+        
+        Es el Last-Modified de la página. Los cambios sin fecha (perfil,
+        borrados) solo se detectan por el ETag, que es el que prevalece
+        cuando el navegador envía ambos.
+        """
+        fechas = [landing.fecha_actualizacion]
+        for modelo in (Producto, Servicio):
+            fechas.extend(
+                modelo.objects.filter(usuario_id=user_id).aggregate(
+                    modificado=Max('fecha_actualizacion'),
+                    imagen=Max('imagenes__fecha_subida'),
+                ).values()
+            )
+        return max(fecha for fecha in fechas if fecha is not None)
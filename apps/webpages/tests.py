@@ -0,0 +1,146 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from apps.accounts import prerender
+from apps.accounts.testing import CachesLimpiasMixin, crear_empresa, crear_producto, crear_usuario, iniciar_sesion
+from apps.productservice.models import Producto
+from apps.webpages.models import LandingPage
+from apps.webpages.services import CompanyPageLoader, LandingPageService
+
+
+@override_settings(PRERENDER_ENABLED=False)
+class LandingPublicaTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_landing')
+        self.landing = LandingPage.objects.create(usuario=self.empresa, titulo='Landing de prueba')
+        self.producto = crear_producto(self.empresa)
+        self.url = reverse('webpages:public_landing_page', args=[self.empresa.pk])
+        prerender.version_despliegue.cache_clear()
+        self.addCleanup(prerender.version_despliegue.cache_clear)
+
+    def test_responde_con_etag_y_last_modified(self):
+        respuesta = self.client.get(self.url)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Landing de prueba', respuesta.content.decode())
+        self.assertTrue(respuesta['ETag'].endswith(f'-{prerender.version_despliegue()}"'))
+        self.assertEqual(respuesta['Last-Modified'], http_date(int(self.producto.fecha_actualizacion.timestamp())))
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        self.assertIn('private', respuesta['Cache-Control'])
+
+    def test_304_sin_volver_a_renderizar(self):
+        respuesta = self.client.get(self.url)
+
+        with mock.patch.object(LandingPageService, '_render_landing') as render:
+            por_etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+            por_fecha = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified'])
+        render.assert_not_called()
+
+        self.assertEqual(por_etag.status_code, 304)
+        self.assertEqual(por_fecha.status_code, 304)
+
+    def test_un_cambio_de_contenido_cambia_etag_y_fecha(self):
+        respuesta = self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Producto.objects.get(pk=self.producto.pk)
+            producto.nombre = 'Producto renombrado'
+            producto.save()
+        Producto.objects.filter(pk=producto.pk).update(
+            fecha_actualizacion=producto.fecha_actualizacion + timedelta(seconds=5)
+        )
+
+        nueva = self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], respuesta['ETag'])
+        self.assertNotEqual(nueva['Last-Modified'], respuesta['Last-Modified'])
+
+    def test_un_despliegue_nuevo_cambia_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with override_settings(VERSION_DESPLIEGUE='otro-despliegue'):
+            prerender.version_despliegue.cache_clear()
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_los_usuarios_autenticados_no_reciben_validadores(self):
+        etag = self.client.get(self.url)['ETag']
+        crear_usuario('cliente_landing')
+        iniciar_sesion(self.client, 'cliente_landing')
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.has_header('ETag'))
+
+    def test_empresa_sin_landing(self):
+        otra = crear_empresa('empresa_sin_landing')
+        respuesta = self.client.get(reverse('webpages:public_landing_page', args=[otra.pk]))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+@override_settings(PRERENDER_ENABLED=False)
+class CompanyPageLoaderTests(CachesLimpiasMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa('empresa_loader')
+        self.peticion = RequestFactory().get('/')
+
+    def test_carga_usuario_perfil_y_landing_en_una_consulta(self):
+        LandingPage.objects.create(usuario=self.empresa, titulo='Antigua')
+        reciente = LandingPage.objects.create(usuario=self.empresa, titulo='Reciente')
+
+        with self.assertNumQueries(1):
+            empresa = CompanyPageLoader._cargar(self.empresa.pk)
+
+        with mock.patch.object(CompanyPageLoader, '_cargar', wraps=CompanyPageLoader._cargar) as cargar:
+            self.assertEqual(CompanyPageLoader.load(self.empresa.pk, self.peticion), empresa)
+            # Misma petición: sin consultas; otra petición: desde la caché
+            with self.assertNumQueries(0):
+                CompanyPageLoader.load(self.empresa.pk, self.peticion)
+            CompanyPageLoader.load(self.empresa.pk, RequestFactory().get('/'))
+        cargar.assert_called_once_with(self.empresa.pk)
+
+        self.assertEqual(empresa.usuario, self.empresa)
+        self.assertEqual(empresa.perfil.empresa, 'Empresa empresa_loader')
+        self.assertEqual(empresa.landing, reciente)
+
+    def test_empresa_sin_landing_y_usuarios_que_no_son_empresa(self):
+        self.assertIsNone(CompanyPageLoader.load(self.empresa.pk).landing)
+        self.assertIsNone(CompanyPageLoader.load(crear_usuario('cliente_loader').pk))
+        with self.assertRaises(Http404):
+            CompanyPageLoader.load_or_404(0)
+
+    def test_crear_la_landing_invalida_la_carga(self):
+        self.assertIsNone(CompanyPageLoader.load(self.empresa.pk).landing)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            landing = LandingPage.objects.create(usuario=self.empresa, titulo='Nueva')
+
+        self.assertEqual(CompanyPageLoader.load(self.empresa.pk).landing, landing)
+
+    def test_la_pagina_de_empresa_carga_la_empresa_una_vez(self):
+        LandingPage.objects.create(usuario=self.empresa, titulo='Landing de la empresa')
+
+        with mock.patch.object(CompanyPageLoader, '_cargar', wraps=CompanyPageLoader._cargar) as cargar:
+            respuesta = self.client.get(reverse('company_page', args=[self.empresa.pk]))
+
+        self.assertContains(respuesta, 'Landing de la empresa')
+        cargar.assert_called_once_with(self.empresa.pk)
+
+    def test_pagina_y_catalogo_de_una_empresa_sin_landing(self):
+        crear_producto(self.empresa, 'Producto del catálogo')
+
+        for url in ('company_page', 'company_catalog_full'):
+            with self.subTest(url=url):
+                respuesta = self.client.get(reverse(url, args=[self.empresa.pk]))
+                self.assertContains(respuesta, 'Producto del catálogo')
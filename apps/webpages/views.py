@@ -15,10 +15,15 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_http_methods
-from apps.accounts.models import PerfilUsuario
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from apps.accounts.authorization import obtener_contexto_autorizacion
+from apps.accounts.prerender import servir_snapshot, version_despliegue
 from apps.productservice.models import Producto, Servicio
+from apps.productservice.upload_handlers import notificar_archivos_rechazados
 from .models import LandingPage
 from .forms import LandingPageForm
+from .services import LandingPageService
 
 
 @login_required(login_url='login')
@@ -29,8 +34,9 @@ def create_landing_page(request):
     Solo empresas pueden acceder a esta funcionalidad.
     """
     # Solo empresas pueden acceder
-    perfil = get_object_or_404(PerfilUsuario, usuario=request.user)
-    if perfil.tipo_cuenta != 'empresa':
+    contexto = obtener_contexto_autorizacion(request)
+    perfil = contexto.perfil_o_404()
+    if not contexto.es_empresa:
         messages.error(request, 'No tienes permiso para crear o editar la página de empresa.')
         return redirect('home')
 
@@ -38,8 +44,8 @@ def create_landing_page(request):
     landing = LandingPage.objects.filter(usuario=request.user).first()
 
     # Obtener algunos productos y servicios para bloques predefinidos
-    products = Producto.objects.filter(usuario=request.user, activo=True)[:5]
-    services = Servicio.objects.filter(usuario=request.user, activo=True)[:5]
+    products = Producto.objects.filter(usuario=request.user, activo=True).with_main_image()[:5]
+    services = Servicio.objects.filter(usuario=request.user, activo=True).with_main_image()[:5]
 
     # Lista de categorías únicas para el slider (hasta 6)
     all_cats = (
@@ -57,8 +63,8 @@ def create_landing_page(request):
                 landing.plantilla = request.POST.get('plantilla')
                 landing.save()
                 # Devolver HTML de la vista previa actualizada
-                products = Producto.objects.filter(usuario=request.user, activo=True).prefetch_related('imagenes')[:5]
-                services = Servicio.objects.filter(usuario=request.user, activo=True).prefetch_related('imagenes')[:5]
+                products = Producto.objects.filter(usuario=request.user, activo=True).with_main_image()[:5]
+                services = Servicio.objects.filter(usuario=request.user, activo=True).with_main_image()[:5]
                 # Obtener categorías para plantillas que las necesiten
                 all_cats = (
                     Producto.objects
@@ -67,8 +73,6 @@ def create_landing_page(request):
                     .distinct()[:6]
                 )
                 categories = list(all_cats)
-                # Obtener perfil para el contexto
-                perfil = request.user.userprofile if hasattr(request.user, 'userprofile') else None
                 from django.template.loader import render_to_string
                 preview_html = render_to_string('webpages/preview_snippet.html', {
                     'landing': landing,
@@ -84,6 +88,7 @@ def create_landing_page(request):
         
         # Petición POST normal (guardar formulario completo)
         form = LandingPageForm(request.POST, request.FILES, instance=landing)
+        notificar_archivos_rechazados(request)
         if form.is_valid():
             new_lp = form.save(commit=False)
             new_lp.usuario = request.user
@@ -126,69 +131,66 @@ def landingpage_view(request):
     
     Solo empresas pueden ver sus propias landing pages.
     """
-    perfil = get_object_or_404(PerfilUsuario, usuario=request.user)
+    contexto = obtener_contexto_autorizacion(request)
+    perfil = contexto.perfil_o_404()
     # Sólo empresas tienen landing page
-    if perfil.tipo_cuenta != 'empresa':
+    if not contexto.es_empresa:
         raise Http404('No tienes una página disponible')
     
-    # Obtener landing page
-    landing = LandingPage.objects.filter(usuario=request.user).first()
-    if not landing:
+    # Mismo HTML cacheado que la vista pública
+    pagina = LandingPageService.get_rendered_landing(request.user.id)
+    if pagina is None:
         messages.info(request, 'Primero debes crear tu landing page.')
         return redirect('webpages:create_landing_page')
     
-    # Datos de productos y servicios si la plantilla los necesita
-    products = Producto.objects.filter(usuario=request.user, activo=True).prefetch_related('imagenes')
-    services = Servicio.objects.filter(usuario=request.user, activo=True).prefetch_related('imagenes')
-    
-    # Obtener perfil para el contexto
-    perfil = request.user.userprofile if hasattr(request.user, 'userprofile') else None
-    
     return render(request, 'webpages/landingpage_view.html', {
-        'landing': landing,
-        'products': products,
-        'services': services,
+        'landing_titulo': pagina['titulo'],
+        'landing_html': pagina['html'],
         'perfil': perfil,
         'user_profile': perfil,
     })
 
 
+@servir_snapshot('landing')
 def public_landing_page(request, user_id):
     """
     Vista pública de landing page de una empresa.
     
     Permite ver la landing page de cualquier empresa sin necesidad de login.
-    """
-    from django.contrib.auth.models import User
+    El HTML de la plantilla sale de la caché por versión de contenido
+    (LandingPageService.get_rendered_landing); base.html se renderiza en
+    cada petición porque incluye el token CSRF y la barra lateral.
     
-    user_obj = get_object_or_404(User, id=user_id)
-    company_perfil = get_object_or_404(PerfilUsuario, usuario=user_obj)
+    Para visitantes anónimos (y crawlers) la página solo depende de la
+    landing y de base.html, así que responde con ETag (contenido más
+    version_despliegue) y Last-Modified (último cambio del contenido) y
+    devuelve 304 si nada cambió desde su última visita.
+    """
+    # La empresa y su landing salen de CompanyPageLoader al renderizar
+    pagina = LandingPageService.get_rendered_landing(user_id)
+    if pagina is None:
+        raise Http404('Landing page no encontrada')
     
-    if company_perfil.tipo_cuenta != 'empresa':
-        raise Http404('Empresa no encontrada')
+    anonimo = not request.user.is_authenticated
+    etag = quote_etag(f"{pagina['etag']}-{version_despliegue()}")
+    modificado = int(pagina['modificado'].timestamp())
+    if anonimo:
+        respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if respuesta is not None:
+            return respuesta
     
     # Obtener perfil del usuario actual logueado para el sidebar (si existe)
-    user_perfil = None
-    if request.user.is_authenticated:
-        try:
-            user_perfil = PerfilUsuario.objects.get(usuario=request.user)
-        except PerfilUsuario.DoesNotExist:
-            user_perfil = None
+    user_perfil = obtener_contexto_autorizacion(request).perfil
     
-    landing = LandingPage.objects.filter(usuario=user_obj).first()
-    
-    if not landing:
-        raise Http404('Landing page no encontrada')
-    
-    products = Producto.objects.filter(usuario=user_obj, activo=True).prefetch_related('imagenes')
-    services = Servicio.objects.filter(usuario=user_obj, activo=True).prefetch_related('imagenes')
-    
-    return render(request, 'webpages/landingpage_view.html', {
+    response = render(request, 'webpages/landingpage_view.html', {
         'perfil': user_perfil,  # Perfil del usuario logueado para el sidebar
         'user_profile': user_perfil,  # Alias adicional
-        'company_perfil': company_perfil,  # Perfil de la empresa visitada
-        'landing': landing,
-        'products': products,
-        'services': services,
+        'landing_titulo': pagina['titulo'],
+        'landing_html': pagina['html'],
     })
-
+    if anonimo:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modificado)
+        # Revalidar siempre: la copia incluye el token CSRF del visitante
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 try:
     import dj_database_url 
@@ -341,6 +342,93 @@ else:
 if not os.path.exists(MEDIA_ROOT):
     os.makedirs(MEDIA_ROOT, exist_ok=True)
 
+# Handlers de subida: las imágenes se validan en streaming (firma, dimensiones
+# y tamaño) antes de terminar de recibirse; el resto usa los handlers por defecto
+FILE_UPLOAD_HANDLERS = [
+    'apps.productservice.upload_handlers.ImagenStreamingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Caché compartida entre los workers de Gunicorn
+# CACHE_BACKEND: 'redis' (por defecto si hay REDIS_URL), 'db' (por defecto sin
+# Redis; la tabla la crea la migración accounts 0022_tabla_cache), 'file' o
+# 'locmem' (una caché por proceso; solo para desarrollo).
+# Los locks de cache_utils y de prerender usan add(), que en la base de datos
+# es un INSERT protegido por la clave primaria: exclusivo entre procesos y
+# servidores. En 'file' add() e incr() son lectura + escritura sin bloqueo
+# y cada set() recorre el directorio para podarlo, así que no es el defecto.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if REDIS_URL else 'db').lower()
+
+if CACHE_BACKEND == 'redis' and REDIS_URL:
+    CACHE_COMPARTIDA = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+elif CACHE_BACKEND == 'file':
+    CACHE_COMPARTIDA = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'teomanager_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHE_COMPARTIDA = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+else:
+    CACHE_BACKEND = 'db'
+    CACHE_COMPARTIDA = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'teomanager_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+
+CACHES = {
+    'default': CACHE_COMPARTIDA,
+    # L1 en memoria de cada proceso delante de 'default' (cache_utils.obtener_dos_niveles)
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'l1',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    # Contadores del rate limiting con RATE_LIMIT_BACKEND='cache'
+    'ratelimit': {**CACHE_COMPARTIDA, 'KEY_PREFIX': 'ratelimit'},
+}
+
+# Sesiones: cached_db lee de la caché compartida y solo escribe en la base de
+# datos cuando la sesión cambia. Si la caché es local al proceso (locmem) otro
+# worker podría leer una copia desactualizada, y si es la propia base de datos
+# (db) no ahorra nada: en esos casos se usa solo la base de datos.
+# Las cookies firmadas no sirven: la sesión guarda el carrito y los mensajes
+# y no podría invalidarse desde el servidor.
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.db' if CACHE_BACKEND in ('locmem', 'db')
+    else 'django.contrib.sessions.backends.cached_db'
+)
+
+# Rate limiting (apps.accounts.ratelimit)
+# RATE_LIMIT_BACKEND: 'cache' (alias RATE_LIMIT_CACHE) o 'db' (tabla ContadorRateLimit,
+# atómica también entre servidores). Sin Redis el incr de la caché no es atómico
+# y peticiones paralelas (p. ej. al login) podrían superar el límite: se usa 'db'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'cache' if CACHE_BACKEND == 'redis' else 'db').lower()
+RATE_LIMIT_CACHE = 'ratelimit'
+# Proxies de confianza delante de la app (Railway añade uno en X-Forwarded-For)
+RATE_LIMIT_PROXIES = int(os.getenv('RATE_LIMIT_PROXIES', '1' if IS_RAILWAY else '0'))
+
+# Snapshots HTML de las páginas públicas de empresa (apps.accounts.prerender),
+# servidos a visitantes anónimos; se generan al primer acceso tras cada cambio
+# o con el comando prerender_company_pages
+PRERENDER_ENABLED = os.getenv('PRERENDER_ENABLED', 'True').lower() == 'true'
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT', os.path.join(MEDIA_ROOT, 'prerender'))
+
+# Identificador del despliegue (en Railway, el ID que asigna a cada uno).
+# Forma parte de los ETag y snapshots de las páginas públicas para que un
+# despliegue que cambie base.html o los estáticos no siga devolviendo 304
+VERSION_DESPLIEGUE = os.getenv('VERSION_DESPLIEGUE') or os.getenv('RAILWAY_DEPLOYMENT_ID', '')
+
 # Configuración del campo primario por defecto
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -207,29 +207,9 @@ class CacheOptimizer:
         logger.info("🔥 Iniciando precarga de caché...")
         
         try:
-            from apps.accounts.services import DashboardService
-            
-            # Precargar métricas de admin
-            logger.info("📊 Precargando métricas de administración...")
-            DashboardService.get_admin_metrics(force_refresh=True)
-            
-            # Precargar categorías de productos
-            logger.info("🏷️  Precargando categorías de productos...")
-            categories = Producto.objects.filter(
-                usuario__userprofile__tipo_cuenta='empresa',
-                activo=True
-            ).values_list('categoria', flat=True).distinct()
-            self.cache.set('product_categories', list(categories), 300)
-            
-            # Precargar dashboards de empresas activas (primeras 10)
-            logger.info("🏢 Precargando dashboards de empresas...")
-            empresas = User.objects.filter(
-                userprofile__tipo_cuenta='empresa',
-                is_active=True
-            )[:10]
-            
-            for empresa in empresas:
-                DashboardService.get_company_dashboard_data(empresa, force_refresh=True)
+            # Misma precarga que se ejecuta tras cada deploy (start.sh)
+            from django.core.management import call_command
+            call_command('warm_caches', forzar=True)
             
             logger.info("✅ Caché precargado exitosamente!")
             
@@ -7,9 +7,20 @@ python manage.py migrate --noinput || echo "⚠️  Advertencia: Las migraciones
 echo "🌐 Inicializando sitio de Django Sites..."
 python manage.py init_site || echo "⚠️  Advertencia: init_site falló, pero continuando..."
 
+echo "🗑️  Eliminando archivos pendientes de despliegues anteriores..."
+python manage.py procesar_eliminaciones_pendientes || echo "⚠️  Advertencia: procesar_eliminaciones_pendientes falló, pero continuando..."
+
+echo "🔥 Precalentando cachés de dashboards..."
+python manage.py warm_caches || echo "⚠️  Advertencia: warm_caches falló, pero continuando..."
+
 echo "📦 Recolectando archivos estáticos..."
 python manage.py collectstatic --noinput || echo "⚠️  Advertencia: collectstatic falló, pero continuando..."
 
+# Después de collectstatic: base.html usa {% static %} y el manifest de
+# CompressedManifestStaticFilesStorage debe ser el de este despliegue
+echo "🏢 Generando snapshots de páginas públicas de empresa..."
+python manage.py prerender_company_pages || echo "⚠️  Advertencia: prerender_company_pages falló, pero continuando..."
+
 echo "🚀 Iniciando servidor Gunicorn..."
 exec gunicorn core.wsgi --bind 0.0.0.0:$PORT --log-file -
 